@@ -0,0 +1,392 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Alert, User
+from weather_cache import CellKey
+
+ALERT_ENGINE_ENABLED = os.getenv("ALERT_ENGINE_ENABLED", "1") not in {"0", "false", "False"}
+# Coalesce the burst of cell updates one prefetch cycle produces into a single pass.
+ALERT_DEBOUNCE_S = float(os.getenv("ALERT_DEBOUNCE_S", "2"))
+ALERT_RETRY_S = float(os.getenv("ALERT_RETRY_S", "30"))
+ALERT_MAX_TRACKED_CELLS = int(os.getenv("ALERT_MAX_TRACKED_CELLS", "20000"))
+ALERT_DB_CHUNK = 1000
+
+DEFAULT_EXPECTED_HARVEST_DAYS = 60
+
+# Fired alert: (farmer id, rule id, severity, message).
+FiredAlert = Tuple[int, str, str, str]
+
+
+def _js_round(value: float) -> int:
+    # Math.round semantics, so messages match the ones src/lib/alerts.js produced.
+    return math.floor(value + 0.5)
+
+
+def _num(value) -> Optional[float]:
+    try:
+        n = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(n) else n
+
+
+def weather_fingerprint(weather: dict) -> tuple:
+    # Exactly what the weather rules and their messages depend on.
+    rain = _num(weather.get("rainProbabilityPercent"))
+    temp = _num(weather.get("temperatureC"))
+    humidity = _num(weather.get("humidityPercent"))
+    wind = _num(weather.get("windSpeedKmh"))
+    return (
+        None if rain is None else _js_round(rain),
+        None if temp is None else round(temp, 1),
+        None if humidity is None else _js_round(humidity),
+        None if wind is None else _js_round(wind),
+    )
+
+
+def evaluate_cell(
+    weather: dict,
+    farmer_ids: np.ndarray,
+    soil_moisture: np.ndarray,
+    days_since_sowing: np.ndarray,
+    expected_harvest_days: np.ndarray,
+) -> List[FiredAlert]:
+    # The rules of generateRuleBasedAlerts (src/lib/alerts.js), over every farmer sharing one forecast.
+    # Missing inputs are NaN, which fails every comparison just like the JS typeof checks.
+    rain = _num(weather.get("rainProbabilityPercent"))
+    temp = _num(weather.get("temperatureC"))
+    humidity = _num(weather.get("humidityPercent"))
+    wind = _num(weather.get("windSpeedKmh"))
+
+    shared: List[Tuple[str, str, str]] = []
+    if rain is not None and rain >= 60:
+        shared.append(
+            (
+                "weather_rain_soon",
+                "warning",
+                f"Rain probability is {_js_round(rain)}% in the current hour. "
+                "Consider pausing irrigation and securing harvested produce.",
+            )
+        )
+    if temp is not None and temp >= 35:
+        shared.append(
+            (
+                "weather_high_temp",
+                "info",
+                f"High temperature ({temp:.1f}°C). Consider early-morning irrigation and shade where possible.",
+            )
+        )
+    if humidity is not None and humidity >= 85:
+        shared.append(
+            (
+                "weather_high_humidity_fungal",
+                "warning",
+                f"High humidity ({_js_round(humidity)}%). "
+                "Increased fungal risk — improve airflow and monitor leaf spots.",
+            )
+        )
+    if wind is not None and wind >= 35:
+        shared.append(
+            (
+                "weather_high_wind",
+                "info",
+                f"High wind ({_js_round(wind)} km/h). Support young plants and avoid spraying during strong winds.",
+            )
+        )
+
+    fired: List[FiredAlert] = []
+    ids = farmer_ids.tolist()
+    for rule_id, severity, message in shared:
+        fired.extend((farmer_id, rule_id, severity, message) for farmer_id in ids)
+
+    if temp is not None and temp >= 30:
+        dry = soil_moisture < 30
+        for i in np.flatnonzero(dry):
+            fired.append(
+                (
+                    ids[i],
+                    "soil_low_moisture_heat",
+                    "danger",
+                    f"Soil moisture is low ({_js_round(soil_moisture[i])}%) with warm weather. "
+                    "Irrigation recommended to avoid stress.",
+                )
+            )
+
+    remaining = expected_harvest_days - days_since_sowing
+    near_harvest = (days_since_sowing >= 0) & (remaining >= 0) & (remaining <= 7)
+    for i in np.flatnonzero(near_harvest):
+        days = int(remaining[i])
+        fired.append(
+            (
+                ids[i],
+                "crop_near_harvest_logistics",
+                "info",
+                f"Crop is nearing harvest (about {days} day{'' if days == 1 else 's'} left). "
+                "Prepare packaging, labor, and transport planning.",
+            )
+        )
+    return fired
+
+
+def _chunks(values: List[int], size: int) -> Iterable[List[int]]:
+    for i in range(0, len(values), size):
+        yield values[i : i + size]
+
+
+def _farmer_arrays(rows: List[tuple], now: datetime):
+    n = len(rows)
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+    sowing = np.fromiter(
+        ((r[1] - datetime(1970, 1, 1)).total_seconds() if r[1] is not None else np.nan for r in rows),
+        dtype=np.float64,
+        count=n,
+    )
+    expected = np.fromiter(
+        (r[2] if r[2] is not None and r[2] > 0 else DEFAULT_EXPECTED_HARVEST_DAYS for r in rows),
+        dtype=np.float64,
+        count=n,
+    )
+    soil = np.fromiter((r[3] if r[3] is not None else np.nan for r in rows), dtype=np.float64, count=n)
+    now_s = (now - datetime(1970, 1, 1)).total_seconds()
+    days_since = np.floor((now_s - sowing) / 86400)
+    return ids, soil, days_since, expected
+
+
+def sync_alerts(db: Session, farmer_ids: List[int], fired: Dict[Tuple[int, str], Tuple[str, str]], now: datetime):
+    # Makes the alerts table match this evaluation for farmer_ids: one row per (farmer, rule).
+    opened = updated = closed = 0
+    inserts, updates = [], []
+    changed = set()
+    for chunk in _chunks(farmer_ids, ALERT_DB_CHUNK):
+        existing = (
+            db.query(Alert.id, Alert.farmer_id, Alert.rule_id, Alert.active, Alert.message)
+            .filter(Alert.farmer_id.in_(chunk))
+            .all()
+        )
+        seen = set()
+        for alert_id, farmer_id, rule_id, active, message in existing:
+            key = (farmer_id, rule_id)
+            seen.add(key)
+            hit = fired.get(key)
+            if hit is None:
+                if active:
+                    updates.append({"id": alert_id, "active": False, "updated_at": now})
+                    closed += 1
+                    changed.add(farmer_id)
+            elif not active:
+                # Cleared and fired again: a new occurrence, even if it had been dismissed.
+                severity, message = hit
+                updates.append(
+                    {
+                        "id": alert_id,
+                        "active": True,
+                        "dismissed": False,
+                        "dismissed_at": None,
+                        "severity": severity,
+                        "message": message,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                )
+                opened += 1
+                changed.add(farmer_id)
+            elif message != hit[1]:
+                updates.append({"id": alert_id, "severity": hit[0], "message": hit[1], "updated_at": now})
+                updated += 1
+                changed.add(farmer_id)
+
+        chunk_ids = set(chunk)
+        for (farmer_id, rule_id), (severity, message) in fired.items():
+            if farmer_id in chunk_ids and (farmer_id, rule_id) not in seen:
+                inserts.append(
+                    {
+                        "farmer_id": farmer_id,
+                        "rule_id": rule_id,
+                        "severity": severity,
+                        "message": message,
+                        "active": True,
+                        "dismissed": False,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                )
+                opened += 1
+                changed.add(farmer_id)
+
+    # Bulk UPDATE by primary key and one multi-row INSERT; rows differ in which columns
+    # they set, so group updates by their key set.
+    by_shape: Dict[tuple, List[dict]] = {}
+    for row in updates:
+        by_shape.setdefault(tuple(sorted(row)), []).append(row)
+    for rows in by_shape.values():
+        db.execute(update(Alert), rows)
+    if inserts:
+        db.execute(insert(Alert), inserts)
+    return {"opened": opened, "updated": updated, "closed": closed, "changed": sorted(changed)}
+
+
+class AlertEngine:
+    def __init__(
+        self,
+        farmers_in_cell: Callable[[CellKey], List[int]],
+        debounce_s: float = ALERT_DEBOUNCE_S,
+        retry_s: float = ALERT_RETRY_S,
+        max_tracked_cells: int = ALERT_MAX_TRACKED_CELLS,
+    ):
+        self.farmers_in_cell = farmers_in_cell
+        self.debounce_s = debounce_s
+        self.retry_s = retry_s
+        self.max_tracked_cells = max_tracked_cells
+
+        self._fingerprints: "OrderedDict[CellKey, tuple]" = OrderedDict()
+        self._dirty: Dict[CellKey, dict] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Called (from a worker thread) with the farmer ids whose alerts changed in a committed pass.
+        self.on_change: Optional[Callable[[List[int]], None]] = None
+
+        self.cells_changed = 0
+        self.cells_unchanged = 0
+        self.passes = 0
+        self.farmers_evaluated = 0
+        self.alerts_opened = 0
+        self.alerts_updated = 0
+        self.alerts_closed = 0
+        self.errors = 0
+        self.last_pass_s: Optional[float] = None
+
+    def weather_updated(self, key: CellKey, weather: dict):
+        # WeatherCache hook: queue the cell only when an alert input actually changed.
+        fingerprint = weather_fingerprint(weather)
+        if self._fingerprints.get(key) == fingerprint:
+            self.cells_unchanged += 1
+            return
+        self._fingerprints[key] = fingerprint
+        self._fingerprints.move_to_end(key)
+        while len(self._fingerprints) > self.max_tracked_cells:
+            self._fingerprints.popitem(last=False)
+        self.cells_changed += 1
+        self._dirty[key] = weather
+        if self._wake is not None:
+            self._wake.set()
+
+    def forget(self, key: CellKey):
+        # A farmer's own inputs changed: the next forecast for the cell re-runs the rules even if
+        # the weather is the same as last time.
+        self._fingerprints.pop(key, None)
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            if self._dirty:
+                self._wake.set()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            await asyncio.sleep(self.debounce_s)
+            self._wake.clear()
+            cells, self._dirty = self._dirty, {}
+            if not cells:
+                continue
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.run_cells, cells)
+            except Exception as e:
+                self.errors += 1
+                print(f"[WARN] Alert pass over {len(cells)} cells failed: {e}")
+                # Newer forecasts queued meanwhile win over the ones being retried.
+                for key, weather in cells.items():
+                    self._dirty.setdefault(key, weather)
+                await asyncio.sleep(self.retry_s)
+                self._wake.set()
+
+    def run_cells(self, cells: Dict[CellKey, dict], farmer_ids: Optional[Dict[CellKey, List[int]]] = None) -> dict:
+        # One batch pass: every farmer in the given cells (or just farmer_ids per cell).
+        started = time.perf_counter()
+        groups = []
+        for key, weather in cells.items():
+            ids = farmer_ids.get(key, []) if farmer_ids is not None else self.farmers_in_cell(key)
+            if ids:
+                groups.append((weather, ids))
+        if not groups:
+            return {"farmers": 0, "opened": 0, "updated": 0, "closed": 0}
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            profiles: Dict[int, tuple] = {}
+            all_ids = list(dict.fromkeys(i for _, ids in groups for i in ids))
+            for chunk in _chunks(all_ids, ALERT_DB_CHUNK):
+                rows = (
+                    db.query(User.id, User.sowing_date, User.expected_harvest_days, User.soil_moisture_percent)
+                    .filter(User.id.in_(chunk), User.role == "farmer")
+                    .all()
+                )
+                profiles.update((row[0], tuple(row)) for row in rows)
+
+            fired: Dict[Tuple[int, str], Tuple[str, str]] = {}
+            for weather, ids in groups:
+                rows = [profiles[i] for i in ids if i in profiles]
+                if not rows:
+                    continue
+                for farmer_id, rule_id, severity, message in evaluate_cell(weather, *_farmer_arrays(rows, now)):
+                    fired[(farmer_id, rule_id)] = (severity, message)
+
+            result = sync_alerts(db, list(profiles), fired, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        changed = result.pop("changed")
+        if changed and self.on_change is not None:
+            try:
+                self.on_change(changed)
+            except Exception as e:
+                print(f"[WARN] Alert change hook failed: {e}")
+
+        self.passes += 1
+        self.farmers_evaluated += len(profiles)
+        self.alerts_opened += result["opened"]
+        self.alerts_updated += result["updated"]
+        self.alerts_closed += result["closed"]
+        self.last_pass_s = round(time.perf_counter() - started, 4)
+        return {"farmers": len(profiles), **result}
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "pending_cells": len(self._dirty),
+            "tracked_cells": len(self._fingerprints),
+            "cells_changed": self.cells_changed,
+            "cells_unchanged": self.cells_unchanged,
+            "passes": self.passes,
+            "farmers_evaluated": self.farmers_evaluated,
+            "alerts_opened": self.alerts_opened,
+            "alerts_updated": self.alerts_updated,
+            "alerts_closed": self.alerts_closed,
+            "errors": self.errors,
+            "last_pass_s": self.last_pass_s,
+        }
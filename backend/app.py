@@ -1,22 +1,116 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, BackgroundTasks, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, USING_FALLBACK_DB
-from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from models import Base, User
-from schemas import RegisterUser, LoginUser
-from auth import hash_password, verify_password
+from database import (
+    FAILOVER_AVAILABLE,
+    AsyncSessionLocal,
+    SessionLocal,
+    active_engine,
+    async_engine,
+    engine,
+    on_db_switch,
+    pool_stats,
+    using_fallback_db,
+)
+import database
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError, OperationalError
+from models import Alert, Base, MarketItem, User
+from schemas import (
+    FarmerCropUpdate,
+    LoginUser,
+    MarketItemCreate,
+    MarketItemUpdate,
+    OrderCreate,
+    RegisterUser,
+    SaleCreate,
+    WEATHER_BATCH_MAX_LOCATIONS,
+    WeatherBatchRequest,
+)
+from auth import (
+    PasswordHasherBusy,
+    hash_password_async,
+    hash_passwords_async,
+    shutdown_password_pool,
+    verify_and_update_password_async,
+)
+from alert_engine import ALERT_ENGINE_ENABLED, AlertEngine
 from auth_token import create_access_token, verify_token
+from db_failover import DatabaseFailover
+from event_broker import EVENT_TOPICS, BrokerFull, EventBroker, sse_frame
+from earnings import earnings_series, earnings_summary, local_day, record_sale
+from forecast import (
+    FORECAST_DAYS,
+    FORECAST_FIELD_GROUPS,
+    FORECAST_MAX_STEP_HOURS,
+    local_iso,
+    open_meteo_forecast_params,
+    parse_forecast,
+)
+from gazetteer import Gazetteer
+from metrics import METRICS, METRICS_ENABLED, MetricsMiddleware, instrument_engine, record_upstream
+from http_cache import GZIP_MIN_BYTES, FastJSONResponse, conditional_json, max_age_until
+from order_queue import KeyedBatchQueue
+from price_index import price_keys, price_summary, record_price, suggest_price
+from orders import (
+    IDEMPOTENCY_KEY_MAX_LENGTH,
+    ORDER_MAX_QUANTITY_KG,
+    OrderRequest,
+    check_replay,
+    find_order_by_key,
+    list_notifications_page,
+    list_orders_page,
+    mark_notification_read,
+    order_to_dict,
+    place_order_batch,
+)
+from market import (
+    MARKET_PAGE_MAX_LIMIT,
+    SORTS,
+    apply_item_changes,
+    effective_price_per_kg,
+    item_to_dict,
+    list_items_page,
+    parse_fields,
+)
+from user_cache import UserProfileCache, UserSnapshot
+from pagination import decode_cursor, encode_cursor
+from search_index import ListingSearchIndex
+from spatial_index import SPATIAL_MAX_RADIUS_KM, SpatialIndex
+from user_import import USER_IMPORT_BATCH_SIZE, USER_IMPORT_MAX_ERRORS, insert_user_rows, iter_upload_rows
+from weather_cache import WeatherCache
+from upstream import CircuitOpenError, UpstreamClient, UpstreamError
+from weather_prefetch import WeatherPrefetcher, WEATHER_PREFETCH_ENABLED
+import asyncio
+import csv
+import io
 import json
+import os
+import time
+import urllib.error
 import urllib.parse
 import urllib.request
-from typing import Optional
-from datetime import datetime
+from typing import List, Optional, Tuple
+from pydantic import ValidationError
+from datetime import date, datetime, timedelta, timezone
 
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.security import OAuth2PasswordBearer
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
+
+
+@app.exception_handler(RequestValidationError)
+async def _request_validation_error(request: Request, exc: RequestValidationError):
+    # FastAPI's own handler echoes the input through json.dumps(allow_nan=False), so a NaN or
+    # Infinity in the body turned the 422 into a 500. orjson writes them as null.
+    return FastJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
+
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,17 +118,183 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+# Small bodies aren't worth the CPU; event streams are excluded by the middleware itself.
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES)
+if METRICS_ENABLED:
+    # Added last so it is outermost and times the whole request.
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine, "primary")
+    if async_engine is not None:
+        instrument_engine(async_engine.sync_engine, "primary")
+
+def _create_tables(bind):
+    Base.metadata.create_all(bind=bind)
+    _ensure_table_schema(User, bind)
+    _ensure_table_schema(MarketItem, bind)
+    _ensure_table_schema(Alert, bind)
+
 
 @app.on_event("startup")
 def _startup_create_tables():
     try:
-        Base.metadata.create_all(bind=engine)
+        _create_tables(active_engine())
     except Exception as e:
         # Allow the server to start even if the DB is unreachable (dev/offline mode).
-        # DB-backed endpoints will fail until connectivity is restored.
+        # DB-backed endpoints will fail until connectivity is restored or failover kicks in.
         print(f"[WARN] Database init failed: {e}")
 
+
+def _ensure_table_schema(model, bind):
+    # create_all() never alters existing tables; add columns and indexes introduced since.
+    table = model.__table__
+    inspector = inspect(bind)
+    existing = {c["name"] for c in inspector.get_columns(table.name)}
+    missing = [c for c in table.columns if c.name not in existing]
+    if missing:
+        with bind.begin() as conn:
+            for column in missing:
+                col_type = column.type.compile(dialect=bind.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+
+    existing_indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing_indexes:
+            index.create(bind=bind, checkfirst=True)
+
+
+@app.on_event("startup")
+def _startup_load_gazetteer():
+    n = _GAZETTEER.ensure_loaded()
+    print(f"[INFO] Gazetteer loaded with {n} places")
+
+
+def _load_search_index():
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            MarketItem.id,
+            MarketItem.product_name,
+            MarketItem.crop,
+            MarketItem.category,
+            MarketItem.district,
+        ).yield_per(5000)
+        n = _SEARCH_INDEX.load(rows)
+        print(f"[INFO] Search index built with {n} listings")
+    except Exception as e:
+        print(f"[WARN] Search index build failed: {e}")
+    finally:
+        db.close()
+
+
+def _load_farmer_index():
+    db = SessionLocal()
+    try:
+        rows = (
+            db.query(User.id, User.latitude, User.longitude)
+            .filter(User.role == "farmer", User.latitude.isnot(None), User.longitude.isnot(None))
+            .yield_per(5000)
+        )
+        n = _FARMER_INDEX.load(rows)
+        print(f"[INFO] Farmer spatial index built with {n} farmers")
+    except Exception as e:
+        print(f"[WARN] Farmer spatial index build failed: {e}")
+    finally:
+        db.close()
+
+
+_index_builds = []
+
+
+@app.on_event("startup")
+async def _startup_build_indexes():
+    # Built off the event loop; the endpoints that need them answer 503 until they are ready.
+    loop = asyncio.get_running_loop()
+    _index_builds.append(loop.run_in_executor(None, _load_search_index))
+    _index_builds.append(loop.run_in_executor(None, _load_farmer_index))
+
+
+_DB_FAILOVER = DatabaseFailover()
+_instrumented_fallback = []
+
+
+@on_db_switch
+def _on_db_switch(using_fallback: bool):
+    # Runs on a worker thread. Ids in the caches and indexes belong to the database we just left.
+    global _SEARCH_INDEX, _FARMER_INDEX
+    if using_fallback:
+        if METRICS_ENABLED and not _instrumented_fallback:
+            instrument_engine(database.fallback_engine, "fallback")
+            if database.fallback_async_engine is not None:
+                instrument_engine(database.fallback_async_engine.sync_engine, "fallback")
+            _instrumented_fallback.append(True)
+        try:
+            _create_tables(database.fallback_engine)
+        except Exception as e:
+            print(f"[WARN] Fallback database init failed: {e}")
+    _USER_CACHE.clear()
+    _SEARCH_INDEX = ListingSearchIndex(normalize=_normalize_text)
+    _FARMER_INDEX = SpatialIndex()
+    _load_search_index()
+    _load_farmer_index()
+
+
+@app.on_event("startup")
+async def _startup_start_db_failover():
+    if FAILOVER_AVAILABLE:
+        _DB_FAILOVER.watch(engine)
+        if async_engine is not None:
+            _DB_FAILOVER.watch(async_engine.sync_engine)
+        _DB_FAILOVER.start()
+
+
+@app.on_event("shutdown")
+async def _shutdown_stop_db_failover():
+    await _DB_FAILOVER.stop()
+
+
+@app.on_event("startup")
+async def _startup_start_weather_prefetch():
+    if WEATHER_PREFETCH_ENABLED:
+        _WEATHER_PREFETCHER.start()
+
+
+@app.on_event("startup")
+async def _startup_start_event_broker():
+    _EVENTS.start()
+
+
+@app.on_event("startup")
+async def _startup_start_alert_engine():
+    if ALERT_ENGINE_ENABLED:
+        _ALERT_ENGINE.start()
+
+
+@app.on_event("shutdown")
+async def _shutdown_stop_weather_prefetch():
+    await _WEATHER_PREFETCHER.stop()
+
+
+@app.on_event("shutdown")
+async def _shutdown_stop_alert_engine():
+    await _ALERT_ENGINE.stop()
+
+
+@app.on_event("shutdown")
+async def _shutdown_stop_event_broker():
+    await _EVENTS.stop()
+
+
+@app.on_event("shutdown")
+async def _shutdown_close_upstream():
+    await _UPSTREAM.aclose()
+
+
+@app.on_event("shutdown")
+def _shutdown_password_pool():
+    shutdown_password_pool()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -42,17 +302,60 @@ def get_db():
     finally:
         db.close()
 
+
+async def get_db_session():
+    # DB_ASYNC selects an AsyncSession; otherwise the sync Session is used via the threadpool.
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield session
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            # close() rolls back the open transaction over the network; keep that off the event loop.
+            await run_in_threadpool(db.close)
+
+
+async def _run_db(db, fn, *args):
+    # fn(session, *args) holds the ORM work so both session kinds share one code path.
+    if not isinstance(db, Session):
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
+
 # ---------------- AUTH SETUP ----------------
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+def _token_db() -> str:
+    # User ids are per database, so tokens are only honoured by the database that issued them.
+    return "fallback" if using_fallback_db() else "primary"
+
+
 def get_current_user(token: str = Depends(oauth2_scheme)):
     payload = verify_token(token)
     if payload is None:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if payload.get("db", "primary") != _token_db():
+        raise HTTPException(status_code=401, detail="Session was issued by another database; please log in again")
     return payload
 
+def _circuit_open(e: CircuitOpenError) -> HTTPException:
+    retry_after = max(1, int(e.retry_after_s + 0.999))
+    return HTTPException(
+        status_code=503, detail=f"Upstream API unavailable: {e}", headers={"Retry-After": str(retry_after)}
+    )
+
+
 def _fetch_json(url: str, timeout_s: int = 8):
+    host = urllib.parse.urlsplit(url).netloc
+    breaker = _UPSTREAM.breaker(host)
+    try:
+        breaker.before_call()
+    except CircuitOpenError as e:
+        raise _circuit_open(e)
+    started = time.perf_counter()
+    ok = answered = False
     try:
         req = urllib.request.Request(
             url,
@@ -63,19 +366,46 @@ def _fetch_json(url: str, timeout_s: int = 8):
         )
         with urllib.request.urlopen(req, timeout=timeout_s) as resp:
             raw = resp.read().decode("utf-8", errors="replace")
-            return json.loads(raw)
+            data = json.loads(raw)
+            ok = True
+            return data
     except Exception as e:
+        # A 4xx is about the request (e.g. a bad coordinate), not the host's health; like the async
+        # client, only 5xx, 429, timeouts and connection errors count against the breaker.
+        answered = isinstance(e, urllib.error.HTTPError) and e.code < 500 and e.code != 429
+        raise HTTPException(status_code=502, detail=f"Upstream API error: {e}")
+    finally:
+        elapsed = time.perf_counter() - started
+        breaker.record(ok or answered, elapsed)
+        record_upstream(host, elapsed, ok)
+
+
+async def _fetch_json_async(url: str, params: Optional[dict] = None):
+    try:
+        return await _UPSTREAM.get_json(url, params=params)
+    except CircuitOpenError as e:
+        raise _circuit_open(e)
+    except UpstreamError as e:
         raise HTTPException(status_code=502, detail=f"Upstream API error: {e}")
 
 
 def _open_meteo_geocode(name: str) -> Optional[dict]:
-    return _open_meteo_geocode_best(name=name, state_hint=None)
+    return _geocode_best(name=name, state_hint=None)
 
 
 def _normalize_text(value: str) -> str:
     return " ".join((value or "").strip().casefold().split())
 
 
+_GAZETTEER = Gazetteer(normalize=_normalize_text)
+_WEATHER_CACHE = WeatherCache()
+_UPSTREAM = UpstreamClient()
+_USER_CACHE = UserProfileCache()
+_SEARCH_INDEX = ListingSearchIndex(normalize=_normalize_text)
+_FARMER_INDEX = SpatialIndex()
+_EVENTS = EventBroker()
+
+
 def _split_location_text(location: str):
     raw = (location or "").strip()
     if not raw:
@@ -91,10 +421,10 @@ def _split_location_text(location: str):
     return (name, state_hint, country_hint)
 
 
-def _open_meteo_geocode_best(name: str, state_hint: Optional[str]) -> Optional[dict]:
+def _clean_geo_query(name: str, state_hint: Optional[str]):
     query_raw = (name or "").strip()
     if not query_raw:
-        return None
+        return ("", state_hint)
 
     query, parsed_state_hint, _ = _split_location_text(query_raw)
     q_norm = " ".join(query.split())
@@ -103,48 +433,39 @@ def _open_meteo_geocode_best(name: str, state_hint: Optional[str]) -> Optional[d
         if q_cf.endswith(suffix):
             q_norm = q_norm[: -len(suffix)].strip()
             break
-    query = q_norm
-    effective_state_hint = state_hint or parsed_state_hint
+    return (q_norm, state_hint or parsed_state_hint)
 
-    base = "https://geocoding-api.open-meteo.com/v1/search"
-    params = urllib.parse.urlencode(
-        {
-            "name": query,
-            "count": 10,
-            "language": "en",
-            "format": "json",
-        }
-    )
-    data = _fetch_json(f"{base}?{params}")
-    results = data.get("results") if isinstance(data, dict) else None
-    if not isinstance(results, list) or not results:
-        return None
 
-    norm_state = _normalize_text(effective_state_hint) if effective_state_hint else ""
+def _score_geo_result(item: dict, norm_state: str) -> int:
+    if not isinstance(item, dict):
+        return -10_000
 
-    def score(item: dict) -> int:
-        if not isinstance(item, dict):
-            return -10_000
+    s = 0
+    if item.get("country_code") == "IN":
+        s += 50
+    if norm_state and _normalize_text(str(item.get("admin1") or "")) == norm_state:
+        s += 40
+    # Prefer bigger places if multiple hits.
+    try:
+        pop = int(item.get("population") or 0)
+    except Exception:
+        pop = 0
+    s += min(pop // 100_000, 20)
+    return s
 
-        s = 0
-        if item.get("country_code") == "IN":
-            s += 50
-        if norm_state and _normalize_text(str(item.get("admin1") or "")) == norm_state:
-            s += 40
-        # Prefer bigger places if multiple hits.
-        try:
-            pop = int(item.get("population") or 0)
-        except Exception:
-            pop = 0
-        s += min(pop // 100_000, 20)
-        return s
+
+def _pick_best_geo(results, state_hint: Optional[str]) -> Optional[dict]:
+    if not isinstance(results, list) or not results:
+        return None
+
+    norm_state = _normalize_text(state_hint) if state_hint else ""
 
     best = None
     best_score = -10_000
     for r in results:
         if not isinstance(r, dict):
             continue
-        sc = score(r)
+        sc = _score_geo_result(r, norm_state)
         if sc > best_score:
             best = r
             best_score = sc
@@ -152,40 +473,105 @@ def _open_meteo_geocode_best(name: str, state_hint: Optional[str]) -> Optional[d
     return best if isinstance(best, dict) else None
 
 
-def _open_meteo_weather(lat: float, lng: float) -> dict:
-    base = "https://api.open-meteo.com/v1/forecast"
-    params = urllib.parse.urlencode(
-        {
-            "latitude": str(lat),
-            "longitude": str(lng),
-            "current": "temperature_2m,wind_speed_10m,relative_humidity_2m,weather_code",
-            "hourly": "precipitation_probability",
-            "timezone": "auto",
-        }
-    )
-    data = _fetch_json(f"{base}?{params}")
+_OPEN_METEO_GEOCODE_URL = os.getenv(
+    "OPEN_METEO_GEOCODE_URL", "https://geocoding-api.open-meteo.com/v1/search"
+)
+_OPEN_METEO_FORECAST_URL = os.getenv(
+    "OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com/v1/forecast"
+)
+_OPEN_METEO_MAX_COORDS = 100
+
+
+def _open_meteo_geocode_params(query: str) -> dict:
+    return {
+        "name": query,
+        "count": 10,
+        "language": "en",
+        "format": "json",
+    }
+
+
+def _pick_open_meteo_geocode(data, query: str, state_hint: Optional[str]) -> Optional[dict]:
+    results = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(results, list) or not results:
+        return None
+
+    _GAZETTEER.remember(query, results)
+    return _pick_best_geo(results, state_hint)
+
+
+def _open_meteo_geocode_best(name: str, state_hint: Optional[str]) -> Optional[dict]:
+    query, effective_state_hint = _clean_geo_query(name, state_hint)
+    if not query:
+        return None
+
+    params = urllib.parse.urlencode(_open_meteo_geocode_params(query))
+    data = _fetch_json(f"{_OPEN_METEO_GEOCODE_URL}?{params}")
+    return _pick_open_meteo_geocode(data, query, effective_state_hint)
+
+
+async def _open_meteo_geocode_best_async(name: str, state_hint: Optional[str]) -> Optional[dict]:
+    query, effective_state_hint = _clean_geo_query(name, state_hint)
+    if not query:
+        return None
+
+    data = await _fetch_json_async(_OPEN_METEO_GEOCODE_URL, _open_meteo_geocode_params(query))
+    return _pick_open_meteo_geocode(data, query, effective_state_hint)
+
+
+def _geocode_best(name: str, state_hint: Optional[str]) -> Optional[dict]:
+    # Local gazetteer first; Open-Meteo only for names it doesn't know.
+    query, effective_state_hint = _clean_geo_query(name, state_hint)
+    if not query:
+        return None
+
+    best = _pick_best_geo(_GAZETTEER.lookup(query), effective_state_hint)
+    if best:
+        return best
+    return _open_meteo_geocode_best(name=query, state_hint=effective_state_hint)
+
+
+async def _geocode_best_async(name: str, state_hint: Optional[str]) -> Optional[dict]:
+    query, effective_state_hint = _clean_geo_query(name, state_hint)
+    if not query:
+        return None
+
+    best = _pick_best_geo(_GAZETTEER.lookup(query), effective_state_hint)
+    if best:
+        return best
+    return await _open_meteo_geocode_best_async(name=query, state_hint=effective_state_hint)
+
+
+def _open_meteo_weather_params(lat: float, lng: float) -> dict:
+    return {
+        "latitude": str(lat),
+        "longitude": str(lng),
+        "current": "temperature_2m,wind_speed_10m,relative_humidity_2m,weather_code",
+        "timezone": "auto",
+        # One fetch carries the multi-day series too, so /weather/forecast shares the cache entry.
+        **open_meteo_forecast_params(),
+    }
+
+
+class WeatherReading(dict):
+    # The /weather payload; the parsed series ride along (not serialized) for /weather/forecast.
+    __slots__ = ("forecast",)
+
+
+def _parse_open_meteo_weather(data) -> dict:
     if not isinstance(data, dict):
         raise HTTPException(status_code=502, detail="Weather API returned invalid response")
 
     current = data.get("current") if isinstance(data.get("current"), dict) else {}
-    hourly = data.get("hourly") if isinstance(data.get("hourly"), dict) else {}
+    forecast = parse_forecast(data)
 
     now_time = current.get("time")
-    hourly_times = hourly.get("time") if isinstance(hourly.get("time"), list) else []
-    hourly_rain = (
-        hourly.get("precipitation_probability")
-        if isinstance(hourly.get("precipitation_probability"), list)
-        else []
-    )
-
     rain_prob = None
-    try:
-        if now_time and hourly_times and hourly_rain:
-            idx = hourly_times.index(now_time)
-            if idx >= 0:
-                rain_prob = hourly_rain[idx]
-    except Exception:
-        rain_prob = None
+    if isinstance(now_time, int):
+        # The current hour is found by arithmetic; reported as local wall-clock time as before.
+        if forecast is not None:
+            rain_prob = forecast.value_at("precipitation_probability", now_time)
+        now_time = local_iso(now_time, int(data.get("utc_offset_seconds") or 0))
 
     def to_num(v):
         try:
@@ -194,7 +580,7 @@ def _open_meteo_weather(lat: float, lng: float) -> dict:
         except Exception:
             return None
 
-    return {
+    reading = WeatherReading({
         "fetchedAt": datetime.utcnow().isoformat() + "Z",
         "time": now_time,
         "temperatureC": to_num(current.get("temperature_2m")),
@@ -202,7 +588,180 @@ def _open_meteo_weather(lat: float, lng: float) -> dict:
         "humidityPercent": to_num(current.get("relative_humidity_2m")),
         "rainProbabilityPercent": to_num(rain_prob),
         "weatherCode": to_num(current.get("weather_code")),
-    }
+    })
+    reading.forecast = forecast
+    return reading
+
+
+def _open_meteo_weather(lat: float, lng: float) -> dict:
+    params = urllib.parse.urlencode(_open_meteo_weather_params(lat, lng))
+    return _parse_open_meteo_weather(_fetch_json(f"{_OPEN_METEO_FORECAST_URL}?{params}"))
+
+
+async def _open_meteo_weather_async(lat: float, lng: float) -> dict:
+    data = await _fetch_json_async(_OPEN_METEO_FORECAST_URL, _open_meteo_weather_params(lat, lng))
+    return _parse_open_meteo_weather(data)
+
+
+async def _open_meteo_weather_many_async(points: List[Tuple[float, float]]) -> List[dict]:
+    # Open-Meteo accepts comma-separated coordinate lists and answers with one
+    # forecast object per coordinate (a bare object when there is only one).
+    async def fetch_chunk(chunk):
+        params = _open_meteo_weather_params(
+            ",".join(str(lat) for lat, _ in chunk),
+            ",".join(str(lng) for _, lng in chunk),
+        )
+        data = await _fetch_json_async(_OPEN_METEO_FORECAST_URL, params)
+        items = data if isinstance(data, list) else [data]
+        if len(items) != len(chunk):
+            raise HTTPException(status_code=502, detail="Weather API returned invalid response")
+        return [_parse_open_meteo_weather(item) for item in items]
+
+    chunks = [
+        points[i : i + _OPEN_METEO_MAX_COORDS]
+        for i in range(0, len(points), _OPEN_METEO_MAX_COORDS)
+    ]
+    results = await asyncio.gather(*[fetch_chunk(c) for c in chunks])
+    return [w for chunk in results for w in chunk]
+
+
+def _store_user_geo(user_id: int, location_query: str, state: str):
+    # Runs as a background task after /register, PUT /profile and /weather/me misses.
+    try:
+        geo = _geocode_best(name=location_query, state_hint=state or None)
+    except HTTPException as e:
+        print(f"[WARN] Geocoding user {user_id} failed: {e.detail}")
+        return
+    if not geo or geo.get("latitude") is None or geo.get("longitude") is None:
+        return
+
+    db = SessionLocal()
+    try:
+        db_user = db.query(User).filter(User.id == user_id).first()
+        if db_user is None:
+            return
+        db_user.latitude = float(geo["latitude"])
+        db_user.longitude = float(geo["longitude"])
+        db_user.geo_label = _build_geo_label(geo) or location_query
+        db.commit()
+        _USER_CACHE.invalidate(user_id)
+        if db_user.role == "farmer":
+            _FARMER_INDEX.upsert(db_user.id, db_user.latitude, db_user.longitude)
+            _evaluate_farmer_alerts(db_user.id, db_user.latitude, db_user.longitude)
+    except SQLAlchemyError as e:
+        print(f"[WARN] Saving coordinates for user {user_id} failed: {e.__class__.__name__}")
+    finally:
+        db.close()
+
+
+def _store_imported_geo(mobiles: List[str]):
+    # Background task after a bulk import: each distinct district is geocoded once, then its
+    # farmers get coordinates and join the spatial index like registered ones do.
+    db = SessionLocal()
+    try:
+        places = {}
+        for i in range(0, len(mobiles), USER_IMPORT_BATCH_SIZE):
+            rows = (
+                db.query(User.id, User.district, User.village, User.state)
+                .filter(User.mobile.in_(mobiles[i : i + USER_IMPORT_BATCH_SIZE]), User.latitude.is_(None))
+                .all()
+            )
+            for user_id, district, village, state in rows:
+                query = (district or "").strip() or (village or "").strip()
+                if query:
+                    places.setdefault((query, state or ""), []).append(user_id)
+
+        located = 0
+        for (query, state), user_ids in places.items():
+            try:
+                geo = _geocode_best(name=query, state_hint=state or None)
+            except HTTPException as e:
+                print(f"[WARN] Geocoding imported users in {query!r} failed: {e.detail}")
+                continue
+            if not geo or geo.get("latitude") is None or geo.get("longitude") is None:
+                continue
+            lat, lng = float(geo["latitude"]), float(geo["longitude"])
+            db.query(User).filter(User.id.in_(user_ids), User.latitude.is_(None)).update(
+                {"latitude": lat, "longitude": lng, "geo_label": _build_geo_label(geo) or query},
+                synchronize_session=False,
+            )
+            db.commit()
+            for user_id in user_ids:
+                _USER_CACHE.invalidate(user_id)
+                _FARMER_INDEX.upsert(user_id, lat, lng)
+                _evaluate_farmer_alerts(user_id, lat, lng)
+            located += len(user_ids)
+        print(f"[INFO] Located {located} of {len(mobiles)} imported farmers")
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"[WARN] Saving coordinates for imported users failed: {e.__class__.__name__}")
+    finally:
+        db.close()
+
+
+def _is_locally_geocoded(name: str, state_hint: Optional[str]) -> bool:
+    query, _ = _clean_geo_query(name, state_hint)
+    return bool(query) and bool(_GAZETTEER.lookup(query))
+
+
+async def _distinct_user_locations() -> List[Tuple[str, str]]:
+    def load():
+        db = SessionLocal()
+        try:
+            rows = db.query(User.district, User.state).filter(User.district.isnot(None)).distinct().all()
+        finally:
+            db.close()
+        return [((d or "").strip(), (st or "").strip()) for d, st in rows if (d or "").strip()]
+
+    return await run_in_threadpool(load)
+
+
+_WEATHER_PREFETCHER = WeatherPrefetcher(
+    cache=_WEATHER_CACHE,
+    load_locations=_distinct_user_locations,
+    geocode=_geocode_best_async,
+    is_local=_is_locally_geocoded,
+    fetch_many=_open_meteo_weather_many_async,
+)
+
+
+def _farmers_in_weather_cell(key) -> List[int]:
+    if not _FARMER_INDEX.ready:
+        raise RuntimeError("farmer spatial index is not built yet")
+    half = _WEATHER_CACHE.grid_deg / 2
+    return [
+        farmer_id
+        for farmer_id, lat, lng in _FARMER_INDEX.in_box(key[0] - half, key[0] + half, key[1] - half, key[1] + half)
+        if _WEATHER_CACHE.snap(lat, lng) == key
+    ]
+
+
+def _publish_alerts_changed(farmer_ids: List[int]):
+    # Only a "refetch" signal; coalesced so a burst of passes is one event per open dashboard.
+    for farmer_id in farmer_ids:
+        _EVENTS.publish_user(farmer_id, "alerts", {"changed": True}, coalesce_key="alerts")
+
+
+_ALERT_ENGINE = AlertEngine(farmers_in_cell=_farmers_in_weather_cell)
+_ALERT_ENGINE.on_change = lambda farmer_ids: _EVENTS.call_threadsafe(_publish_alerts_changed, farmer_ids)
+if ALERT_ENGINE_ENABLED:
+    _WEATHER_CACHE.on_update = _ALERT_ENGINE.weather_updated
+
+
+def _evaluate_farmer_alerts(farmer_id: int, lat: Optional[float], lng: Optional[float]):
+    # Re-run the rules for one farmer against the forecast already cached for their cell.
+    if not ALERT_ENGINE_ENABLED or lat is None or lng is None:
+        return
+    key = _WEATHER_CACHE.snap(lat, lng)
+    # Covers farmers whose forecast is not cached right now, or whose pass below fails.
+    _ALERT_ENGINE.forget(key)
+    weather = _WEATHER_CACHE.peek(key)
+    if weather is None:
+        return
+    try:
+        _ALERT_ENGINE.run_cells({key: weather}, {key: [farmer_id]})
+    except SQLAlchemyError as e:
+        print(f"[WARN] Alert evaluation for farmer {farmer_id} failed: {e.__class__.__name__}")
 
 
 def _build_geo_label(geo: dict) -> str:
@@ -238,6 +797,13 @@ def _build_geo_label(geo: dict) -> str:
     return ", ".join(parts)
 
 
+def _query_user(db: Session, user_id: int) -> Optional[UserSnapshot]:
+    db_user = db.query(User).filter(User.id == user_id).first()
+    if db_user is None:
+        return None
+    return _USER_CACHE.put(db_user)
+
+
 def _build_location_query(db_user: User) -> str:
     # Open-Meteo geocoding works best with just the place name.
     # Prefer district first (user input), then village.
@@ -247,15 +813,15 @@ def _build_location_query(db_user: User) -> str:
     return ""
 
 
-# ---------------- PUBLIC ROUTES ----------------
-
-@app.post("/register")
-def register(user: RegisterUser, db: Session = Depends(get_db)):
-    role = (user.role or "").strip().lower()
+def _password_hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy, please retry in a moment.",
+        headers={"Retry-After": "1"},
+    )
 
-    if role not in {"farmer", "consumer"}:
-        raise HTTPException(status_code=422, detail="Invalid role.")
 
+def _missing_required_fields(user: RegisterUser, role: str) -> List[str]:
     if role == "farmer":
         required_fields = [
             ("age", user.age),
@@ -277,7 +843,67 @@ def register(user: RegisterUser, db: Session = Depends(get_db)):
             ("village", user.village),
         ]
 
-    missing = [name for name, value in required_fields if value is None or str(value).strip() == ""]
+    return [name for name, value in required_fields if value is None or str(value).strip() == ""]
+
+
+def _find_user_by_mobile(db: Session, mobile: str) -> Optional[User]:
+    return db.query(User).filter(User.mobile == mobile).first()
+
+
+def _insert_user(db: Session, new_user: User) -> Optional[UserSnapshot]:
+    db.add(new_user)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        return None
+    # Snapshot before commit so reading the row back needs no extra SELECT.
+    snapshot = UserSnapshot(new_user)
+    db.commit()
+    return snapshot
+
+
+def _save_password_hash(db: Session, user_id: int, password_hash: str):
+    db.query(User).filter(User.id == user_id).update({User.password: password_hash})
+    db.commit()
+
+
+def _update_user_profile(db: Session, user_id: int, data: RegisterUser):
+    db_user = db.query(User).filter(User.id == user_id).first()
+    if db_user is None:
+        return None
+
+    location_changed = (db_user.state, db_user.district, db_user.village) != (
+        data.state,
+        data.district,
+        data.village,
+    )
+
+    db_user.name = data.name
+    db_user.email = data.email
+    db_user.state = data.state
+    db_user.district = data.district
+    db_user.village = data.village
+
+    if location_changed:
+        db_user.latitude = None
+        db_user.longitude = None
+        db_user.geo_label = None
+
+    db.commit()
+    return (UserSnapshot(db_user), location_changed)
+
+
+# ---------------- PUBLIC ROUTES ----------------
+
+@app.post("/register")
+async def register(user: RegisterUser, background_tasks: BackgroundTasks, db=Depends(get_db_session)):
+    role = (user.role or "").strip().lower()
+
+    if role not in {"farmer", "consumer"}:
+        raise HTTPException(status_code=422, detail="Invalid role.")
+
+    missing = _missing_required_fields(user, role)
     if missing:
         raise HTTPException(
             status_code=422,
@@ -285,20 +911,9 @@ def register(user: RegisterUser, db: Session = Depends(get_db)):
         )
 
     try:
-        existing_user = db.query(User).filter(User.mobile == user.mobile).first()
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Mobile number already registered")
-    except OperationalError as e:
-        raise HTTPException(
-            status_code=503,
-            detail=(
-                "Database unreachable. If you're using Supabase and your network is IPv4-only, "
-                "use the Supabase Session pooler DATABASE_URL (aws-0-<region>.pooler.supabase.com:5432). "
-                f"Error: {e.__class__.__name__}"
-            ),
-        )
-    except SQLAlchemyError as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {e.__class__.__name__}")
+        password_hash = await hash_password_async(user.password)
+    except PasswordHasherBusy:
+        raise _password_hasher_busy()
 
     new_user = User(
         name=user.name,
@@ -307,7 +922,7 @@ def register(user: RegisterUser, db: Session = Depends(get_db)):
         alternate_phone=user.alternate_phone,
         aadhar_number=user.aadhar_number,
         email=user.email,
-        password=hash_password(user.password),
+        password=password_hash,
         state=user.state,
         district=user.district,
         village=user.village,
@@ -318,9 +933,9 @@ def register(user: RegisterUser, db: Session = Depends(get_db)):
         role=role
     )
 
+    # Single INSERT; the unique index on users.mobile rejects duplicates.
     try:
-        db.add(new_user)
-        db.commit()
+        saved = await _run_db(db, _insert_user, new_user)
     except OperationalError as e:
         raise HTTPException(
             status_code=503,
@@ -332,16 +947,23 @@ def register(user: RegisterUser, db: Session = Depends(get_db)):
         )
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {e.__class__.__name__}")
+    if saved is None:
+        raise HTTPException(status_code=400, detail="Mobile number already registered")
+
+    _USER_CACHE.invalidate(saved.id)
+    location_query = (saved.district or "").strip() or _build_location_query(saved)
+    if location_query:
+        background_tasks.add_task(_store_user_geo, saved.id, location_query, saved.state or "")
 
     return {"message": "Registered successfully"}
 
 
 
 @app.post("/login")
-def login(user: LoginUser, db: Session = Depends(get_db)):
+async def login(user: LoginUser, db=Depends(get_db_session)):
 
     try:
-        db_user = db.query(User).filter(User.mobile == user.mobile).first()
+        db_user = await _run_db(db, _find_user_by_mobile, user.mobile)
     except OperationalError as e:
         raise HTTPException(
             status_code=503,
@@ -355,20 +977,24 @@ def login(user: LoginUser, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Database error: {e.__class__.__name__}")
 
     if not db_user:
-        if USING_FALLBACK_DB:
+        if using_fallback_db():
             raise HTTPException(
                 status_code=503,
                 detail="Auth database is running in local fallback mode (Supabase unreachable). Please register again locally or restore DATABASE_URL connectivity.",
             )
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
-    if not verify_password(user.password, db_user.password):
+    try:
+        valid, new_hash = await verify_and_update_password_async(user.password, db_user.password)
+    except PasswordHasherBusy:
+        raise _password_hasher_busy()
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
     access_token = create_access_token(
-        {"user_id": db_user.id, "role": db_user.role}
+        {"user_id": db_user.id, "role": db_user.role, "db": _token_db()}
     )
-    return {
+    response = {
         "message": "Login success",
         "role": db_user.role,
         "user_id": db_user.id,
@@ -383,16 +1009,30 @@ def login(user: LoginUser, db: Session = Depends(get_db)):
         },
     }
 
+    if new_hash:
+        # Stored hash used a different bcrypt cost; upgrade it transparently.
+        try:
+            await _run_db(db, _save_password_hash, db_user.id, new_hash)
+        except SQLAlchemyError as e:
+            print(f"[WARN] Password rehash for user {db_user.id} failed: {e.__class__.__name__}")
+
+    return response
+
 
 # ---------------- COMMON PROTECTED ROUTES ----------------
 
 @app.get("/profile")
-def get_profile(user=Depends(get_current_user),
-                db: Session = Depends(get_db)):
+async def get_profile(request: Request,
+                      user=Depends(get_current_user),
+                      db=Depends(get_db_session)):
 
-    db_user = db.query(User).filter(User.id == user["user_id"]).first()
+    db_user = _USER_CACHE.get(user["user_id"])
+    if db_user is None:
+        db_user = await _run_db(db, _query_user, user["user_id"])
+    if not db_user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    return {
+    profile = {
         "name": db_user.name,
         "mobile": db_user.mobile,
         "email": db_user.email,
@@ -402,24 +1042,300 @@ def get_profile(user=Depends(get_current_user),
         "village": db_user.village,
         "pincode": db_user.pincode,
     }
+    # Always revalidated, so an edit shows up on the next poll; unchanged profiles are a bodyless 304.
+    return conditional_json(request, profile, "private, no-cache")
 
 
 @app.put("/profile")
-def update_profile(data: RegisterUser,
-                   user=Depends(get_current_user),
-                   db: Session = Depends(get_db)):
+async def update_profile(data: RegisterUser,
+                         background_tasks: BackgroundTasks,
+                         user=Depends(get_current_user),
+                         db=Depends(get_db_session)):
 
-    db_user = db.query(User).filter(User.id == user["user_id"]).first()
+    updated = await _run_db(db, _update_user_profile, user["user_id"], data)
+    if updated is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    db_user, location_changed = updated
+    _USER_CACHE.invalidate(db_user.id)
 
-    db_user.name = data.name
-    db_user.email = data.email
-    db_user.state = data.state
-    db_user.district = data.district
-    db_user.village = data.village
+    if location_changed:
+        # Coordinates were cleared; the farmer rejoins the index once the new place is geocoded.
+        _FARMER_INDEX.remove(db_user.id)
+        location_query = (db_user.district or "").strip() or _build_location_query(db_user)
+        if location_query:
+            background_tasks.add_task(_store_user_geo, db_user.id, location_query, db_user.state or "")
 
-    db.commit()
     return {"message": "Profile updated"}
 
+# ---------------- EMPLOYEE ROUTES ----------------
+
+def _require_employee(user: dict):
+    if user.get("role") != "employee":
+        raise HTTPException(status_code=403, detail="Employee only access")
+
+
+def _insert_user_batch(rows: List[dict]):
+    db = SessionLocal()
+    try:
+        return insert_user_rows(db, rows)
+    finally:
+        db.close()
+
+
+@app.post("/admin/users/import")
+async def import_users(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: Optional[str] = None,
+    role: str = "farmer",
+    user=Depends(get_current_user),
+):
+    _require_employee(user)
+
+    fmt = (format or "").strip().lower()
+    if not fmt:
+        content_type = request.headers.get("content-type", "")
+        fmt = "ndjson" if "json" in content_type else "csv"
+    if fmt not in {"csv", "ndjson"}:
+        raise HTTPException(status_code=422, detail="format must be csv or ndjson")
+
+    report = {"received": 0, "inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    seen_mobiles = set()
+    imported_farmers: List[str] = []
+
+    def fail(row_no: int, mobile, detail: str):
+        report["failed"] += 1
+        if len(report["errors"]) < USER_IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row_no, "mobile": mobile, "detail": detail})
+        else:
+            report["errors_truncated"] = True
+
+    async def flush(batch):
+        try:
+            hashes = await hash_passwords_async([u.password for _, u, _ in batch])
+        except PasswordHasherBusy:
+            for row_no, u, _ in batch:
+                fail(row_no, u.mobile, "Server is busy, please retry these rows.")
+            return
+
+        rows = [
+            {
+                "name": u.name,
+                "age": u.age,
+                "mobile": u.mobile,
+                "alternate_phone": u.alternate_phone,
+                "aadhar_number": u.aadhar_number,
+                "email": u.email,
+                "password": h,
+                "state": u.state,
+                "district": u.district,
+                "village": u.village,
+                "pincode": u.pincode,
+                "soil_type": u.soil_type,
+                "land_area": u.land_area,
+                "primary_crops": u.primary_crops,
+                "role": r,
+            }
+            for (_, u, r), h in zip(batch, hashes)
+        ]
+        try:
+            inserted = await run_in_threadpool(_insert_user_batch, rows)
+        except SQLAlchemyError as e:
+            for row_no, u, _ in batch:
+                fail(row_no, u.mobile, f"Database error: {e.__class__.__name__}")
+            return
+
+        report["inserted"] += len(inserted)
+        for row_no, u, r in batch:
+            if u.mobile not in inserted:
+                fail(row_no, u.mobile, "Mobile number already registered")
+            elif r == "farmer":
+                imported_farmers.append(u.mobile)
+
+    batch = []
+    async for row_no, item in iter_upload_rows(request.stream(), fmt):
+        report["received"] += 1
+        if isinstance(item, Exception):
+            fail(row_no, None, f"Unreadable row: {item}")
+            continue
+
+        fields = {
+            k.strip(): (v.strip() if isinstance(v, str) else v)
+            for k, v in item.items()
+            if isinstance(k, str) and k.strip()
+        }
+        fields = {k: v for k, v in fields.items() if v is not None and v != ""}
+        fields.setdefault("role", role)
+        mobile = fields.get("mobile")
+
+        try:
+            parsed = RegisterUser(**fields)
+        except ValidationError as e:
+            detail = "; ".join(
+                f"{'.'.join(str(p) for p in err.get('loc', ()))}: {err.get('msg')}" for err in e.errors()
+            )
+            fail(row_no, mobile, detail)
+            continue
+
+        row_role = (parsed.role or "").strip().lower()
+        if row_role not in {"farmer", "consumer"}:
+            fail(row_no, parsed.mobile, "Invalid role.")
+            continue
+        missing = _missing_required_fields(parsed, row_role)
+        if missing:
+            fail(row_no, parsed.mobile, f"Missing required fields: {', '.join(missing)}.")
+            continue
+        if parsed.mobile in seen_mobiles:
+            fail(row_no, parsed.mobile, "Duplicate mobile number in upload")
+            continue
+        seen_mobiles.add(parsed.mobile)
+
+        batch.append((row_no, parsed, row_role))
+        if len(batch) >= USER_IMPORT_BATCH_SIZE:
+            await flush(batch)
+            batch = []
+
+    if batch:
+        await flush(batch)
+
+    if imported_farmers:
+        background_tasks.add_task(_store_imported_geo, imported_farmers)
+    report["errors"].sort(key=lambda err: err["row"])
+    return report
+
+
+_USER_DIRECTORY_FIELDS = (
+    "id",
+    "name",
+    "age",
+    "mobile",
+    "alternate_phone",
+    "email",
+    "role",
+    "state",
+    "district",
+    "village",
+    "pincode",
+    "soil_type",
+    "land_area",
+    "primary_crops",
+)
+USER_DIRECTORY_MAX_LIMIT = 500
+
+
+def _user_directory_query(db: Session, role, state, district, village, pincode):
+    columns = [getattr(User, f) for f in _USER_DIRECTORY_FIELDS]
+    q = db.query(*columns)
+    for column, value in [
+        (User.role, role),
+        (User.state, state),
+        (User.district, district),
+        (User.village, village),
+        (User.pincode, pincode),
+    ]:
+        if value is not None and value.strip():
+            q = q.filter(column == value.strip())
+    return q
+
+
+def _list_users_page(db: Session, filters: dict, after_id: Optional[int], limit: int):
+    q = _user_directory_query(db, **filters)
+    if after_id is not None:
+        q = q.filter(User.id > after_id)
+    rows = q.order_by(User.id).limit(limit + 1).all()
+    return [dict(zip(_USER_DIRECTORY_FIELDS, row)) for row in rows]
+
+
+@app.get("/admin/users")
+async def list_users(
+    role: Optional[str] = None,
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    village: Optional[str] = None,
+    pincode: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    user=Depends(get_current_user),
+    db=Depends(get_db_session),
+):
+    _require_employee(user)
+    limit = max(1, min(limit, USER_DIRECTORY_MAX_LIMIT))
+
+    after = decode_cursor(cursor)
+    after_id = None
+    if after is not None:
+        if len(after) != 1 or not isinstance(after[0], int):
+            raise HTTPException(status_code=422, detail="Invalid cursor")
+        after_id = after[0]
+
+    filters = {"role": role, "state": state, "district": district, "village": village, "pincode": pincode}
+    items = await _run_db(db, _list_users_page, filters, after_id, limit)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([items[-1]["id"]])
+
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
+
+
+@app.get("/admin/users/export")
+def export_users(
+    format: str = "csv",
+    role: Optional[str] = None,
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    village: Optional[str] = None,
+    pincode: Optional[str] = None,
+    user=Depends(get_current_user),
+):
+    _require_employee(user)
+    fmt = (format or "").strip().lower()
+    if fmt not in {"csv", "ndjson"}:
+        raise HTTPException(status_code=422, detail="format must be csv or ndjson")
+
+    filters = {"role": role, "state": state, "district": district, "village": village, "pincode": pincode}
+
+    def rows():
+        # Own session: the response body is produced after the request scope ends.
+        db = SessionLocal()
+        try:
+            q = (
+                _user_directory_query(db, **filters)
+                .order_by(User.id)
+                .execution_options(stream_results=True, yield_per=1000)
+            )
+            if fmt == "csv":
+                buf = io.StringIO()
+                writer = csv.writer(buf)
+                writer.writerow(_USER_DIRECTORY_FIELDS)
+                for i, row in enumerate(q, start=1):
+                    writer.writerow(row)
+                    if i % 1000 == 0:
+                        yield buf.getvalue()
+                        buf.seek(0)
+                        buf.truncate()
+                yield buf.getvalue()
+            else:
+                chunk = []
+                for row in q:
+                    chunk.append(json.dumps(dict(zip(_USER_DIRECTORY_FIELDS, row)), separators=(",", ":")))
+                    if len(chunk) >= 1000:
+                        yield "\n".join(chunk) + "\n"
+                        chunk = []
+                if chunk:
+                    yield "\n".join(chunk) + "\n"
+        finally:
+            db.close()
+
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{fmt}"'},
+    )
+
+
 # ---------------- FARMER ROUTES ----------------
 
 @app.get("/farmer/dashboard")
@@ -431,12 +1347,683 @@ def farmer_dashboard(user=Depends(get_current_user)):
     return {"message": "Welcome Farmer"}
 
 
+def _update_farmer_crop(db: Session, farmer_id: int, data: FarmerCropUpdate) -> Optional[Tuple[float, float]]:
+    db_user = db.query(User).filter(User.id == farmer_id).first()
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    changes = data.model_dump(exclude_unset=True)
+    if "sowingDate" in changes:
+        sowing = changes["sowingDate"]
+        if sowing is not None and sowing.tzinfo is not None:
+            sowing = sowing.astimezone(timezone.utc).replace(tzinfo=None)
+        db_user.sowing_date = sowing
+    if "expectedHarvestDays" in changes:
+        db_user.expected_harvest_days = changes["expectedHarvestDays"]
+    if "soilMoisturePercent" in changes:
+        db_user.soil_moisture_percent = changes["soilMoisturePercent"]
+    db.commit()
+    return db_user.latitude, db_user.longitude
+
+
+@app.put("/farmer/crop")
+async def update_farmer_crop(
+    data: FarmerCropUpdate,
+    background_tasks: BackgroundTasks,
+    user=Depends(get_current_user),
+    db=Depends(get_db_session),
+):
+    _require_farmer(user)
+    lat, lng = await _run_db(db, _update_farmer_crop, user["user_id"], data)
+    background_tasks.add_task(_evaluate_farmer_alerts, user["user_id"], lat, lng)
+    return {"message": "Crop updated"}
+
+
+_ALERT_FIELDS = ("id", "rule_id", "severity", "message", "created_at", "updated_at")
+
+
+def _list_farmer_alerts(db: Session, farmer_id: int) -> List[dict]:
+    rows = (
+        db.query(*[getattr(Alert, f) for f in _ALERT_FIELDS])
+        .filter(Alert.farmer_id == farmer_id, Alert.active.is_(True), Alert.dismissed.is_(False))
+        .order_by(Alert.created_at.desc())
+        .all()
+    )
+    return [
+        {
+            "id": row.id,
+            "ruleId": row.rule_id,
+            "severity": row.severity,
+            "message": row.message,
+            "createdAt": row.created_at.isoformat() + "Z",
+            "updatedAt": row.updated_at.isoformat() + "Z",
+        }
+        for row in rows
+    ]
+
+
+def _dismiss_alert(db: Session, alert_id: int, farmer_id: int) -> bool:
+    alert = db.query(Alert).filter(Alert.id == alert_id, Alert.farmer_id == farmer_id).first()
+    if alert is None:
+        return False
+    if not alert.dismissed:
+        alert.dismissed = True
+        alert.dismissed_at = datetime.utcnow()
+        db.commit()
+    return True
+
+
+@app.get("/farmer/alerts")
+async def farmer_alerts(user=Depends(get_current_user), db=Depends(get_db_session)):
+    _require_farmer(user)
+    return {"items": await _run_db(db, _list_farmer_alerts, user["user_id"])}
+
+
+@app.post("/farmer/alerts/{alert_id}/dismiss")
+async def dismiss_farmer_alert(alert_id: int, user=Depends(get_current_user), db=Depends(get_db_session)):
+    _require_farmer(user)
+    if not await _run_db(db, _dismiss_alert, alert_id, user["user_id"]):
+        raise HTTPException(status_code=404, detail="Alert not found")
+    _publish_alerts_changed([user["user_id"]])
+    return {"message": "Alert dismissed"}
+
+
+EARNINGS_SERIES_MAX_DAYS = 366
+EARNINGS_SERIES_MAX_MONTHS = 120
+
+
+def _record_farmer_sale(db: Session, farmer_id: int, data: SaleCreate) -> dict:
+    price = data.pricePerKg
+    crop = data.crop
+    place = None
+    if data.listingId is not None:
+        item = db.query(MarketItem).filter(MarketItem.id == data.listingId).first()
+        if item is None or item.farmer_id != farmer_id:
+            raise HTTPException(status_code=404, detail="Listing not found")
+        if price is None:
+            price = effective_price_per_kg(item.price_per_kg, item.is_urgent_deal, item.discount_percent)
+        crop = crop or item.crop
+        place = item
+    if price is None:
+        raise HTTPException(status_code=422, detail="pricePerKg is required without listingId")
+
+    sold_at = data.soldAt
+    if sold_at is not None and sold_at.tzinfo is not None:
+        sold_at = sold_at.astimezone(timezone.utc).replace(tzinfo=None)
+    sale = record_sale(
+        db,
+        farmer_id=farmer_id,
+        quantity_kg=data.quantityKg,
+        amount=round(data.quantityKg * price, 2),
+        sold_at=sold_at,
+        listing_id=data.listingId,
+        crop=_normalize_text(crop) if crop else None,
+    )
+    # Priced where the listing is, or where the farmer is for off-platform sales. Self-reported, so
+    # filed apart from order sales and kept out of price suggestions.
+    place = place or _USER_CACHE.get(farmer_id) or _query_user(db, farmer_id)
+    if place is not None:
+        record_price(
+            db,
+            kind="reported",
+            crop=crop,
+            district=place.district,
+            state=place.state,
+            price_per_kg=price,
+            quantity_kg=data.quantityKg,
+            at=sale.sold_at,
+        )
+    db.commit()
+    return {"id": sale.id, "amount": sale.amount, "soldAt": sale.sold_at.isoformat() + "Z"}
+
+
+@app.post("/farmer/sales", status_code=201)
+async def create_farmer_sale(data: SaleCreate, user=Depends(get_current_user), db=Depends(get_db_session)):
+    _require_farmer(user)
+    return await _run_db(db, _record_farmer_sale, user["user_id"], data)
+
+
+@app.get("/farmer/earnings")
+async def farmer_earnings(user=Depends(get_current_user), db=Depends(get_db_session)):
+    _require_farmer(user)
+    return await _run_db(db, earnings_summary, user["user_id"])
+
+
+@app.get("/farmer/earnings/series")
+async def farmer_earnings_series(
+    granularity: str = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    user=Depends(get_current_user),
+    db=Depends(get_db_session),
+):
+    _require_farmer(user)
+    if granularity not in {"day", "month"}:
+        raise HTTPException(status_code=422, detail="granularity must be day or month")
+    end = end or local_day(datetime.utcnow())
+    if granularity == "day":
+        start = start or end - timedelta(days=29)
+        too_long = (end - start).days + 1 > EARNINGS_SERIES_MAX_DAYS
+    else:
+        start = start or date(end.year - 1, end.month, 1)
+        too_long = (end.year - start.year) * 12 + end.month - start.month + 1 > EARNINGS_SERIES_MAX_MONTHS
+    if start > end or too_long:
+        raise HTTPException(status_code=422, detail="Invalid or too long date range")
+
+    series = await _run_db(db, earnings_series, user["user_id"], granularity, start, end)
+    return {"granularity": granularity, "start": start.isoformat(), "end": end.isoformat(), "items": series}
+
+
+_NEARBY_FARMER_FIELDS = ("id", "name", "village", "district", "state", "geo_label")
+
+
+def _fetch_farmers(db: Session, ids: List[int]) -> dict:
+    if not ids:
+        return {}
+    columns = [getattr(User, f) for f in _NEARBY_FARMER_FIELDS]
+    rows = db.query(*columns).filter(User.id.in_(ids), User.role == "farmer").all()
+    return {row[0]: dict(zip(_NEARBY_FARMER_FIELDS, row)) for row in rows}
+
+
+@app.get("/farmers/nearby")
+async def nearby_farmers(
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    location: Optional[str] = None,
+    radius_km: float = 25,
+    k: Optional[int] = None,
+    limit: int = 50,
+    user=Depends(get_current_user),
+    db=Depends(get_db_session),
+):
+    # radius_km: everyone within the radius (nearest first, up to limit); k: the k nearest.
+    point = await _resolve_point(lat, lng, location)
+    if point is None:
+        raise HTTPException(status_code=422, detail="Give lat/lng or location")
+    limit = max(1, min(limit, 500))
+
+    if k is not None:
+        _require_farmer_index()
+        hits = _FARMER_INDEX.nearest(point[0], point[1], max(1, min(k, limit)))
+    else:
+        hits = _nearby_farmers(point, radius_km, limit)
+
+    farmers = await _run_db(db, _fetch_farmers, [i for i, _ in hits])
+    items = [{**farmers[i], "distance_km": round(d, 2)} for i, d in hits if i in farmers]
+    return {"latitude": point[0], "longitude": point[1], "items": items}
+
+
+# ---------------- MARKET ROUTES ----------------
+
+MARKET_SEARCH_MAX_OFFSET = 1000
+MARKET_PRICES_MAX_AGE_S = int(os.getenv("MARKET_PRICES_MAX_AGE_S", "60"))
+NEARBY_MAX_FARMERS = int(os.getenv("NEARBY_MAX_FARMERS", "5000"))
+
+
+async def _resolve_point(lat: Optional[float], lng: Optional[float], location: Optional[str]):
+    if lat is not None or lng is not None:
+        if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise HTTPException(status_code=422, detail="lat and lng must both be given and in range")
+        return lat, lng
+    if location and location.strip():
+        name, state_hint, _ = _split_location_text(location)
+        geo = await _geocode_best_async(name=name, state_hint=state_hint)
+        if not geo:
+            raise HTTPException(status_code=404, detail="Location not found")
+        return float(geo["latitude"]), float(geo["longitude"])
+    return None
+
+
+def _require_farmer_index():
+    if not _FARMER_INDEX.ready:
+        raise HTTPException(
+            status_code=503, detail="Location index is warming up, please retry.", headers={"Retry-After": "5"}
+        )
+
+
+def _nearby_farmers(point: Tuple[float, float], radius_km: float, limit: int) -> List[Tuple[int, float]]:
+    _require_farmer_index()
+    if not 0 < radius_km <= SPATIAL_MAX_RADIUS_KM:
+        raise HTTPException(status_code=422, detail=f"radius_km must be in (0, {SPATIAL_MAX_RADIUS_KM:g}]")
+    return _FARMER_INDEX.within(point[0], point[1], radius_km, limit=limit)
+
+
+def _require_farmer(user: dict):
+    if user.get("role") != "farmer":
+        raise HTTPException(status_code=403, detail="Farmer only access")
+
+
+def _publish_listing(action: str, item_id: int, item: Optional[dict] = None):
+    # Coalesced per listing: a slow client only ever sees the latest state of each item.
+    _EVENTS.publish_topic(
+        "market", "marketItem", {"action": action, "id": item_id, "item": item}, coalesce_key=f"item:{item_id}"
+    )
+
+
+def _index_listing(item: MarketItem):
+    _SEARCH_INDEX.add(item.id, item.product_name, item.crop, item.category, item.district)
+
+
+_ASK_FIELDS = ("price_per_kg", "crop", "district", "state", "priced_at")
+
+
+def _record_ask(db: Session, ask: dict, retract: bool = False):
+    # The index holds one ask per live listing: re-pricing or deleting one takes its old ask back out.
+    if ask["priced_at"] is None:
+        return  # listed before the price index existed and not picked up by a rebuild
+    record_price(
+        db,
+        kind="ask",
+        crop=ask["crop"],
+        district=ask["district"],
+        state=ask["state"],
+        price_per_kg=ask["price_per_kg"],
+        at=ask["priced_at"],
+        retract=retract,
+    )
+
+
+def _ask_of(item: MarketItem) -> dict:
+    return {name: getattr(item, name) for name in _ASK_FIELDS}
+
+
+def _create_market_item(db: Session, farmer_id: int, data: MarketItemCreate) -> Optional[dict]:
+    farmer = _USER_CACHE.get(farmer_id) or _query_user(db, farmer_id)
+    if farmer is None:
+        return None
+    changes = data.model_dump()
+    changes["crop"] = _normalize_text(data.crop or data.productName)
+    changes["district"] = data.district or farmer.district
+    changes["state"] = data.state or farmer.state
+    changes["location"] = data.location or ", ".join(
+        p for p in [farmer.village, farmer.district, farmer.state] if p
+    )
+
+    item = MarketItem(farmer_id=farmer.id, farmer_name=farmer.name, priced_at=datetime.utcnow())
+    apply_item_changes(item, changes)
+    db.add(item)
+    _record_ask(db, _ask_of(item))
+    db.commit()
+    db.refresh(item)
+    _index_listing(item)
+    return item_to_dict(item)
+
+
+def _update_market_item(db: Session, item_id: int, farmer_id: int, data: MarketItemUpdate) -> Optional[dict]:
+    # Row lock: two edits racing would both take back the same old ask.
+    item = db.query(MarketItem).filter(MarketItem.id == item_id).with_for_update().first()
+    if item is None:
+        return None
+    if item.farmer_id != farmer_id:
+        raise HTTPException(status_code=403, detail="Not your listing")
+    changes = data.model_dump(exclude_unset=True)
+    if changes.get("crop"):
+        changes["crop"] = _normalize_text(changes["crop"])
+    elif "crop" in changes:
+        del changes["crop"]
+    old_ask = _ask_of(item)
+    apply_item_changes(item, changes)
+    if any(getattr(item, name) != old_ask[name] for name in _ASK_FIELDS[:-1]):
+        _record_ask(db, old_ask, retract=True)
+        item.priced_at = datetime.utcnow()
+        _record_ask(db, _ask_of(item))
+    db.commit()
+    db.refresh(item)
+    _index_listing(item)
+    return item_to_dict(item)
+
+
+def _delete_market_item(db: Session, item_id: int, farmer_id: int) -> bool:
+    item = db.query(MarketItem).filter(MarketItem.id == item_id).with_for_update().first()
+    if item is None:
+        return False
+    if item.farmer_id != farmer_id:
+        raise HTTPException(status_code=403, detail="Not your listing")
+    _record_ask(db, _ask_of(item), retract=True)
+    db.delete(item)
+    db.commit()
+    _SEARCH_INDEX.remove(item_id)
+    return True
+
+
+@app.get("/market/items")
+async def list_market_items(
+    category: Optional[str] = None,
+    crop: Optional[str] = None,
+    district: Optional[str] = None,
+    farmer_id: Optional[int] = None,
+    sort: str = "created",
+    order: Optional[str] = None,
+    fields: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    lat: Optional[float] = None,
+    lng: Optional[float] = None,
+    location: Optional[str] = None,
+    radius_km: float = 25,
+    db=Depends(get_db_session),
+):
+    if sort not in SORTS:
+        raise HTTPException(status_code=422, detail=f"sort must be one of {', '.join(SORTS)}")
+    if order is None:
+        # Nearest first by default; newest/highest first for the other keys.
+        order = "asc" if sort == "distance" else "desc"
+    if order not in {"asc", "desc"}:
+        raise HTTPException(status_code=422, detail="order must be asc or desc")
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    limit = max(1, min(limit, MARKET_PAGE_MAX_LIMIT))
+
+    # The sort/order are part of the cursor so a page can't be continued under a different ordering.
+    after = decode_cursor(cursor)
+    if after is not None:
+        if len(after) != 4 or after[0] != sort or after[1] != order:
+            raise HTTPException(status_code=422, detail="Invalid cursor")
+        after = after[2:]
+
+    distances = None
+    point = await _resolve_point(lat, lng, location)
+    if point is not None:
+        distances = dict(_nearby_farmers(point, radius_km, NEARBY_MAX_FARMERS))
+    elif sort == "distance":
+        raise HTTPException(status_code=422, detail="sort=distance needs lat/lng or location")
+
+    try:
+        items, next_after = await _run_db(
+            db,
+            lambda s: list_items_page(
+                s,
+                category=(category or "").strip() or None,
+                crop=_normalize_text(crop) if crop else None,
+                district=(district or "").strip() or None,
+                sort=sort,
+                descending=order == "desc",
+                after=after,
+                limit=limit,
+                fields=projection,
+                farmer_ids=[farmer_id] if farmer_id is not None else None,
+                distances=distances,
+            ),
+        )
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+
+    next_cursor = encode_cursor([sort, order] + next_after) if next_after else None
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
+
+
+def _fetch_market_items(db: Session, ids: List[int], fields: Optional[List[str]]) -> List[dict]:
+    if not ids:
+        return []
+    by_id = {item.id: item for item in db.query(MarketItem).filter(MarketItem.id.in_(ids)).all()}
+    return [item_to_dict(by_id[i], fields) for i in ids if i in by_id]
+
+
+@app.get("/market/search")
+async def search_market_items(
+    q: str,
+    fields: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    db=Depends(get_db_session),
+):
+    if not _SEARCH_INDEX.ready:
+        raise HTTPException(
+            status_code=503, detail="Search is warming up, please retry.", headers={"Retry-After": "5"}
+        )
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    limit = max(1, min(limit, MARKET_PAGE_MAX_LIMIT))
+    offset = max(0, min(offset, MARKET_SEARCH_MAX_OFFSET))
+
+    ids, has_more = _SEARCH_INDEX.search(q, limit=limit, offset=offset)
+    items = await _run_db(db, _fetch_market_items, ids, projection)
+    return {"items": items, "has_more": has_more, "limit": limit, "offset": offset}
+
+
+def _market_prices(db: Session, crop: str, district: Optional[str], state: str) -> dict:
+    now = datetime.utcnow()
+    regions = []
+    for scope, region in price_keys(district, state):
+        summary = price_summary(db, scope, region, crop, now)
+        summary["scope"] = scope
+        regions.append(summary)
+    return {
+        "crop": crop,
+        "district": district,
+        "state": state,
+        "regions": regions,
+        "suggestedPrice": suggest_price(regions),
+        # The day, not the instant, so an unchanged index keeps its ETag and pollers get 304s.
+        "asOf": local_day(now).isoformat(),
+    }
+
+
+@app.get("/market/prices")
+async def market_prices(
+    request: Request,
+    crop: str,
+    state: Optional[str] = None,
+    district: Optional[str] = None,
+    user=Depends(get_current_user),
+    db=Depends(get_db_session),
+):
+    # Without state/district, prices for the caller's own district.
+    if not _normalize_text(crop):
+        raise HTTPException(status_code=422, detail="crop is required")
+    if not (state or "").strip():
+        profile = _USER_CACHE.get(user["user_id"]) or await _run_db(db, _query_user, user["user_id"])
+        if profile is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        state, district = profile.state, district or profile.district
+    if not _normalize_text(state):
+        raise HTTPException(status_code=422, detail="state is required")
+    payload = await _run_db(
+        db, _market_prices, _normalize_text(crop), _normalize_text(district) or None, _normalize_text(state)
+    )
+    return conditional_json(request, payload, f"private, max-age={MARKET_PRICES_MAX_AGE_S}")
+
+
+@app.get("/market/search/suggest")
+def suggest_market_terms(q: str, limit: int = 10):
+    return {"suggestions": _SEARCH_INDEX.suggest(q, limit=max(1, min(limit, 20)))}
+
+
+@app.post("/market/items", status_code=201)
+async def create_market_item(data: MarketItemCreate, user=Depends(get_current_user), db=Depends(get_db_session)):
+    _require_farmer(user)
+    item = await _run_db(db, _create_market_item, user["user_id"], data)
+    if item is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    _publish_listing("created", item["id"], item)
+    return item
+
+
+@app.put("/market/items/{item_id}")
+async def update_market_item(
+    item_id: int, data: MarketItemUpdate, user=Depends(get_current_user), db=Depends(get_db_session)
+):
+    _require_farmer(user)
+    item = await _run_db(db, _update_market_item, item_id, user["user_id"], data)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    _publish_listing("updated", item_id, item)
+    return item
+
+
+@app.delete("/market/items/{item_id}")
+async def delete_market_item(item_id: int, user=Depends(get_current_user), db=Depends(get_db_session)):
+    _require_farmer(user)
+    if not await _run_db(db, _delete_market_item, item_id, user["user_id"]):
+        raise HTTPException(status_code=404, detail="Listing not found")
+    _publish_listing("deleted", item_id)
+    return {"message": "Listing deleted"}
+
+
+# ---------------- ORDER ROUTES ----------------
+
+# ORDER_BATCHING=0 runs each order in its own transaction; the conditional stock UPDATE keeps
+# both modes correct, batching just stops a hot listing from serialising every buyer on one row lock.
+ORDER_BATCHING = os.getenv("ORDER_BATCHING", "1").strip().lower() not in {"0", "false", "no"}
+
+
+def _place_listing_orders(listing_id: int, requests: List[OrderRequest]) -> list:
+    db = SessionLocal()
+    try:
+        return place_order_batch(db, requests)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+_ORDER_QUEUE = KeyedBatchQueue(_place_listing_orders)
+
+
+def _order_preflight(db: Session, user_id: int, data: OrderCreate, idempotency_key: Optional[str]):
+    try:
+        consumer = _USER_CACHE.get(user_id) or _query_user(db, user_id)
+        if consumer is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        req = OrderRequest(consumer.id, consumer.name, data.listingId, data.quantityKg, idempotency_key)
+        existing = find_order_by_key(db, user_id, idempotency_key) if idempotency_key else None
+        return req, order_to_dict(check_replay(existing, req)) if existing is not None else None
+    finally:
+        # Hand the connection back before waiting on the order queue, which uses its own session.
+        db.rollback()
+
+
+@app.post("/orders", status_code=201)
+async def create_order(
+    data: OrderCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    user=Depends(get_current_user),
+    db=Depends(get_db_session),
+):
+    if user.get("role") not in {"consumer", "farmer"}:
+        raise HTTPException(status_code=403, detail="Only consumers and farmers can place orders")
+    if not 0 < data.quantityKg <= ORDER_MAX_QUANTITY_KG:
+        raise HTTPException(status_code=422, detail=f"quantityKg must be between 0 and {ORDER_MAX_QUANTITY_KG:g}")
+    idempotency_key = (idempotency_key or "").strip() or None
+    if idempotency_key and len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=422, detail="Idempotency-Key is too long")
+
+    # Client retries normally end here without touching the listing row.
+    req, replay = await _run_db(db, _order_preflight, user["user_id"], data, idempotency_key)
+    if replay is not None:
+        response.status_code = 200
+        response.headers["Idempotent-Replayed"] = "true"
+        return replay
+
+    if ORDER_BATCHING:
+        order, replayed, notes = await _ORDER_QUEUE.submit(data.listingId, req)
+    else:
+        result = (await run_in_threadpool(_place_listing_orders, data.listingId, [req]))[0]
+        if isinstance(result, Exception):
+            raise result
+        order, replayed, notes = result
+    for user_id, note in notes:
+        _EVENTS.publish_user(user_id, "notification", note)
+    if notes:
+        # Stock changed; listeners refetch the listing (or drop it once it hits zero).
+        _publish_listing("updated", data.listingId)
+    if replayed:
+        response.status_code = 200
+        response.headers["Idempotent-Replayed"] = "true"
+    return order
+
+
+@app.get("/orders")
+async def list_orders(cursor: Optional[str] = None, limit: int = 20, user=Depends(get_current_user), db=Depends(get_db_session)):
+    limit = max(1, min(limit, MARKET_PAGE_MAX_LIMIT))
+    after = decode_cursor(cursor)
+    if after is not None and (len(after) != 1 or not isinstance(after[0], int)):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    items, has_more = await _run_db(db, list_orders_page, user["user_id"], after[0] if after else None, limit)
+    next_cursor = encode_cursor([items[-1]["id"]]) if has_more else None
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
+
+
+@app.get("/notifications")
+async def list_notifications(
+    unread: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    user=Depends(get_current_user),
+    db=Depends(get_db_session),
+):
+    limit = max(1, min(limit, MARKET_PAGE_MAX_LIMIT))
+    after = decode_cursor(cursor)
+    if after is not None and (len(after) != 1 or not isinstance(after[0], int)):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    items, has_more = await _run_db(db, list_notifications_page, user["user_id"], unread, after[0] if after else None, limit)
+    next_cursor = encode_cursor([items[-1]["id"]]) if has_more else None
+    return {"items": items, "next_cursor": next_cursor, "limit": limit}
+
+
+@app.post("/notifications/{notification_id}/read")
+async def read_notification(notification_id: int, user=Depends(get_current_user), db=Depends(get_db_session)):
+    if not await _run_db(db, mark_notification_read, notification_id, user["user_id"]):
+        raise HTTPException(status_code=404, detail="Notification not found")
+    return {"message": "Notification marked as read"}
+
+
+# ---------------- EVENT STREAM ----------------
+
+def _get_stream_user(request: Request, access_token: Optional[str] = None):
+    # EventSource can't set headers, so browsers pass the same bearer token as ?access_token=.
+    header = request.headers.get("authorization", "")
+    token = header[7:] if header.lower().startswith("bearer ") else access_token
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return get_current_user(token)
+
+
+async def _event_stream(sub):
+    try:
+        yield b"retry: 5000\n" + sse_frame("ready", {"topics": sorted(sub.topics)})
+        while True:
+            for frame in await sub.next_frames():
+                yield frame
+    finally:
+        _EVENTS.unsubscribe(sub)
+
+
+@app.get("/events")
+async def event_stream(topics: Optional[str] = None, user=Depends(_get_stream_user)):
+    # Server-Sent Events: notifications and alert changes for the caller, plus opted-in public
+    # topics (topics=market for listing changes). Replaces per-tab polling of those tables.
+    wanted = {t.strip() for t in (topics or "").split(",") if t.strip()}
+    unknown = wanted - EVENT_TOPICS
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown topics: {', '.join(sorted(unknown))}")
+    try:
+        sub = _EVENTS.subscribe(user["user_id"], wanted)
+    except BrokerFull:
+        raise HTTPException(status_code=503, detail="Too many open event streams", headers={"Retry-After": "30"})
+    return StreamingResponse(
+        _event_stream(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # ---------------- WEATHER ROUTES ----------------
 
-@app.get("/weather")
-def weather_by_location(location: str):
+def _weather_cache_control(lat: float, lng: float, scope: str) -> str:
+    # Fresh until the cached forecast expires (the next model hour by default).
+    expires_at = _WEATHER_CACHE.expires_at(_WEATHER_CACHE.snap(lat, lng))
+    return f"{scope}, max-age={max_age_until(expires_at)}"
+
+
+async def _resolve_location(location: str) -> dict:
     name, state_hint, _ = _split_location_text(location)
-    geo = _open_meteo_geocode_best(name=name, state_hint=state_hint)
+    geo = await _geocode_best_async(name=name, state_hint=state_hint)
     if not geo:
         raise HTTPException(status_code=404, detail="Location not found")
 
@@ -445,26 +2032,76 @@ def weather_by_location(location: str):
     if lat is None or lng is None:
         raise HTTPException(status_code=502, detail="Geocoding API returned invalid coordinates")
 
-    weather = _open_meteo_weather(float(lat), float(lng))
-    label = _build_geo_label(geo) or (location or "").strip()
-
     return {
-        "location": {
-            "query": (location or "").strip(),
-            "label": label,
-            "lat": float(lat),
-            "lng": float(lng),
-        },
-        "weather": weather,
+        "query": (location or "").strip(),
+        "label": _build_geo_label(geo) or (location or "").strip(),
+        "lat": float(lat),
+        "lng": float(lng),
     }
 
 
+@app.get("/weather")
+async def weather_by_location(location: str, request: Request):
+    place = await _resolve_location(location)
+    weather = await _WEATHER_CACHE.get(place["lat"], place["lng"], _open_meteo_weather_async)
+    payload = {"location": place, "weather": weather}
+    return conditional_json(request, payload, _weather_cache_control(place["lat"], place["lng"], "public"))
+
+
+@app.get("/weather/forecast")
+async def weather_forecast(
+    location: str,
+    request: Request,
+    days: int = FORECAST_DAYS,
+    step: int = 1,
+    fields: Optional[str] = None,
+    hourly: bool = True,
+    daily: bool = True,
+):
+    # Hourly series from the current hour (step=3 gives 3-hour means, max for rain probability)
+    # and daily summaries from today. Served from the same cached fetch as /weather.
+    groups = FORECAST_FIELD_GROUPS
+    if fields:
+        groups = tuple(dict.fromkeys(f.strip().lower() for f in fields.split(",") if f.strip()))
+        unknown = [g for g in groups if g not in FORECAST_FIELD_GROUPS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown forecast fields: {', '.join(unknown)} (use {', '.join(FORECAST_FIELD_GROUPS)})",
+            )
+    days = max(1, min(days, FORECAST_DAYS))
+    step = max(1, min(step, FORECAST_MAX_STEP_HOURS))
+
+    place = await _resolve_location(location)
+    weather = await _WEATHER_CACHE.get(place["lat"], place["lng"], _open_meteo_weather_async)
+    forecast = getattr(weather, "forecast", None)
+    if forecast is None:
+        raise HTTPException(status_code=502, detail="Weather API returned no forecast")
+
+    now = time.time()
+    payload = {
+        "location": place,
+        "timezone": forecast.timezone,
+        "utcOffsetSeconds": forecast.utc_offset_s,
+        "fetchedAt": weather.get("fetchedAt"),
+    }
+    if hourly:
+        payload["hourly"] = forecast.hourly_window(now, days * 24, step, groups)
+    if daily:
+        payload["daily"] = forecast.daily_window(now, days, groups)
+    return conditional_json(request, payload, _weather_cache_control(place["lat"], place["lng"], "public"))
+
+
 @app.get("/weather/me")
-def weather_for_current_user(
+async def weather_for_current_user(
+    request: Request,
+    background_tasks: BackgroundTasks,
     user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db=Depends(get_db_session),
 ):
-    db_user = db.query(User).filter(User.id == user["user_id"]).first()
+    db_user = _USER_CACHE.get(user["user_id"])
+    if db_user is None:
+        db_user = await _run_db(db, _query_user, user["user_id"])
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -473,20 +2110,28 @@ def weather_for_current_user(
     location_query = district or _build_location_query(db_user)
     if not location_query:
         raise HTTPException(status_code=400, detail="User location not set")
+    _WEATHER_PREFETCHER.record_request(district, state)
 
-    geo = _open_meteo_geocode_best(name=location_query, state_hint=state)
-    if not geo:
-        raise HTTPException(status_code=404, detail="Location not found")
+    if db_user.latitude is not None and db_user.longitude is not None:
+        lat = db_user.latitude
+        lng = db_user.longitude
+        label = db_user.geo_label or location_query
+    else:
+        geo = await _geocode_best_async(name=location_query, state_hint=state)
+        if not geo:
+            raise HTTPException(status_code=404, detail="Location not found")
 
-    lat = geo.get("latitude")
-    lng = geo.get("longitude")
-    if lat is None or lng is None:
-        raise HTTPException(status_code=502, detail="Geocoding API returned invalid coordinates")
+        lat = geo.get("latitude")
+        lng = geo.get("longitude")
+        if lat is None or lng is None:
+            raise HTTPException(status_code=502, detail="Geocoding API returned invalid coordinates")
 
-    weather = _open_meteo_weather(float(lat), float(lng))
-    label = _build_geo_label(geo) or location_query
+        label = _build_geo_label(geo) or location_query
+        background_tasks.add_task(_store_user_geo, db_user.id, location_query, state)
 
-    return {
+    weather = await _WEATHER_CACHE.get(float(lat), float(lng), _open_meteo_weather_async)
+
+    payload = {
         "location": {
             "query": location_query,
             "label": label,
@@ -495,6 +2140,74 @@ def weather_for_current_user(
         },
         "weather": weather,
     }
+    return conditional_json(request, payload, _weather_cache_control(float(lat), float(lng), "private"))
+
+
+@app.post("/weather/batch")
+async def weather_batch(req: WeatherBatchRequest):
+    # De-duplicate on the normalized (name, state) pair, keeping the first spelling.
+    unique = {}
+    for raw in req.locations:
+        query = (raw or "").strip()
+        name, state_hint, _ = _split_location_text(query)
+        key = (_normalize_text(name), _normalize_text(state_hint or ""))
+        if key[0] and key not in unique:
+            unique[key] = (query, name, state_hint)
+
+    if len(unique) > WEATHER_BATCH_MAX_LOCATIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {WEATHER_BATCH_MAX_LOCATIONS} distinct locations per batch.",
+        )
+
+    queries = list(unique.values())
+    geos = await asyncio.gather(
+        *[_geocode_best_async(name=name, state_hint=state_hint) for _, name, state_hint in queries],
+        return_exceptions=True,
+    )
+
+    results = []
+    errors = []
+    located = []
+    for (query, _, _), geo in zip(queries, geos):
+        if isinstance(geo, HTTPException):
+            errors.append({"query": query, "status": geo.status_code, "detail": geo.detail})
+        elif isinstance(geo, Exception):
+            errors.append({"query": query, "status": 502, "detail": f"Upstream API error: {geo}"})
+        elif not geo:
+            errors.append({"query": query, "status": 404, "detail": "Location not found"})
+        elif geo.get("latitude") is None or geo.get("longitude") is None:
+            errors.append({"query": query, "status": 502, "detail": "Geocoding API returned invalid coordinates"})
+        else:
+            located.append((query, geo, float(geo["latitude"]), float(geo["longitude"])))
+
+    by_cell = await _WEATHER_CACHE.get_many(
+        [(lat, lng) for _, _, lat, lng in located],
+        _open_meteo_weather_many_async,
+    )
+
+    for query, geo, lat, lng in located:
+        weather = by_cell.get(_WEATHER_CACHE.snap(lat, lng))
+        if isinstance(weather, HTTPException):
+            errors.append({"query": query, "status": weather.status_code, "detail": weather.detail})
+            continue
+        if not isinstance(weather, dict):
+            errors.append({"query": query, "status": 502, "detail": f"Upstream API error: {weather}"})
+            continue
+        results.append(
+            {
+                "query": query,
+                "location": {
+                    "query": query,
+                    "label": _build_geo_label(geo) or query,
+                    "lat": lat,
+                    "lng": lng,
+                },
+                "weather": weather,
+            }
+        )
+
+    return {"results": results, "errors": errors}
 
 # ---------------- CONSUMER ROUTES ----------------
 
@@ -507,9 +2220,113 @@ def consumer_dashboard(user=Depends(get_current_user)):
     return {"message": "Welcome Consumer"}
 
 
+def _runtime_metrics():
+    # Read at scrape time from the components' own counters, so the hot paths pay nothing extra.
+    weather = _WEATHER_CACHE.stats()
+    users = _USER_CACHE.stats()
+    yield (
+        "agri_cache_lookups_total",
+        "counter",
+        "Cache lookups by cache and result.",
+        [
+            ((("cache", "weather"), ("result", "hit")), weather["hits"]),
+            ((("cache", "weather"), ("result", "stale")), weather["stale_hits"]),
+            ((("cache", "weather"), ("result", "coalesced")), weather["coalesced"]),
+            ((("cache", "weather"), ("result", "miss")), weather["misses"]),
+            ((("cache", "user"), ("result", "hit")), users["hits"]),
+            ((("cache", "user"), ("result", "miss")), users["misses"]),
+        ],
+    )
+    yield (
+        "agri_cache_entries",
+        "gauge",
+        "Entries held by each in-process cache.",
+        [((("cache", "weather"),), weather["entries"]), ((("cache", "user"),), users["entries"])],
+    )
+
+    pool = pool_stats()
+    if "checked_out" in pool:
+        yield (
+            "agri_db_pool_connections",
+            "gauge",
+            "Primary DB pool connections by state.",
+            [((("state", "checked_out"),), pool["checked_out"]), ((("state", "checked_in"),), pool["checked_in"])],
+        )
+    if "checkouts" in pool:
+        yield ("agri_db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection.", [((), pool["wait_total_s"])])
+        yield ("agri_db_pool_timeouts_total", "counter", "Pool checkouts that timed out.", [((), pool["timeouts"])])
+
+    yield ("agri_event_stream_connections", "gauge", "Open /events streams.", [((), _EVENTS.stats()["connections"])])
+    yield ("agri_order_queue_depth", "gauge", "Orders waiting in the per-listing queues.", [((), _ORDER_QUEUE.stats()["queued"])])
+    yield ("agri_db_using_fallback", "gauge", "1 while requests are served from the local fallback database.", [((), int(using_fallback_db()))])
+    breakers = _UPSTREAM.breaker_stats()
+    yield (
+        "agri_upstream_circuit_open",
+        "gauge",
+        "1 while the upstream's circuit breaker is rejecting calls (open or probing).",
+        [((("host", host),), int(b["state"] != "closed")) for host, b in breakers.items()],
+    )
+
+
+METRICS.add_collector(_runtime_metrics)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/health/db")
 def db_health():
     return {
-        "using_fallback_db": USING_FALLBACK_DB,
+        "using_fallback_db": using_fallback_db(),
+        "pool": pool_stats(),
+        "async_pool": pool_stats(async_engine.sync_engine) if async_engine is not None else None,
+        "fallback_pool": pool_stats(database.fallback_engine) if database.fallback_engine is not None else None,
+        "failover": _DB_FAILOVER.stats() if FAILOVER_AVAILABLE else None,
     }
 
+
+@app.get("/health/upstream")
+def upstream_health():
+    return {"breakers": _UPSTREAM.breaker_stats()}
+
+
+@app.get("/health/weather-cache")
+def weather_cache_health():
+    return _WEATHER_CACHE.stats()
+
+
+@app.get("/health/user-cache")
+def user_cache_health():
+    return _USER_CACHE.stats()
+
+
+@app.get("/health/weather-prefetch")
+def weather_prefetch_health():
+    return _WEATHER_PREFETCHER.stats()
+
+
+@app.get("/health/search-index")
+def search_index_health():
+    return _SEARCH_INDEX.stats()
+
+
+@app.get("/health/farmer-index")
+def farmer_index_health():
+    return _FARMER_INDEX.stats()
+
+
+@app.get("/health/alert-engine")
+def alert_engine_health():
+    return _ALERT_ENGINE.stats()
+
+
+@app.get("/health/orders")
+def orders_health():
+    return {"batching": ORDER_BATCHING, **_ORDER_QUEUE.stats()}
+
+
+@app.get("/health/events")
+def events_health():
+    return _EVENTS.stats()
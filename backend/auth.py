@@ -1,9 +1,191 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import BoundedSemaphore, Lock
+from typing import Callable, List, Optional, Tuple
+
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from metrics import METRICS, charge_password_wait, record_password_hash
 
-def hash_password(password: str):
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 0 hashes inline in the calling thread (handy for local development).
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+PASSWORD_HASH_TIMEOUT_S = float(os.getenv("PASSWORD_HASH_TIMEOUT_S", "10"))
+# Most of the queue bulk imports may hold at once; logins and registrations keep the rest.
+PASSWORD_HASH_BULK_SHARE = float(os.getenv("PASSWORD_HASH_BULK_SHARE", "0.5"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _hash(password: str) -> str:
     return pwd_context.hash(password)
 
+
+def _hash_many(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(p) for p in passwords]
+
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # passlib returns a fresh hash when the stored one needs_update (e.g. other rounds).
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+_pool_lock = Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_workers = PASSWORD_HASH_WORKERS
+_slots = BoundedSemaphore(max(1, PASSWORD_HASH_MAX_QUEUE))
+
+
+def _bulk_share(max_queue: int) -> BoundedSemaphore:
+    return BoundedSemaphore(max(1, int(max(1, max_queue) * PASSWORD_HASH_BULK_SHARE)))
+
+
+_bulk_slots = _bulk_share(PASSWORD_HASH_MAX_QUEUE)
+
+
+def configure_password_pool(workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE):
+    global _workers, _slots, _bulk_slots
+    shutdown_password_pool()
+    with _pool_lock:
+        _workers = workers
+        _slots = BoundedSemaphore(max(1, max_queue))
+        _bulk_slots = _bulk_share(max_queue)
+
+
+def shutdown_password_pool():
+    global _executor
+    with _pool_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _pool_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=_workers)
+    return _executor
+
+
+def _submit(fn: Callable, *args) -> Future:
+    slots = _slots
+    # Queue full: fail fast so callers can shed load instead of piling up.
+    if not slots.acquire(blocking=False):
+        METRICS.inc("agri_password_hash_rejected_total")
+        raise PasswordHasherBusy("Password hashing queue is full")
+
+    op = fn.__name__.lstrip("_")
+    started = time.perf_counter()
+    if _workers <= 0:
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as e:
+            fut.set_exception(e)
+        finally:
+            slots.release()
+            elapsed = time.perf_counter() - started
+            record_password_hash(op, elapsed)
+            charge_password_wait(elapsed)
+        return fut
+
+    try:
+        fut = _get_executor().submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+
+    def _done(_):
+        slots.release()
+        record_password_hash(op, time.perf_counter() - started)
+
+    fut.add_done_callback(_done)
+    return fut
+
+
+def _wait(fut: Future):
+    started = time.perf_counter()
+    try:
+        return fut.result(timeout=PASSWORD_HASH_TIMEOUT_S)
+    except FutureTimeoutError:
+        fut.cancel()
+        raise PasswordHasherBusy("Password hashing timed out")
+    finally:
+        charge_password_wait(time.perf_counter() - started)
+
+
+async def _wait_async(fut: Future):
+    started = time.perf_counter()
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(fut), PASSWORD_HASH_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        raise PasswordHasherBusy("Password hashing timed out")
+    finally:
+        charge_password_wait(time.perf_counter() - started)
+
+
+def hash_password(password: str):
+    return _wait(_submit(_hash, password))
+
 def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
+    valid, _ = verify_and_update_password(plain_password, hashed_password)
+    return valid
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return _wait(_submit(_verify_and_update, plain_password, hashed_password))
+
+
+async def hash_password_async(password: str) -> str:
+    return await _wait_async(_submit(_hash, password))
+
+
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    return await _wait_async(_submit(_verify_and_update, plain_password, hashed_password))
+
+
+async def _acquire_bulk_slot(bulk_slots: BoundedSemaphore):
+    # Bulk work waits for its share of the queue instead of failing fast like interactive calls.
+    deadline = time.monotonic() + PASSWORD_HASH_TIMEOUT_S
+    while not bulk_slots.acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            METRICS.inc("agri_password_hash_rejected_total")
+            raise PasswordHasherBusy("Bulk password hashing is at its share of the queue")
+        await asyncio.sleep(0.01)
+
+
+async def hash_passwords_async(passwords: List[str]) -> List[str]:
+    # Bulk imports: one pool job per worker-sized chunk instead of one per password, submitted
+    # as bulk slots free up so an import never holds more than its share of the queue.
+    if not passwords:
+        return []
+    chunks = max(1, _workers) * 2
+    size = max(1, -(-len(passwords) // chunks))
+    bulk_slots = _bulk_slots
+    futures = []
+    try:
+        for i in range(0, len(passwords), size):
+            await _acquire_bulk_slot(bulk_slots)
+            try:
+                fut = _submit(_hash_many, passwords[i : i + size])
+            except BaseException:
+                bulk_slots.release()
+                raise
+            fut.add_done_callback(lambda _: bulk_slots.release())
+            futures.append(fut)
+    except BaseException:
+        for fut in futures:
+            fut.cancel()
+        raise
+    results = await asyncio.gather(*[asyncio.wrap_future(f) for f in futures])
+    return [h for chunk in results for h in chunk]
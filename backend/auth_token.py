@@ -1,9 +1,20 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from threading import Lock
+
 from jose import jwt, JWTError
 
 SECRET_KEY = "supersecretkey123"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+
+# sha256(token) -> (payload, exp timestamp); only successfully verified tokens are kept.
+_verified_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+_verified_lock = Lock()
 
 
 def create_access_token(data: dict):
@@ -14,8 +25,26 @@ def create_access_token(data: dict):
 
 
 def verify_token(token: str):
+    key = hashlib.sha256((token or "").encode("utf-8")).digest()
+    now = time.time()
+
+    with _verified_lock:
+        hit = _verified_cache.get(key)
+        if hit is not None:
+            if hit[1] > now:
+                _verified_cache.move_to_end(key)
+                return dict(hit[0])
+            del _verified_cache[key]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         return None
+
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)) and TOKEN_CACHE_MAX_ENTRIES > 0:
+        with _verified_lock:
+            _verified_cache[key] = (dict(payload), float(exp))
+            while len(_verified_cache) > TOKEN_CACHE_MAX_ENTRIES:
+                _verified_cache.popitem(last=False)
+    return payload
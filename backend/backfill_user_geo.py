@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+
+from sqlalchemy import and_, update
+
+from app import _UPSTREAM, _build_geo_label, _ensure_table_schema, _geocode_best_async
+from database import SessionLocal, active_engine
+from models import User
+
+
+async def _resolve_pairs(pairs, concurrency: int) -> dict:
+    slots = asyncio.Semaphore(max(1, concurrency))
+
+    async def resolve(pair):
+        district, state = pair
+        async with slots:
+            try:
+                return pair, await _geocode_best_async(name=district, state_hint=state or None)
+            except Exception as e:
+                print(f"[WARN] Geocoding {district!r}, {state!r} failed: {e}")
+                return pair, None
+
+    try:
+        return dict(await asyncio.gather(*[resolve(p) for p in pairs]))
+    finally:
+        await _UPSTREAM.aclose()
+
+
+def backfill_user_coordinates(batch_size: int = 500, concurrency: int = 4) -> dict:
+    _ensure_table_schema(User, active_engine())
+    db = SessionLocal()
+    try:
+        # Each distinct (district, state) is geocoded exactly once.
+        pairs = [
+            (d, st)
+            for d, st in db.query(User.district, User.state)
+            .filter(User.latitude.is_(None), User.district.isnot(None))
+            .distinct()
+            .all()
+            if (d or "").strip()
+        ]
+        resolved = asyncio.run(_resolve_pairs(pairs, concurrency))
+
+        updated = 0
+        unresolved = 0
+        for i in range(0, len(pairs), batch_size):
+            for district, state in pairs[i : i + batch_size]:
+                geo = resolved.get((district, state))
+                if not geo or geo.get("latitude") is None or geo.get("longitude") is None:
+                    unresolved += 1
+                    continue
+                state_match = User.state.is_(None) if state is None else User.state == state
+                result = db.execute(
+                    update(User)
+                    .where(and_(User.district == district, state_match, User.latitude.is_(None)))
+                    .values(
+                        latitude=float(geo["latitude"]),
+                        longitude=float(geo["longitude"]),
+                        geo_label=_build_geo_label(geo) or district.strip(),
+                    )
+                )
+                updated += result.rowcount or 0
+            db.commit()
+
+        return {"locations": len(pairs), "unresolved_locations": unresolved, "users_updated": updated}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Store coordinates on users that don't have them yet.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Locations updated per transaction.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel geocoding requests.")
+    args = parser.parse_args()
+
+    print(backfill_user_coordinates(batch_size=args.batch_size, concurrency=args.concurrency))
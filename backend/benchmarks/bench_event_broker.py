@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_broker import EventBroker
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def _run(args) -> dict:
+    broker = EventBroker(max_connections=args.connections + 1, max_per_user=args.connections)
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    subs = [
+        broker.subscribe(i, ("market",) if i < args.market_subscribers else ())
+        for i in range(args.connections)
+    ]
+    # Each idle connection is parked on its own wait(), like a real stream coroutine.
+    readers = [asyncio.ensure_future(sub.next_frames()) for sub in subs]
+    await asyncio.sleep(0)
+    per_conn_bytes = (tracemalloc.get_traced_memory()[0] - base) / args.connections
+    tracemalloc.stop()
+
+    item = {"id": 1, "productName": "Tomato", "pricePerKg": 18.5, "quantityKg": 120, "district": "Nashik"}
+    fanout_ms, wake_ms = [], []
+    for n in range(args.publishes):
+        t0 = time.perf_counter()
+        delivered = broker.publish_topic("market", "marketItem", {"action": "updated", "id": n, "item": item})
+        fanout_ms.append((time.perf_counter() - t0) * 1000)
+        # Time until every woken subscriber has drained its frame.
+        await asyncio.gather(*readers[: args.market_subscribers])
+        wake_ms.append((time.perf_counter() - t0) * 1000)
+        readers[: args.market_subscribers] = [
+            asyncio.ensure_future(sub.next_frames()) for sub in subs[: args.market_subscribers]
+        ]
+        assert delivered == args.market_subscribers
+
+    # A slow client: the bounded queue keeps the latest state per listing and drops the overflow.
+    slow = subs[0]
+    for n in range(args.publishes * 50):
+        broker.publish_user(0, "notification", {"n": n})
+    for n in range(args.publishes * 50):
+        broker.publish_topic("market", "marketItem", {"id": n % 10}, coalesce_key=f"item:{n % 10}")
+    slow_queue = len(slow._queue)
+
+    t0 = time.perf_counter()
+    for _ in range(args.user_publishes):
+        broker.publish_user(args.connections // 2, "notification", {"message": "Order placed"})
+    user_publish_us = (time.perf_counter() - t0) / args.user_publishes * 1e6
+
+    for r in readers:
+        r.cancel()
+    return {
+        "connections": args.connections,
+        "bytes_per_idle_connection": round(per_conn_bytes),
+        "fanout_subscribers": args.market_subscribers,
+        "publish_p50_ms": round(_percentile(fanout_ms, 0.5), 3),
+        "publish_p95_ms": round(_percentile(fanout_ms, 0.95), 3),
+        "delivered_p50_ms": round(_percentile(wake_ms, 0.5), 3),
+        "delivered_p95_ms": round(_percentile(wake_ms, 0.95), 3),
+        "user_publish_us": round(user_publish_us, 2),
+        "slow_client_queue": slow_queue,
+        "slow_client_dropped": slow.dropped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process event broker: idle footprint and fan-out latency.")
+    parser.add_argument("--connections", type=int, default=20_000)
+    parser.add_argument("--market-subscribers", type=int, default=5_000)
+    parser.add_argument("--publishes", type=int, default=50)
+    parser.add_argument("--user-publishes", type=int, default=100_000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(_run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchutil import emit, summarize
+from fake_open_meteo import start_fake_open_meteo
+from fake_postgres import start_fake_postgres
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOCATIONS = [
+    "Erode, Tamil Nadu", "Salem, Tamil Nadu", "Madurai, Tamil Nadu", "Nashik, Maharashtra", "Pune, Maharashtra",
+    "Nagpur, Maharashtra", "Mandya, Karnataka", "Belagavi, Karnataka", "Ludhiana, Punjab", "Amritsar, Punjab",
+    "Agra, Uttar Pradesh", "Meerut, Uttar Pradesh", "Rajkot, Gujarat", "Anand, Gujarat", "Guntur, Andhra Pradesh",
+]
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_backend(args, upstream: str, primary_url: str, workdir: str):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=primary_url,
+        FALLBACK_DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'fallback.db')}",
+        OPEN_METEO_GEOCODE_URL=f"{upstream}/v1/search",
+        OPEN_METEO_FORECAST_URL=f"{upstream}/v1/forecast",
+        GAZETTEER_PATH=os.path.join(workdir, "no-gazetteer.tsv"),
+        WEATHER_PREFETCH_ENABLED="0",
+        # Forecasts go stale after a second, so the last-known-data path is reachable within a run.
+        WEATHER_CACHE_TTL_S="1",
+        BCRYPT_ROUNDS="4",
+        UPSTREAM_TIMEOUT_S=str(args.upstream_timeout_s),
+        UPSTREAM_CONNECT_TIMEOUT_S=str(args.upstream_timeout_s),
+        UPSTREAM_RETRIES="0",
+        UPSTREAM_BREAKER_FAILURES=str(args.breaker_failures),
+        UPSTREAM_BREAKER_OPEN_S=str(args.breaker_open_s),
+        DB_CONNECT_TIMEOUT_S="1",
+        DB_POOL_TIMEOUT_S="2",
+        DB_PROBE_INTERVAL_S=str(args.probe_interval_s),
+        DB_PROBE_TIMEOUT_S=str(args.probe_timeout_s),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("backend exited during startup")
+        try:
+            if httpx.get(f"{base}/health/db", timeout=1).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("backend did not become ready")
+
+
+def _timed(client: httpx.Client, calls) -> dict:
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    for method, path, kwargs in calls:
+        t0 = time.perf_counter()
+        try:
+            status = client.request(method, path, **kwargs).status_code
+        except httpx.HTTPError:
+            status = 599
+        latencies.append((time.perf_counter() - t0) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+
+def _wait_for(client: httpx.Client, using_fallback: bool, timeout_s: float) -> float:
+    # Seconds until /health/db reports the wanted database (or -1 on timeout).
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout_s:
+        if client.get("/health/db").json()["using_fallback_db"] == using_fallback:
+            return round(time.perf_counter() - started, 3)
+        time.sleep(0.05)
+    return -1.0
+
+
+def _weather(location: str):
+    return ("GET", "/weather", {"params": {"location": location}})
+
+
+def _run_weather(client: httpx.Client, upstream_server, args) -> dict:
+    warm, cold = LOCATIONS[:3], LOCATIONS[3:]
+    results = {"weather_healthy": _timed(client, [_weather(loc) for loc in warm])}
+
+    upstream_server.state["mode"] = args.upstream_mode
+    # New locations have nothing cached: the first calls wait out the timeout until the breaker opens.
+    results["weather_until_open"] = _timed(client, [_weather(loc) for loc in cold[: args.breaker_failures]])
+    results["weather_circuit_open"] = _timed(client, [_weather(loc) for loc in cold[args.breaker_failures:]] * 5)
+    time.sleep(1.1)  # let the warm forecasts expire
+    results["weather_last_known"] = _timed(client, [_weather(loc) for loc in warm] * 5)
+
+    upstream_server.state["mode"] = "ok"
+    time.sleep(args.breaker_open_s)
+    results["weather_recovered"] = _timed(client, [_weather(loc) for loc in cold])
+    results["breakers"] = client.get("/health/upstream").json()["breakers"]
+    return results
+
+
+def _run_database(client: httpx.Client, pg, args) -> dict:
+    user = {
+        "name": "Failover User", "mobile": "9000012345", "password": "failover-pass", "role": "consumer",
+        "alternate_phone": "8000012345", "state": "Tamil Nadu", "district": "Erode", "village": "Bench Village",
+    }
+    login = {"mobile": user["mobile"], "password": user["password"]}
+    results = {"primary_ready_s": _wait_for(client, False, 10)}
+
+    pg.mode = args.db_mode
+    outage = time.perf_counter()
+    results["switch_to_fallback_s"] = _wait_for(client, True, 60)
+    results["fallback_requests"] = _timed(
+        client, [("POST", "/register", {"json": user})] + [("POST", "/login", {"json": login})] * 20
+    )
+    token = client.post("/login", json=login).json().get("access_token")
+    results["fallback_profile_status"] = client.get("/profile", headers={"Authorization": f"Bearer {token}"}).status_code
+
+    pg.mode = "up"
+    restored = time.perf_counter()
+    results["switch_back_s"] = _wait_for(client, False, 60)
+    results["outage_s"] = round(restored - outage, 3)
+    # A fallback-issued token must not be honoured by the primary (user ids differ between the two).
+    results["fallback_token_after_switch_back"] = client.get(
+        "/profile", headers={"Authorization": f"Bearer {token}"}
+    ).status_code
+    results["failover"] = client.get("/health/db").json()["failover"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Boot the API against a fake Postgres and a fake Open-Meteo, make each hang or fail, "
+        "and measure how fast requests fail, fall back and recover."
+    )
+    parser.add_argument("--upstream-mode", choices=("hang", "fail"), default="hang")
+    parser.add_argument("--db-mode", choices=("hang", "down"), default="hang")
+    parser.add_argument("--upstream-timeout-s", type=float, default=1.0)
+    parser.add_argument("--breaker-failures", type=int, default=3)
+    parser.add_argument("--breaker-open-s", type=float, default=3.0)
+    parser.add_argument("--probe-interval-s", type=float, default=1.0)
+    parser.add_argument("--probe-timeout-s", type=float, default=0.5)
+    parser.add_argument("--output", help="Also write the JSON report here.")
+    parser.add_argument("--baseline", help="Earlier report to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed worsening per metric (0.2 = 20%%).")
+    args = parser.parse_args()
+    if args.breaker_failures >= len(LOCATIONS) - 3:
+        parser.error(f"--breaker-failures must be below {len(LOCATIONS) - 3}")
+
+    upstream_server, upstream = start_fake_open_meteo()
+    pg = start_fake_postgres()
+    workdir = tempfile.mkdtemp(prefix="agri-failover-")
+    proc, base = _start_backend(args, upstream, pg.url(), workdir)
+    try:
+        with httpx.Client(base_url=base, timeout=30) as client:
+            results = _run_weather(client, upstream_server, args)
+            results.update(_run_database(client, pg, args))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        upstream_server.state["mode"] = "ok"
+        upstream_server.shutdown()
+        pg.close()
+
+    report = {
+        "suite": "failover",
+        "config": {k: v for k, v in vars(args).items() if k not in {"output", "baseline"}},
+        "results": results,
+    }
+    sys.exit(emit(report, args.output, args.baseline, args.max_regression))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchutil import emit, summarize
+from fake_open_meteo import start_fake_open_meteo
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ["register", "login", "profile", "weather", "weather_me"]
+DISTRICTS = [
+    ("Erode", "Tamil Nadu"), ("Salem", "Tamil Nadu"), ("Madurai", "Tamil Nadu"), ("Nashik", "Maharashtra"),
+    ("Pune", "Maharashtra"), ("Nagpur", "Maharashtra"), ("Mandya", "Karnataka"), ("Belagavi", "Karnataka"),
+    ("Ludhiana", "Punjab"), ("Amritsar", "Punjab"), ("Agra", "Uttar Pradesh"), ("Meerut", "Uttar Pradesh"),
+    ("Rajkot", "Gujarat"), ("Anand", "Gujarat"), ("Guntur", "Andhra Pradesh"), ("Karimnagar", "Telangana"),
+]
+
+
+def _free_port() -> int:
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_backend(args, upstream: str, workdir: str):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        OPEN_METEO_GEOCODE_URL=f"{upstream}/v1/search",
+        OPEN_METEO_FORECAST_URL=f"{upstream}/v1/forecast",
+        # No local gazetteer, so first lookups of each district really go upstream.
+        GAZETTEER_PATH=os.path.join(workdir, "no-gazetteer.tsv"),
+        WEATHER_PREFETCH_ENABLED="0",
+        BCRYPT_ROUNDS=str(args.bcrypt_rounds),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("backend exited during startup")
+        try:
+            if httpx.get(f"{base}/health/db", timeout=1).status_code == 200:
+                return proc, base
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("backend did not become ready")
+
+
+async def _drive(client: httpx.AsyncClient, concurrency: int, calls) -> dict:
+    latencies, statuses = [], {}
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(call):
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                status = (await call(client)).status_code
+            except httpx.HTTPError:
+                status = 599
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(c) for c in calls))
+    return summarize(latencies, time.perf_counter() - started, statuses)
+
+
+def _user_payload(i: int, tag: str) -> dict:
+    district, state = DISTRICTS[i % len(DISTRICTS)]
+    farmer = i % 2 == 0
+    payload = {
+        "name": f"Bench User {i}",
+        "mobile": f"9{tag}{i:05d}",
+        "password": f"bench-pass-{i}",
+        "role": "farmer" if farmer else "consumer",
+        "alternate_phone": f"8{tag}{i:05d}",
+        "state": state,
+        "district": district,
+        "village": "Bench Village",
+    }
+    if farmer:
+        payload.update(
+            age=40, aadhar_number="123412341234", pincode="600001",
+            soil_type="Loamy", land_area="2 acres", primary_crops="Paddy",
+        )
+    return payload
+
+
+async def _run(args, base: str) -> dict:
+    rng = random.Random(args.seed)
+    tag = f"{rng.randrange(10_000):04d}"
+    users = [_user_payload(i, tag) for i in range(args.users)]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    tokens = []
+
+    async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as client:
+        if "register" in args.scenarios:
+            results["register"] = await _drive(
+                client, args.concurrency, [lambda c, u=u: c.post("/register", json=u) for u in users]
+            )
+
+        # Everything after registration needs tokens; log every user in once (untimed if login isn't selected).
+        logins = [lambda c, u=u: c.post("/login", json={"mobile": u["mobile"], "password": u["password"]}) for u in users]
+        async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as setup:
+            for u in users:
+                r = await setup.post("/login", json={"mobile": u["mobile"], "password": u["password"]})
+                if r.status_code == 200:
+                    tokens.append(r.json()["access_token"])
+        if not tokens:
+            raise RuntimeError("no user could log in; run with the register scenario first")
+
+        if "login" in args.scenarios:
+            picks = [rng.choice(logins) for _ in range(args.requests)]
+            results["login"] = await _drive(client, args.concurrency, picks)
+
+        def authed(path):
+            return [
+                lambda c, t=rng.choice(tokens): c.get(path, headers={"Authorization": f"Bearer {t}"})
+                for _ in range(args.requests)
+            ]
+
+        if "profile" in args.scenarios:
+            results["profile"] = await _drive(client, args.concurrency, authed("/profile"))
+        if "weather" in args.scenarios:
+            picks = [
+                lambda c, d=rng.choice(DISTRICTS): c.get("/weather", params={"location": f"{d[0]}, {d[1]}"})
+                for _ in range(args.requests)
+            ]
+            results["weather"] = await _drive(client, args.concurrency, picks)
+        if "weather_me" in args.scenarios:
+            results["weather_me"] = await _drive(client, args.concurrency, authed("/weather/me"))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Boot the API against SQLite and a fake Open-Meteo, then load-test the main read/auth endpoints."
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma list from {', '.join(SCENARIOS)}.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario (register uses --users).")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--upstream-latency-ms", type=float, default=80)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the JSON report here.")
+    parser.add_argument("--baseline", help="Earlier report to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed worsening per metric (0.2 = 20%%).")
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    upstream_server, upstream = start_fake_open_meteo(latency_ms=args.upstream_latency_ms)
+    workdir = tempfile.mkdtemp(prefix="agri-bench-")
+    proc, base = _start_backend(args, upstream, workdir)
+    try:
+        results = asyncio.run(_run(args, base))
+        metrics = httpx.get(f"{base}/health/weather-cache", timeout=5).json()
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        upstream_server.shutdown()
+
+    report = {
+        "suite": "http_load",
+        "config": {k: v for k, v in vars(args).items() if k not in {"output", "baseline"}},
+        "results": results,
+        "weather_cache": metrics,
+    }
+    sys.exit(emit(report, args.output, args.baseline, args.max_regression))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search_index import ListingSearchIndex
+
+CROPS = [
+    "tomato", "onion", "potato", "brinjal", "okra", "cauliflower", "cabbage", "chilli", "carrot",
+    "spinach", "garlic", "ginger", "wheat", "rice", "paddy", "maize", "banana", "mango", "grapes",
+    "coconut", "turmeric", "groundnut", "cotton", "sugarcane", "millet", "papaya", "cucumber",
+]
+CATEGORIES = ["Vegetables", "Fruits", "Grains", "Spices", "Pulses", "Cash crops"]
+ADJECTIVES = ["fresh", "organic", "farm", "premium", "local", "desi", "hybrid", "red", "green", "export"]
+QUERIES = ["tomato", "tamatar", "baingan", "tom", "fresh tom", "organic onion erode", "tomatoe", "coconut salem"]
+
+
+def _normalize(value: str) -> str:
+    return " ".join((value or "").strip().casefold().split())
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Market search index build time and query latency.")
+    parser.add_argument("--listings", type=int, default=1_000_000)
+    parser.add_argument("--districts", type=int, default=700)
+    parser.add_argument("--queries", type=int, default=200, help="repetitions per query string")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    districts = ["erode", "salem", "madurai", "nashik", "pune"] + [f"district{i}" for i in range(args.districts)]
+    index = ListingSearchIndex(normalize=_normalize)
+
+    def rows():
+        for i in range(1, args.listings + 1):
+            crop = rng.choice(CROPS)
+            yield i, f"{rng.choice(ADJECTIVES)} {crop}", crop, rng.choice(CATEGORIES), rng.choice(districts)
+
+    started = time.perf_counter()
+    index.load(rows())
+    build_s = time.perf_counter() - started
+
+    results = []
+    for query in QUERIES:
+        timings = []
+        for _ in range(args.queries):
+            t0 = time.perf_counter()
+            ids, _ = index.search(query, limit=20)
+            timings.append((time.perf_counter() - t0) * 1000)
+        results.append(
+            {
+                "query": query,
+                "hits": len(ids),
+                "p50_ms": round(_percentile(timings, 0.5), 3),
+                "p95_ms": round(_percentile(timings, 0.95), 3),
+            }
+        )
+
+    t0 = time.perf_counter()
+    for i in range(1, 10_001):
+        index.add(i, "fresh tomato", "tomato", "Vegetables", "erode")
+    update_us = (time.perf_counter() - t0) / 10_000 * 1e6
+
+    print(
+        json.dumps(
+            {
+                "listings": args.listings,
+                "build_s": round(build_s, 2),
+                "update_avg_us": round(update_us, 2),
+                "stats": index.stats(),
+                "queries": results,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# app.py needs a database URL at import time; these benchmarks never touch it.
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='agri-micro-'), 'micro.db')}")
+
+import app as backend
+from auth_token import create_access_token, verify_token
+from benchutil import emit
+from fake_open_meteo import _forecast, _geocode
+from forecast import FORECAST_FIELD_GROUPS, open_meteo_forecast_params, parse_forecast
+from price_index import QuantileSketch
+
+
+def _bench(fn, ops: int, repeats: int) -> dict:
+    # Best of several runs: the least disturbed one is the closest to the code's own cost.
+    best = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for i in range(ops):
+            fn(i)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return {"ops": ops, "us_per_op": round(best / ops * 1e6, 3), "ops_per_s": round(ops / best)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for geocode scoring, geo labels, token checks, forecast lookups and price sketches.")
+    parser.add_argument("--ops", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Also write the JSON report here.")
+    parser.add_argument("--baseline", help="Earlier report to compare against.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed worsening per metric (0.2 = 20%%).")
+    args = parser.parse_args()
+
+    results_by_name = [_geocode(name)["results"] for name in ("Erode", "Salem", "Aurangabad", "Bilaspur")]
+    best = backend._pick_best_geo(results_by_name[0], "Tamil Nadu")
+    token = create_access_token({"user_id": 1, "role": "farmer"})
+    # Fresh tokens for the uncached path (the verified-token cache holds successful checks only).
+    cold_tokens = [create_access_token({"user_id": i, "role": "consumer"}) for i in range(args.ops * args.repeats)]
+    cold = iter(cold_tokens)
+    params = open_meteo_forecast_params()
+    forecast_data = _forecast(11.34, 77.72, params["hourly"].split(","), params["daily"].split(","), 16, unixtime=True)
+    forecast = parse_forecast(forecast_data)
+    now = time.time()
+    # A month of a busy district: prices spread over 15-45 per kg.
+    prices = [15 + (i * 7919 % 3000) / 100 for i in range(100_000)]
+    month = QuantileSketch()
+    for p in prices:
+        month.add(p)
+
+    results = {
+        "geocode_pick_best": _bench(
+            lambda i: backend._pick_best_geo(results_by_name[i & 3], "Tamil Nadu"), args.ops, args.repeats
+        ),
+        "geocode_clean_query": _bench(
+            lambda i: backend._clean_geo_query("Erode District, Tamil Nadu", None), args.ops, args.repeats
+        ),
+        "build_geo_label": _bench(lambda i: backend._build_geo_label(best), args.ops, args.repeats),
+        "verify_token_cached": _bench(lambda i: verify_token(token), args.ops, args.repeats),
+        "verify_token_uncached": _bench(lambda i: verify_token(next(cold)), args.ops, args.repeats),
+        "forecast_parse_16d": _bench(lambda i: parse_forecast(forecast_data), args.ops // 20, args.repeats),
+        "forecast_hour_lookup": _bench(
+            lambda i: forecast.value_at("precipitation_probability", now + i % 300 * 3600), args.ops, args.repeats
+        ),
+        "forecast_window_7d": _bench(
+            lambda i: forecast.hourly_window(now, 168, 1 + i % 3, FORECAST_FIELD_GROUPS), args.ops // 20, args.repeats
+        ),
+        "price_sketch_add": _bench(lambda i: month.add(prices[i % 100_000]), args.ops, args.repeats),
+        "price_sketch_median": _bench(lambda i: month.quantile(0.5), args.ops // 20, args.repeats),
+    }
+    report = {"suite": "micro", "config": {"ops": args.ops, "repeats": args.repeats}, "results": results}
+    sys.exit(emit(report, args.output, args.baseline, args.max_regression))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Throwaway SQLite DB unless DATABASE_URL points somewhere on purpose.
+if not os.getenv("DATABASE_URL"):
+    _db_path = os.path.join(tempfile.mkdtemp(prefix="agri-orders-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+
+import httpx
+
+import app as backend
+from auth_token import create_access_token
+from database import SessionLocal
+from models import MarketItem, Order, User
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else None
+
+
+def _setup(consumers: int, stock_kg: float):
+    db = SessionLocal()
+    try:
+        tag = uuid.uuid4().hex[:8]
+        farmer = User(name="Bench Farmer", mobile=f"f-{tag}", role="farmer", password="x", district="Pune", state="Maharashtra")
+        db.add(farmer)
+        db.flush()
+        buyers = [User(name=f"Buyer {i}", mobile=f"c-{tag}-{i}", role="consumer", password="x") for i in range(consumers)]
+        db.add_all(buyers)
+        item = MarketItem(
+            farmer_id=farmer.id,
+            farmer_name=farmer.name,
+            product_name="Flash Deal Onion",
+            crop="onion",
+            category="Vegetables",
+            quantity_kg=stock_kg,
+            unit="kg",
+            price_per_kg=20.0,
+            is_urgent_deal=True,
+            discount_percent=25,
+        )
+        db.add(item)
+        db.commit()
+        tokens = [create_access_token({"user_id": b.id, "role": "consumer"}) for b in buyers]
+        return item.id, tokens
+    finally:
+        db.close()
+
+
+def _check(listing_id: int, stock_kg: float) -> dict:
+    db = SessionLocal()
+    try:
+        left = db.query(MarketItem.quantity_kg).filter(MarketItem.id == listing_id).scalar()
+        orders = db.query(Order.consumer_id, Order.idempotency_key, Order.quantity_kg).filter(Order.listing_id == listing_id).all()
+        keys = [(o[0], o[1]) for o in orders]
+        sold = sum(o[2] for o in orders)
+        return {
+            "stock_left_kg": left,
+            "orders": len(orders),
+            "sold_kg": sold,
+            "oversold": left < 0 or abs(stock_kg - left - sold) > 1e-6,
+            "duplicate_orders": len(keys) - len(set(keys)),
+        }
+    finally:
+        db.close()
+
+
+async def _run(args, batching: bool) -> dict:
+    backend.ORDER_BATCHING = batching
+    listing_id, tokens = _setup(args.consumers, args.stock_kg)
+    rng = random.Random(args.seed)
+    attempts = [(rng.choice(tokens), uuid.uuid4().hex, rng.choice([1, 2, 5])) for _ in range(args.orders)]
+    statuses = {}
+    latencies = []
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def place(client, token, key, qty):
+        body = {"listingId": listing_id, "quantityKg": qty}
+        headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": key}
+        # A share of clients "time out" and retry with the same key; that must not double-buy.
+        for _ in range(2 if rng.random() < args.retry_share else 1):
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/orders", json=body, headers=headers)
+                latencies.append((time.perf_counter() - t0) * 1000)
+            statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+    transport = httpx.ASGITransport(app=backend.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(place(client, *a) for a in attempts))
+        elapsed = time.perf_counter() - started
+
+    out = {
+        "batching": batching,
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 0.5), 2),
+        "p95_ms": round(_percentile(latencies, 0.95), 2),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "queue": backend._ORDER_QUEUE.stats() if batching else None,
+    }
+    out.update(_check(listing_id, args.stock_kg))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Many buyers hammering one listing through POST /orders.")
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--consumers", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--stock-kg", type=float, default=1500)
+    parser.add_argument("--retry-share", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    backend._startup_create_tables()
+    results = [asyncio.run(_run(args, batching)) for batching in (False, True)]
+    print(json.dumps({"database": backend.engine.dialect.name, "runs": results}, indent=2))
+    if any(r["oversold"] or r["duplicate_orders"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
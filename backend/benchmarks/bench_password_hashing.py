@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login (bcrypt verify) throughput vs. worker processes.")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor")
+    parser.add_argument("--logins", type=int, default=64, help="verifications per worker count")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    import auth
+
+    stored = auth.pwd_context.hash("correct horse battery staple")
+
+    counts = [1]
+    while counts[-1] * 2 <= args.max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != args.max_workers:
+        counts.append(args.max_workers)
+
+    results = []
+    for workers in [0] + counts:
+        auth.configure_password_pool(workers=workers, max_queue=args.logins)
+        # Warm the pool so process start-up isn't measured.
+        auth.verify_password("correct horse battery staple", stored)
+
+        callers = max(1, workers) * 2
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=callers) as callers_pool:
+            list(
+                callers_pool.map(
+                    lambda _: auth.verify_password("correct horse battery staple", stored),
+                    range(args.logins),
+                )
+            )
+        elapsed = time.perf_counter() - started
+        results.append(
+            {
+                "workers": workers,
+                "mode": "inline" if workers == 0 else "process_pool",
+                "logins": args.logins,
+                "seconds": round(elapsed, 3),
+                "logins_per_s": round(args.logins / elapsed, 2),
+            }
+        )
+    auth.shutdown_password_pool()
+
+    print(json.dumps({"rounds": args.rounds, "cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from spatial_index import SpatialIndex
+
+# Rough bounding box of India.
+LAT_RANGE = (8.0, 32.0)
+LNG_RANGE = (69.0, 89.0)
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _timed(fn, points):
+    timings, sizes = [], []
+    for lat, lng in points:
+        t0 = time.perf_counter()
+        hits = fn(lat, lng)
+        timings.append((time.perf_counter() - t0) * 1000)
+        sizes.append(len(hits))
+    return {
+        "avg_hits": round(sum(sizes) / len(sizes), 1),
+        "p50_ms": round(_percentile(timings, 0.5), 3),
+        "p95_ms": round(_percentile(timings, 0.95), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Farmer spatial index: radius and k-nearest latency.")
+    parser.add_argument("--farmers", type=int, default=500_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--radius-km", type=float, default=25)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = SpatialIndex()
+    started = time.perf_counter()
+    index.load(
+        (i, rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)) for i in range(1, args.farmers + 1)
+    )
+    build_s = time.perf_counter() - started
+
+    points = [(rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)) for _ in range(args.queries)]
+    # First pass packs the touched cells; report the warm numbers.
+    _timed(lambda lat, lng: index.within(lat, lng, args.radius_km), points)
+    radius = _timed(lambda lat, lng: index.within(lat, lng, args.radius_km), points)
+    knn = _timed(lambda lat, lng: index.nearest(lat, lng, args.k), points)
+
+    t0 = time.perf_counter()
+    for i in range(1, 10_001):
+        index.upsert(i, rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE))
+    upsert_us = (time.perf_counter() - t0) / 10_000 * 1e6
+
+    print(
+        json.dumps(
+            {
+                "farmers": args.farmers,
+                "build_s": round(build_s, 2),
+                "upsert_avg_us": round(upsert_us, 2),
+                "stats": index.stats(),
+                "radius": {"radius_km": args.radius_km, **radius},
+                "nearest": {"k": args.k, **knn},
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
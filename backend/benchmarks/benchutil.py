@@ -0,0 +1,61 @@
+import json
+import sys
+from typing import Dict, List, Optional
+
+# Shared by the suite's runners: latency summaries, JSON output and the regression gate.
+
+# Metrics where bigger is better; everything else compared is a latency.
+_HIGHER_IS_BETTER = {"requests_per_s", "ops_per_s"}
+_COMPARED = ("requests_per_s", "ops_per_s", "p50_ms", "p95_ms", "p99_ms", "us_per_op")
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarize(latencies_ms: List[float], elapsed_s: float, statuses: Dict[int, int]) -> dict:
+    return {
+        "requests": len(latencies_ms),
+        "elapsed_s": round(elapsed_s, 3),
+        "requests_per_s": round(len(latencies_ms) / elapsed_s, 1) if elapsed_s else None,
+        "p50_ms": round(percentile(latencies_ms, 0.50), 2) if latencies_ms else None,
+        "p95_ms": round(percentile(latencies_ms, 0.95), 2) if latencies_ms else None,
+        "p99_ms": round(percentile(latencies_ms, 0.99), 2) if latencies_ms else None,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+def regressions(results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> List[str]:
+    found = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not isinstance(before, dict) or not isinstance(current, dict):
+            continue
+        for metric in _COMPARED:
+            old, new = before.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if metric in _HIGHER_IS_BETTER else (new - old) / old
+            if change > max_regression:
+                found.append(f"{name}.{metric}: {old} -> {new} ({change:+.0%})")
+    return found
+
+
+def emit(report: dict, output: Optional[str], baseline_path: Optional[str], max_regression: float) -> int:
+    # Prints/saves the report; with a baseline, returns 1 if any result got worse than allowed.
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if not baseline_path:
+        return 0
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    found = regressions(report.get("results", {}), baseline.get("results", {}), max_regression)
+    for line in found:
+        print(f"[WARN] Regression {line}", file=sys.stderr)
+    return 1 if found else 0
@@ -0,0 +1,204 @@
+import argparse
+import json
+import threading
+import time
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-in for the Open-Meteo geocoding and forecast APIs: same response shapes, deterministic
+# values per name/coordinate, and a configurable delay so runs don't depend on the real service.
+# GET /control?mode=ok|fail|hang switches it into answering 503s or never answering at all.
+# state["requests"] and state["max_inflight"] count API calls (not /control) for tests and benchmarks.
+
+MODES = ("ok", "fail", "hang")
+
+_STATES = ["Tamil Nadu", "Maharashtra", "Karnataka", "Punjab", "Uttar Pradesh", "Gujarat"]
+
+
+def _geocode(name: str) -> dict:
+    seed = zlib.crc32(name.casefold().encode("utf-8"))
+    results = []
+    # Several same-named places in different states, like the real API returns for common names.
+    for i in range(6):
+        s = (seed >> i) & 0xFFFF
+        results.append(
+            {
+                "id": seed + i,
+                "name": name.title(),
+                "latitude": round(8 + (s % 2400) / 100, 4),
+                "longitude": round(69 + (s % 2000) / 100, 4),
+                "country_code": "IN" if i < 5 else "NP",
+                "country": "India" if i < 5 else "Nepal",
+                "admin1": _STATES[(seed + i) % len(_STATES)],
+                "admin2": f"{name.title()} District",
+                "population": (s % 50) * 20_000,
+            }
+        )
+    return {"results": results}
+
+
+_UTC_OFFSET_S = 19800  # Asia/Kolkata
+
+
+def _hourly_value(var: str, seed: int, i: int) -> float:
+    if var == "precipitation_probability":
+        return (seed + i * 7) % 100
+    if var == "temperature_2m":
+        # Warmest mid-afternoon.
+        return round(28 + seed % 80 / 10 - abs(i % 24 - 14) / 2, 1)
+    if var == "wind_speed_10m":
+        return round((seed + i * 3) % 250 / 10, 1)
+    if var == "relative_humidity_2m":
+        return 40 + (seed + i * 5) % 55
+    return 0
+
+
+def _daily_value(var: str, seed: int, d: int) -> float:
+    if var == "temperature_2m_max":
+        return round(32 + (seed + d) % 60 / 10, 1)
+    if var == "temperature_2m_min":
+        return round(20 + (seed + d) % 50 / 10, 1)
+    if var == "precipitation_probability_max":
+        return (seed + d * 13) % 100
+    if var == "precipitation_sum":
+        return round((seed + d * 17) % 300 / 10, 1)
+    if var == "wind_speed_10m_max":
+        return round(10 + (seed + d) % 200 / 10, 1)
+    return 0
+
+
+def _forecast(lat: float, lng: float, hourly_vars=("precipitation_probability",), daily_vars=(), days: int = 7,
+              unixtime: bool = False) -> dict:
+    # Series start at local midnight today, like the real API with timezone=auto and no past_days.
+    now = int(time.time())
+    local_midnight = (now + _UTC_OFFSET_S) // 86400 * 86400 - _UTC_OFFSET_S
+    current = (now + _UTC_OFFSET_S) // 900 * 900 - _UTC_OFFSET_S  # 15-minute steps
+
+    def stamp(ts: int, fmt: str = "%Y-%m-%dT%H:%M"):
+        if unixtime:
+            return ts
+        return datetime.utcfromtimestamp(ts + _UTC_OFFSET_S).strftime(fmt)
+
+    seed = zlib.crc32(f"{lat:.2f},{lng:.2f}".encode("ascii"))
+    hours = [local_midnight + h * 3600 for h in range(24 * days)]
+    data = {
+        "latitude": lat,
+        "longitude": lng,
+        "timezone": "Asia/Kolkata",
+        "utc_offset_seconds": _UTC_OFFSET_S,
+        "current": {
+            "time": stamp(current),
+            "temperature_2m": 24 + seed % 140 / 10,
+            "wind_speed_10m": seed % 40,
+            "relative_humidity_2m": 40 + seed % 55,
+            "weather_code": seed % 4,
+        },
+        "hourly": {"time": [stamp(t) for t in hours]},
+    }
+    for var in hourly_vars:
+        data["hourly"][var] = [_hourly_value(var, seed, i) for i in range(len(hours))]
+    if daily_vars:
+        data["daily"] = {"time": [stamp(local_midnight + d * 86400, "%Y-%m-%d") for d in range(days)]}
+        for var in daily_vars:
+            data["daily"][var] = [_daily_value(var, seed, d) for d in range(days)]
+    return data
+
+
+def make_handler(latency_ms: float, state: dict):
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            q = parse_qs(url.query)
+            if url.path == "/control":
+                mode = q.get("mode", [state["mode"]])[0]
+                if mode not in MODES:
+                    self.send_error(400)
+                    return
+                state["mode"] = mode
+                self._send_json({"mode": mode})
+                return
+            with lock:
+                state["requests"] += 1
+                state["inflight"] += 1
+                state["max_inflight"] = max(state["max_inflight"], state["inflight"])
+            try:
+                self._answer(url, q)
+            finally:
+                with lock:
+                    state["inflight"] -= 1
+
+        def _answer(self, url, q):
+            if state["mode"] == "hang":
+                # Hold the request open until the mode changes (or the client gives up).
+                while state["mode"] == "hang":
+                    time.sleep(0.05)
+                self.close_connection = True
+                return
+            if state["mode"] == "fail":
+                self.send_error(503)
+                return
+
+            if latency_ms > 0:
+                time.sleep(latency_ms / 1000)
+            if url.path.endswith("/search"):
+                body = _geocode(q.get("name", [""])[0])
+            elif url.path.endswith("/forecast"):
+                lats = q.get("latitude", ["0"])[0].split(",")
+                lngs = q.get("longitude", ["0"])[0].split(",")
+                hourly_vars = [v for v in q.get("hourly", [""])[0].split(",") if v]
+                daily_vars = [v for v in q.get("daily", [""])[0].split(",") if v]
+                days = min(16, int(q.get("forecast_days", ["7"])[0]))
+                unixtime = q.get("timeformat", [""])[0] == "unixtime"
+                items = [
+                    _forecast(float(a), float(b), hourly_vars, daily_vars, days, unixtime) for a, b in zip(lats, lngs)
+                ]
+                body = items[0] if len(items) == 1 else items
+            else:
+                self.send_error(404)
+                return
+            self._send_json(body)
+
+        def _send_json(self, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def start_fake_open_meteo(port: int = 0, latency_ms: float = 0, mode: str = "ok") -> Tuple[ThreadingHTTPServer, str]:
+    # server.state["mode"] can also be flipped directly by in-process callers.
+    state = {"mode": mode, "requests": 0, "inflight": 0, "max_inflight": 0}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency_ms, state))
+    server.state = state
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve fake Open-Meteo geocoding/forecast APIs.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--mode", choices=MODES, default="ok")
+    args = parser.parse_args()
+    server, base = start_fake_open_meteo(args.port, args.latency_ms, args.mode)
+    print(f"[INFO] Fake Open-Meteo on {base}/v1/search and {base}/v1/forecast (mode: {base}/control?mode=...)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,68 @@
+import argparse
+import getpass
+import os
+from typing import Optional
+
+from app import _ensure_table_schema
+from auth import hash_password, shutdown_password_pool
+from database import SessionLocal, active_engine
+from models import User
+
+EMPLOYEE_ROLE = "employee"
+
+
+def create_employee(mobile: str, name: Optional[str] = None, password: Optional[str] = None,
+                    email: Optional[str] = None, promote: bool = False) -> dict:
+    # /register and the user import only create farmers and consumers; staff accounts come from here.
+    bind = active_engine()
+    User.__table__.create(bind=bind, checkfirst=True)
+    _ensure_table_schema(User, bind)
+    db = SessionLocal()
+    try:
+        existing = db.query(User).filter(User.mobile == mobile).first()
+        if existing is not None:
+            if not promote:
+                raise ValueError(f"Mobile number {mobile} is already registered; pass --promote to make it an employee")
+            existing.role = EMPLOYEE_ROLE
+            if password:
+                existing.password = hash_password(password)
+            if name:
+                existing.name = name
+            if email:
+                existing.email = email
+            db.commit()
+            return {"id": existing.id, "mobile": mobile, "promoted": True}
+
+        if not name or not password:
+            raise ValueError("A new employee needs a name and a password")
+        user = User(name=name, mobile=mobile, email=email, password=hash_password(password), role=EMPLOYEE_ROLE)
+        db.add(user)
+        db.commit()
+        return {"id": user.id, "mobile": mobile, "promoted": False}
+    finally:
+        db.close()
+        shutdown_password_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create an employee account, or promote an existing user, for the /admin endpoints. "
+        "Existing sessions keep their old role until the user logs in again."
+    )
+    parser.add_argument("--mobile", required=True, help="Login mobile number.")
+    parser.add_argument("--name", help="Display name (required for a new account).")
+    parser.add_argument("--email")
+    parser.add_argument("--promote", action="store_true", help="Give an already registered user the employee role.")
+    args = parser.parse_args()
+
+    # Never on the command line, where it would end up in shell history and ps output.
+    password = os.getenv("EMPLOYEE_PASSWORD")
+    if password is None and not args.promote:
+        password = getpass.getpass("Password: ")
+        if password != getpass.getpass("Repeat password: "):
+            parser.error("passwords do not match")
+
+    try:
+        print(create_employee(args.mobile, name=args.name, password=password, email=args.email, promote=args.promote))
+    except ValueError as e:
+        parser.error(str(e))
@@ -1,6 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool, QueuePool
+import math
 import os
+import threading
+import time
 from dotenv import load_dotenv
 from pathlib import Path
 from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
@@ -10,9 +16,41 @@ env_path = Path(__file__).resolve().parent / ".env"
 load_dotenv(env_path)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+FALLBACK_DATABASE_URL = os.getenv(
+    "FALLBACK_DATABASE_URL", f"sqlite:///{Path(__file__).resolve().parent / 'fallback.db'}"
+)
 
+# Flipped by set_fallback_db(); read it through using_fallback_db(), not a from-import.
 USING_FALLBACK_DB = False
 
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() not in {"0", "false", "no", "off", ""}
+
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "30"))
+# Recycle before Supabase's pooler drops idle connections on its side.
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", "1")
+DB_CONNECT_TIMEOUT_S = int(os.getenv("DB_CONNECT_TIMEOUT_S", "10"))
+
+# Async engine/session (asyncpg / aiosqlite) for the async route handlers.
+DB_ASYNC = _env_flag("DB_ASYNC", "0")
+
+# Failover to the local SQLite database when the (remote) primary stops answering.
+DB_FAILOVER_ENABLED = _env_flag("DB_FAILOVER_ENABLED", "1")
+DB_PROBE_INTERVAL_S = float(os.getenv("DB_PROBE_INTERVAL_S", "5"))
+DB_PROBE_TIMEOUT_S = float(os.getenv("DB_PROBE_TIMEOUT_S", "2"))
+# Consecutive failed probes before switching over, and good ones before switching back.
+DB_FAILOVER_AFTER = int(os.getenv("DB_FAILOVER_AFTER", "2"))
+DB_RECOVER_AFTER = int(os.getenv("DB_RECOVER_AFTER", "3"))
+
+SQLITE_WAL = _env_flag("SQLITE_WAL", "1")
+SQLITE_SHARED_CACHE = _env_flag("SQLITE_SHARED_CACHE", "0")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
 if not DATABASE_URL:
     raise RuntimeError(
         "DATABASE_URL is missing. Set it in backend/.env. "
@@ -33,6 +71,250 @@ def _ensure_sslmode_require(url: str) -> str:
 
 DATABASE_URL = _ensure_sslmode_require(DATABASE_URL)
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
+
+class _TimedQueuePool(QueuePool):
+    # QueuePool that records how long callers wait for a connection.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.wait_count += 1
+            self.wait_total_s += waited
+            if waited > self.wait_max_s:
+                self.wait_max_s = waited
+
+    def recreate(self):
+        # Keep counting across dispose()/recreate().
+        new_pool = super().recreate()
+        new_pool.wait_count = self.wait_count
+        new_pool.wait_total_s = self.wait_total_s
+        new_pool.wait_max_s = self.wait_max_s
+        new_pool.timeouts = self.timeouts
+        return new_pool
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.lower().startswith("sqlite")
+
+
+def _sqlite_url(url: str) -> str:
+    if not SQLITE_SHARED_CACHE or ":memory:" in url or "cache=shared" in url:
+        return url
+    # Shared cache needs the URI filename form: sqlite:///file:<path>?cache=shared&uri=true
+    prefix = "sqlite:///"
+    if not url.startswith(prefix):
+        return url
+    path = url[len(prefix):]
+    sep = "&" if "?" in path else "?"
+    return f"{prefix}file:{path}{sep}cache=shared&uri=true"
+
+
+def _engine_kwargs(url: str) -> dict:
+    kwargs = {
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE_S,
+    }
+    if _is_sqlite(url):
+        kwargs["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        }
+        if ":memory:" in url:
+            return kwargs
+    elif url.lower().startswith("postgres"):
+        kwargs["connect_args"] = {"connect_timeout": DB_CONNECT_TIMEOUT_S}
+
+    kwargs.update(
+        poolclass=_TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT_S,
+    )
+    return kwargs
+
+
+def _install_sqlite_pragmas(sqlite_engine):
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            if SQLITE_WAL:
+                cur.execute("PRAGMA journal_mode=WAL")
+                cur.execute("PRAGMA synchronous=NORMAL")
+            cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        finally:
+            cur.close()
+
+
+def _create_engine(url: str):
+    if _is_sqlite(url):
+        url = _sqlite_url(url)
+    new_engine = create_engine(url, **_engine_kwargs(url))
+    if _is_sqlite(url):
+        _install_sqlite_pragmas(new_engine)
+    return new_engine
+
+
+def _async_url(url: str) -> str:
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend == "postgresql":
+        # asyncpg takes "ssl" rather than libpq's "sslmode".
+        query = dict(u.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return u.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+    if backend == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    return url
+
+
+def _create_async_engine(url: str):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = _async_url(_sqlite_url(url) if _is_sqlite(url) else url)
+    kwargs = _engine_kwargs(url)
+    kwargs.pop("poolclass", None)
+    connect_args = kwargs.pop("connect_args", {})
+    if url.startswith("postgresql+asyncpg"):
+        connect_args = {"timeout": DB_CONNECT_TIMEOUT_S}
+    elif _is_sqlite(url):
+        connect_args = {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    new_engine = create_async_engine(url, connect_args=connect_args, **kwargs)
+    if _is_sqlite(url):
+        _install_sqlite_pragmas(new_engine.sync_engine)
+    return new_engine
+
+
+def pool_stats(target_engine=None) -> dict:
+    pool = (target_engine or engine).pool
+    stats = {"pool_class": pool.__class__.__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(0, pool.overflow()),
+                "max_overflow": DB_MAX_OVERFLOW,
+            }
+        )
+    if isinstance(pool, _TimedQueuePool):
+        stats.update(
+            {
+                "checkouts": pool.wait_count,
+                "wait_total_s": round(pool.wait_total_s, 4),
+                "wait_avg_ms": round(pool.wait_total_s / pool.wait_count * 1000, 3) if pool.wait_count else 0.0,
+                "wait_max_ms": round(pool.wait_max_s * 1000, 3),
+                "timeouts": pool.timeouts,
+            }
+        )
+    return stats
+
+
+engine = _create_engine(DATABASE_URL)
 Base = declarative_base()
+
+async_engine = None
+if DB_ASYNC:
+    async_engine = _create_async_engine(DATABASE_URL)
+
+# A SQLite primary has nothing to fail over to.
+FAILOVER_AVAILABLE = DB_FAILOVER_ENABLED and not _is_sqlite(DATABASE_URL)
+
+fallback_engine = None
+fallback_async_engine = None
+_switch_lock = threading.Lock()
+_switch_listeners = []
+_probe_engine = None
+
+
+def using_fallback_db() -> bool:
+    return USING_FALLBACK_DB
+
+
+def active_engine():
+    return fallback_engine if USING_FALLBACK_DB else engine
+
+
+def active_async_engine():
+    return fallback_async_engine if USING_FALLBACK_DB else async_engine
+
+
+def on_db_switch(callback):
+    # callback(using_fallback) runs on the switching thread after every switch.
+    _switch_listeners.append(callback)
+    return callback
+
+
+def set_fallback_db(enabled: bool) -> bool:
+    # Returns True if this call changed the active database.
+    global USING_FALLBACK_DB, fallback_engine, fallback_async_engine
+    with _switch_lock:
+        if enabled == USING_FALLBACK_DB:
+            return False
+        if enabled:
+            if fallback_engine is None:
+                fallback_engine = _create_engine(FALLBACK_DATABASE_URL)
+            if DB_ASYNC and fallback_async_engine is None:
+                fallback_async_engine = _create_async_engine(FALLBACK_DATABASE_URL)
+        USING_FALLBACK_DB = enabled
+    # Pooled primary connections are dead after an outage (or stale after one); start afresh.
+    engine.dispose()
+    print(f"[WARN] Database failover: now using the {'local fallback' if enabled else 'primary'} database")
+    for callback in _switch_listeners:
+        try:
+            callback(enabled)
+        except Exception as e:
+            print(f"[WARN] Database switch hook failed: {e}")
+    return True
+
+
+def probe_primary(timeout_s: float = DB_PROBE_TIMEOUT_S) -> bool:
+    # A fresh connection per probe (no pool), so a wedged pool can't make the probe wait.
+    global _probe_engine
+    if _probe_engine is None:
+        kwargs = {"poolclass": NullPool}
+        if DATABASE_URL.lower().startswith("postgres"):
+            kwargs["connect_args"] = {"connect_timeout": max(1, math.ceil(timeout_s))}
+        _probe_engine = create_engine(DATABASE_URL, **kwargs)
+    try:
+        with _probe_engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+
+class _FailoverSessionMaker(sessionmaker):
+    # Each new session binds to whichever database is active when it is opened.
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", active_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _FailoverSessionMaker()
+
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    class _FailoverAsyncSessionMaker(async_sessionmaker):
+        def __call__(self, **local_kw):
+            local_kw.setdefault("bind", active_async_engine())
+            return super().__call__(**local_kw)
+
+    # No expiry on commit: attribute access must never trigger lazy IO in async code.
+    AsyncSessionLocal = _FailoverAsyncSessionMaker(expire_on_commit=False)
@@ -0,0 +1,165 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from sqlalchemy import event
+
+from database import (
+    DB_FAILOVER_AFTER,
+    DB_PROBE_INTERVAL_S,
+    DB_PROBE_TIMEOUT_S,
+    DB_RECOVER_AFTER,
+    probe_primary,
+    set_fallback_db,
+    using_fallback_db,
+)
+
+
+class DatabaseFailover:
+    # Probes the primary on a timer (and at once when a request hits a connection error);
+    # switches to the fallback after `fail_after` failed probes and back after `recover_after` good ones.
+    def __init__(
+        self,
+        probe: Callable[[float], bool] = probe_primary,
+        switch: Callable[[bool], bool] = set_fallback_db,
+        interval_s: float = DB_PROBE_INTERVAL_S,
+        timeout_s: float = DB_PROBE_TIMEOUT_S,
+        fail_after: int = DB_FAILOVER_AFTER,
+        recover_after: int = DB_RECOVER_AFTER,
+    ):
+        self.probe = probe
+        self.switch = switch
+        self.interval_s = interval_s
+        self.timeout_s = timeout_s
+        self.fail_after = max(1, fail_after)
+        self.recover_after = max(1, recover_after)
+
+        # Own thread: a hung probe must not take a slot in the request threadpool.
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._probing: Optional[asyncio.Future] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.failures = 0
+        self.successes = 0
+        self.probes = 0
+        self.probe_failures = 0
+        self.switches = 0
+        self.error_wakeups = 0
+        self.last_probe_ms: Optional[float] = None
+        self.last_switch_at: Optional[float] = None
+
+    def watch(self, watched_engine):
+        # Connection-level errors on the primary trigger a probe right away instead of at the next tick.
+        @event.listens_for(watched_engine, "handle_error")
+        def _on_error(ctx):
+            if ctx.is_disconnect or ctx.connection is None:
+                self.report_error()
+
+    def report_error(self):
+        # Thread-safe; called from worker threads.
+        loop, wake = self._loop, self._wake
+        if loop is None or wake is None or using_fallback_db():
+            return
+        self.error_wakeups += 1
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            pass
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-probe")
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _run(self):
+        while True:
+            await self.check_once()
+            # Probe faster while a switch is pending either way.
+            pending = self.failures if not using_fallback_db() else self.successes
+            delay = min(self.interval_s, self.timeout_s) if pending else self.interval_s
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _probe(self) -> bool:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        ok = False
+        # A probe still stuck from last time counts as another failure rather than piling up threads.
+        if self._probing is None or self._probing.done():
+            self._probing = loop.run_in_executor(self._executor, self.probe, self.timeout_s)
+            try:
+                # The driver's connect timeout has whole-second granularity; this is the hard limit.
+                ok = await asyncio.wait_for(asyncio.shield(self._probing), self.timeout_s)
+            except asyncio.TimeoutError:
+                pass
+        self.last_probe_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.probes += 1
+        if not ok:
+            self.probe_failures += 1
+        return ok
+
+    async def check_once(self) -> bool:
+        # Returns whether the primary answered.
+        ok = await self._probe()
+        if ok:
+            self.failures = 0
+            self.successes += 1
+        else:
+            self.successes = 0
+            self.failures += 1
+
+        target = None
+        if using_fallback_db() and self.successes >= self.recover_after:
+            target = False
+        elif not using_fallback_db() and self.failures >= self.fail_after:
+            target = True
+        if target is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                # Switching creates tables / rebuilds in-memory state; keep it off the event loop.
+                if await loop.run_in_executor(None, self.switch, target):
+                    self.switches += 1
+                    self.last_switch_at = time.time()
+            except Exception as e:
+                print(f"[WARN] Database switch failed: {e}")
+            self.failures = self.successes = 0
+        return ok
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._task is not None and not self._task.done(),
+            "using_fallback_db": using_fallback_db(),
+            "probes": self.probes,
+            "probe_failures": self.probe_failures,
+            "consecutive_failures": self.failures,
+            "consecutive_successes": self.successes,
+            "last_probe_ms": self.last_probe_ms,
+            "switches": self.switches,
+            "last_switch_at": self.last_switch_at,
+            "error_wakeups": self.error_wakeups,
+            "interval_s": self.interval_s,
+            "timeout_s": self.timeout_s,
+            "fail_after": self.fail_after,
+            "recover_after": self.recover_after,
+        }
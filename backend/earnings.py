@@ -0,0 +1,197 @@
+import math
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Date, and_, delete, func, insert, literal, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import EarningsRollup, Sale
+
+# Day/month boundaries for "today" and "this month" are local, not UTC.
+EARNINGS_TZ = ZoneInfo(os.getenv("EARNINGS_TZ", "Asia/Kolkata"))
+ALL_TIME = date(1970, 1, 1)
+
+
+def local_day(moment: datetime) -> date:
+    # moment is naive UTC, like every DateTime column here.
+    return moment.replace(tzinfo=timezone.utc).astimezone(EARNINGS_TZ).date()
+
+
+def _buckets(day: date):
+    return [("day", day), ("month", day.replace(day=1)), ("all", ALL_TIME)]
+
+
+def _bump_rollups(db: Session, farmer_id: int, day: date, amount: float, quantity_kg: float):
+    rows = [
+        {
+            "farmer_id": farmer_id,
+            "period": period,
+            "period_start": start,
+            "amount": amount,
+            "quantity_kg": quantity_kg,
+            "sales_count": 1,
+        }
+        for period, start in _buckets(day)
+    ]
+    dialect = db.get_bind().dialect.name
+    if dialect in {"postgresql", "sqlite"}:
+        stmt = (pg_insert if dialect == "postgresql" else sqlite_insert)(EarningsRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EarningsRollup.farmer_id, EarningsRollup.period, EarningsRollup.period_start],
+            set_={
+                "amount": EarningsRollup.amount + stmt.excluded.amount,
+                "quantity_kg": EarningsRollup.quantity_kg + stmt.excluded.quantity_kg,
+                "sales_count": EarningsRollup.sales_count + stmt.excluded.sales_count,
+            },
+        )
+        db.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = db.execute(
+            update(EarningsRollup)
+            .where(
+                EarningsRollup.farmer_id == farmer_id,
+                EarningsRollup.period == row["period"],
+                EarningsRollup.period_start == row["period_start"],
+            )
+            .values(
+                amount=EarningsRollup.amount + amount,
+                quantity_kg=EarningsRollup.quantity_kg + quantity_kg,
+                sales_count=EarningsRollup.sales_count + 1,
+            )
+        )
+        if not result.rowcount:
+            db.execute(insert(EarningsRollup), [row])
+
+
+def record_sale(
+    db: Session,
+    *,
+    farmer_id: int,
+    quantity_kg: float,
+    amount: float,
+    sold_at: Optional[datetime] = None,
+    listing_id: Optional[int] = None,
+    order_id: Optional[int] = None,
+    crop: Optional[str] = None,
+) -> Sale:
+    # Raw record plus its day/month/all-time rollups; the caller owns the transaction.
+    sold_at = sold_at or datetime.utcnow()
+    day = local_day(sold_at)
+    sale = Sale(
+        farmer_id=farmer_id,
+        listing_id=listing_id,
+        order_id=order_id,
+        crop=crop,
+        quantity_kg=quantity_kg,
+        amount=amount,
+        sold_at=sold_at,
+        sale_day=day,
+        sale_month=day.replace(day=1),
+    )
+    db.add(sale)
+    db.flush()
+    _bump_rollups(db, farmer_id, day, amount, quantity_kg)
+    return sale
+
+
+def _round(value: float) -> int:
+    return math.floor(value + 0.5)
+
+
+def earnings_summary(db: Session, farmer_id: int, now: Optional[datetime] = None) -> dict:
+    # Three primary-key reads, however long the sales history is.
+    now = now or datetime.utcnow()
+    keys = _buckets(local_day(now))
+    rows = (
+        db.query(EarningsRollup.period, EarningsRollup.amount)
+        .filter(
+            EarningsRollup.farmer_id == farmer_id,
+            or_(*[and_(EarningsRollup.period == p, EarningsRollup.period_start == s) for p, s in keys]),
+        )
+        .all()
+    )
+    amounts = dict(rows)
+    return {
+        "totalEarnings": _round(amounts.get("all", 0.0)),
+        "todayEarnings": _round(amounts.get("day", 0.0)),
+        "monthlyEarnings": _round(amounts.get("month", 0.0)),
+        "updatedAt": now.isoformat() + "Z",
+        "source": "rollups",
+    }
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+def earnings_series(db: Session, farmer_id: int, granularity: str, start: date, end: date) -> List[dict]:
+    # Zero-filled buckets from start to end (inclusive) for charts.
+    if granularity == "month":
+        start = start.replace(day=1)
+    rows = (
+        db.query(EarningsRollup.period_start, EarningsRollup.amount, EarningsRollup.quantity_kg, EarningsRollup.sales_count)
+        .filter(
+            EarningsRollup.farmer_id == farmer_id,
+            EarningsRollup.period == granularity,
+            EarningsRollup.period_start >= start,
+            EarningsRollup.period_start <= end,
+        )
+        .all()
+    )
+    by_start = {row[0]: row for row in rows}
+
+    out = []
+    current = start
+    while current <= end:
+        row = by_start.get(current)
+        out.append(
+            {
+                "start": current.isoformat(),
+                "amount": round(row[1], 2) if row else 0.0,
+                "quantityKg": round(row[2], 3) if row else 0.0,
+                "sales": row[3] if row else 0,
+            }
+        )
+        current = _next_month(current) if granularity == "month" else current + timedelta(days=1)
+    return out
+
+
+def rebuild_rollups(db: Session, farmer_id: Optional[int] = None) -> dict:
+    # Recompute rollups from the raw sales with one INSERT ... SELECT per period.
+    if db.get_bind().dialect.name == "postgresql":
+        # Hold off concurrent record_sale() calls so no sale lands between the delete and the re-insert.
+        db.execute(text("LOCK TABLE sales IN SHARE MODE"))
+
+    cleared = delete(EarningsRollup)
+    if farmer_id is not None:
+        cleared = cleared.where(EarningsRollup.farmer_id == farmer_id)
+    removed = db.execute(cleared).rowcount or 0
+
+    columns = ["farmer_id", "period", "period_start", "amount", "quantity_kg", "sales_count"]
+    inserted = 0
+    for period, bucket in [
+        ("day", Sale.sale_day),
+        ("month", Sale.sale_month),
+        ("all", literal(ALL_TIME, Date)),
+    ]:
+        group_by = [Sale.farmer_id] if period == "all" else [Sale.farmer_id, bucket]
+        query = select(
+            Sale.farmer_id,
+            literal(period),
+            bucket,
+            func.sum(Sale.amount),
+            func.sum(Sale.quantity_kg),
+            func.count(Sale.id),
+        ).group_by(*group_by)
+        if farmer_id is not None:
+            query = query.where(Sale.farmer_id == farmer_id)
+        inserted += db.execute(insert(EarningsRollup).from_select(columns, query)).rowcount or 0
+
+    db.commit()
+    return {"rollups_removed": removed, "rollups_written": inserted}
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+EVENTS_QUEUE_MAX = int(os.getenv("EVENTS_QUEUE_MAX", "100"))
+EVENTS_HEARTBEAT_S = float(os.getenv("EVENTS_HEARTBEAT_S", "15"))
+EVENTS_MAX_CONNECTIONS = int(os.getenv("EVENTS_MAX_CONNECTIONS", "50000"))
+EVENTS_MAX_PER_USER = int(os.getenv("EVENTS_MAX_PER_USER", "8"))
+# Public topics a connection may opt into; per-user events are always delivered.
+EVENT_TOPICS = {"market"}
+
+_PING = b": ping\n\n"
+
+
+def sse_frame(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n".encode("utf-8")
+
+
+class BrokerFull(Exception):
+    pass
+
+
+class Subscription:
+    # One open stream. The queue holds either a ready frame (bytes) or a coalesce key (str) whose
+    # latest frame lives in _latest, so a burst of updates to one thing costs one queue slot.
+    __slots__ = ("user_id", "topics", "max_queue", "_queue", "_latest", "_ready", "dropped", "_dropped_unsent", "last_sent")
+
+    def __init__(self, user_id: int, topics: Set[str], max_queue: int):
+        self.user_id = user_id
+        self.topics = topics
+        self.max_queue = max_queue
+        self._queue: deque = deque()
+        self._latest: Dict[str, bytes] = {}
+        self._ready = asyncio.Event()
+        self.dropped = 0
+        self._dropped_unsent = 0
+        self.last_sent = time.monotonic()
+
+    def offer(self, frame: bytes, coalesce_key: Optional[str] = None):
+        if coalesce_key is not None:
+            if coalesce_key in self._latest:
+                self._latest[coalesce_key] = frame
+                return
+            self._latest[coalesce_key] = frame
+            self._queue.append(coalesce_key)
+        else:
+            self._queue.append(frame)
+        if len(self._queue) > self.max_queue:
+            # Slow client: drop the oldest and tell it to refetch once it catches up.
+            oldest = self._queue.popleft()
+            if isinstance(oldest, str):
+                self._latest.pop(oldest, None)
+            self.dropped += 1
+            self._dropped_unsent += 1
+        self._ready.set()
+
+    def drain(self) -> List[bytes]:
+        frames = []
+        if self._dropped_unsent:
+            frames.append(sse_frame("resync", {"dropped": self._dropped_unsent}))
+            self._dropped_unsent = 0
+        while self._queue:
+            entry = self._queue.popleft()
+            frames.append(self._latest.pop(entry) if isinstance(entry, str) else entry)
+        self._ready.clear()
+        self.last_sent = time.monotonic()
+        return frames
+
+    async def next_frames(self) -> List[bytes]:
+        await self._ready.wait()
+        return self.drain()
+
+
+class EventBroker:
+    # In-process pub/sub for this worker. Publishers pay one JSON encode per event; each subscriber
+    # gets the same bytes appended to its bounded queue, and its stream coroutine writes them out.
+    def __init__(
+        self,
+        max_queue: int = EVENTS_QUEUE_MAX,
+        heartbeat_s: float = EVENTS_HEARTBEAT_S,
+        max_connections: int = EVENTS_MAX_CONNECTIONS,
+        max_per_user: int = EVENTS_MAX_PER_USER,
+    ):
+        self.max_queue = max_queue
+        self.heartbeat_s = heartbeat_s
+        self.max_connections = max_connections
+        self.max_per_user = max_per_user
+
+        self._by_user: Dict[int, Set[Subscription]] = {}
+        self._by_topic: Dict[str, Set[Subscription]] = {}
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.published = 0
+        self.delivered = 0
+        self.rejected = 0
+
+    def subscribe(self, user_id: int, topics: Iterable[str] = ()) -> Subscription:
+        mine = self._by_user.get(user_id, ())
+        if self._count >= self.max_connections or len(mine) >= self.max_per_user:
+            self.rejected += 1
+            raise BrokerFull()
+        sub = Subscription(user_id, set(topics), self.max_queue)
+        self._by_user.setdefault(user_id, set()).add(sub)
+        for topic in sub.topics:
+            self._by_topic.setdefault(topic, set()).add(sub)
+        self._count += 1
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        mine = self._by_user.get(sub.user_id)
+        if mine is None or sub not in mine:
+            return
+        mine.discard(sub)
+        if not mine:
+            del self._by_user[sub.user_id]
+        for topic in sub.topics:
+            subs = self._by_topic.get(topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._by_topic[topic]
+        self._count -= 1
+
+    def _fan_out(self, subs: Iterable[Subscription], event: str, data: Any, coalesce_key: Optional[str]) -> int:
+        self.published += 1
+        frame = None
+        n = 0
+        for sub in subs:
+            if frame is None:
+                frame = sse_frame(event, data)
+            sub.offer(frame, coalesce_key)
+            n += 1
+        self.delivered += n
+        return n
+
+    def publish_user(self, user_id: int, event: str, data: Any, coalesce_key: Optional[str] = None) -> int:
+        return self._fan_out(self._by_user.get(user_id, ()), event, data, coalesce_key)
+
+    def publish_topic(self, topic: str, event: str, data: Any, coalesce_key: Optional[str] = None) -> int:
+        return self._fan_out(self._by_topic.get(topic, ()), event, data, coalesce_key)
+
+    def call_threadsafe(self, fn, *args):
+        # For publishers running in the threadpool/executor; a no-op before start().
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(fn, *args)
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._loop = None
+
+    async def _heartbeat(self):
+        # One timer for every connection: idle streams get a comment frame, which keeps proxies
+        # from closing them and surfaces dead clients as failed writes.
+        while True:
+            await asyncio.sleep(self.heartbeat_s)
+            cutoff = time.monotonic() - self.heartbeat_s
+            for subs in list(self._by_user.values()):
+                for sub in subs:
+                    if sub.last_sent <= cutoff and not sub._queue:
+                        sub.offer(_PING)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "connections": self._count,
+            "users": len(self._by_user),
+            "topics": {t: len(s) for t, s in self._by_topic.items()},
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": sum(sub.dropped for subs in self._by_user.values() for sub in subs),
+            "rejected": self.rejected,
+        }
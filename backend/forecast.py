@@ -0,0 +1,180 @@
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Days of forecast fetched with every weather refresh (Open-Meteo allows up to 16).
+FORECAST_DAYS = max(1, min(16, int(os.getenv("FORECAST_DAYS", "7"))))
+FORECAST_MAX_STEP_HOURS = 24
+
+HOUR_S = 3600
+DAY_S = 86400
+
+# (response key, Open-Meteo variable, decimals, how an N-hour step combines its hours), by field group.
+HOURLY_FIELDS: Dict[str, Tuple[str, str, int, str]] = {
+    "temperature": ("temperatureC", "temperature_2m", 1, "mean"),
+    "rain": ("rainProbabilityPercent", "precipitation_probability", 0, "max"),
+    "wind": ("windSpeedKmh", "wind_speed_10m", 1, "mean"),
+    "humidity": ("humidityPercent", "relative_humidity_2m", 0, "mean"),
+}
+DAILY_FIELDS: Dict[str, List[Tuple[str, str, int]]] = {
+    "temperature": [("temperatureMaxC", "temperature_2m_max", 1), ("temperatureMinC", "temperature_2m_min", 1)],
+    "rain": [("rainProbabilityMaxPercent", "precipitation_probability_max", 0), ("precipitationMm", "precipitation_sum", 1)],
+    "wind": [("windSpeedMaxKmh", "wind_speed_10m_max", 1)],
+    "humidity": [],
+}
+FORECAST_FIELD_GROUPS = tuple(HOURLY_FIELDS)
+
+
+def open_meteo_forecast_params() -> dict:
+    # Unix times: hourly series are then a start timestamp plus a fixed step. Daily times are local
+    # midnights, 23 or 25 h apart across a DST change, so those are placed by nearest day.
+    return {
+        "hourly": ",".join(spec[1] for spec in HOURLY_FIELDS.values()),
+        "daily": ",".join(spec[1] for specs in DAILY_FIELDS.values() for spec in specs),
+        "forecast_days": str(FORECAST_DAYS),
+        "timeformat": "unixtime",
+    }
+
+
+def _series(times, columns: Dict[str, list], step_s: int) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    # Lays each column out as float32 at the nearest slot to (t - start) / step; gaps become NaN.
+    # Also returns each slot's start time (the given one where known).
+    stamps = np.asarray(times, dtype=np.int64)
+    if stamps.size == 0:
+        return np.zeros(0, dtype=np.int64), {}
+    start = int(stamps.min())
+    slots = (stamps - start + step_s // 2) // step_s
+    length = int(slots.max()) + 1
+    slot_times = start + np.arange(length, dtype=np.int64) * step_s
+    slot_times[slots] = stamps
+    out = {}
+    for name, values in columns.items():
+        if not isinstance(values, list) or len(values) != len(stamps):
+            continue
+        try:
+            raw = np.fromiter((np.nan if v is None else v for v in values), dtype=np.float32, count=len(values))
+        except (TypeError, ValueError):
+            continue
+        arr = np.full(length, np.nan, dtype=np.float32)
+        arr[slots] = raw
+        out[name] = arr
+    return slot_times, out
+
+
+def _json_values(arr: np.ndarray, decimals: int) -> List[Optional[float]]:
+    rounded = np.round(arr.astype(np.float64), decimals).tolist()
+    if decimals == 0:
+        return [None if v != v else int(v) for v in rounded]
+    return [None if v != v else v for v in rounded]
+
+
+def local_iso(ts: int, utc_offset_s: int, fmt: str = "%Y-%m-%dT%H:%M") -> str:
+    # Wall-clock time at the forecast location, in Open-Meteo's own ISO style.
+    return datetime.fromtimestamp(ts + utc_offset_s, timezone.utc).strftime(fmt)
+
+
+class Forecast:
+    # Hourly and daily series as float32 arrays, each a start time plus a fixed step, so finding
+    # any hour or day is arithmetic instead of a search through time strings.
+    __slots__ = ("timezone", "utc_offset_s", "hourly_start", "hourly", "daily_times", "daily")
+
+    def __init__(self, timezone_name: str, utc_offset_s: int, hourly_start: int, hourly: Dict[str, np.ndarray],
+                 daily_times: np.ndarray, daily: Dict[str, np.ndarray]):
+        self.timezone = timezone_name
+        self.utc_offset_s = utc_offset_s
+        self.hourly_start = hourly_start
+        self.hourly = hourly
+        # Start (local midnight) of each day; not evenly spaced across DST changes.
+        self.daily_times = daily_times
+        self.daily = daily
+
+    @property
+    def hours(self) -> int:
+        return max((len(a) for a in self.hourly.values()), default=0)
+
+    @property
+    def days(self) -> int:
+        return max((len(a) for a in self.daily.values()), default=0)
+
+    def hour_index(self, ts: float) -> Optional[int]:
+        i = int((ts - self.hourly_start) // HOUR_S)
+        return i if 0 <= i < self.hours else None
+
+    def value_at(self, variable: str, ts: float) -> Optional[float]:
+        arr = self.hourly.get(variable)
+        i = self.hour_index(ts)
+        if arr is None or i is None or np.isnan(arr[i]):
+            return None
+        return float(arr[i])
+
+    def local_time(self, ts: int) -> str:
+        return local_iso(ts, self.utc_offset_s)
+
+    def hourly_window(self, from_ts: float, hours: int, step: int, groups: Iterable[str]) -> dict:
+        # `hours` of data from the hour containing from_ts, every `step` hours (mean or max over each step).
+        first = max(0, int((from_ts - self.hourly_start) // HOUR_S))
+        count = max(0, min(hours, self.hours - first)) // step
+        out = {
+            "start": self.local_time(self.hourly_start + first * HOUR_S) if count else None,
+            "stepHours": step,
+            "count": count,
+        }
+        for group in groups:
+            key, variable, decimals, how = HOURLY_FIELDS[group]
+            arr = self.hourly.get(variable)
+            if arr is None:
+                continue
+            window = arr[first : first + count * step].reshape(count, step)
+            if step == 1:
+                values = window[:, 0]
+            elif how == "max":
+                values = np.fmax.reduce(window, axis=1)
+            else:
+                present = ~np.isnan(window)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    values = np.where(present, window, 0).sum(axis=1) / present.sum(axis=1)
+            out[key] = _json_values(values, decimals)
+        return out
+
+    def daily_window(self, from_ts: float, days: int, groups: Iterable[str]) -> dict:
+        first = max(0, int(np.searchsorted(self.daily_times, from_ts, side="right")) - 1)
+        count = max(0, min(days, self.days - first))
+        out = {
+            # Dated at midday: utc_offset_s is the offset at fetch time, which can be an hour off
+            # on the far side of a DST change.
+            "start": local_iso(int(self.daily_times[first]) + DAY_S // 2, self.utc_offset_s, "%Y-%m-%d")
+            if count
+            else None,
+            "count": count,
+        }
+        for group in groups:
+            for key, variable, decimals in DAILY_FIELDS[group]:
+                arr = self.daily.get(variable)
+                if arr is not None:
+                    out[key] = _json_values(arr[first : first + count], decimals)
+        return out
+
+
+def parse_forecast(data: dict) -> Optional[Forecast]:
+    # None when the response carries no usable hourly series.
+    hourly = data.get("hourly") if isinstance(data.get("hourly"), dict) else {}
+    daily = data.get("daily") if isinstance(data.get("daily"), dict) else {}
+    try:
+        hourly_times, hourly_series = _series(
+            hourly.get("time") or [], {spec[1]: hourly.get(spec[1]) for spec in HOURLY_FIELDS.values()}, HOUR_S
+        )
+        daily_times, daily_series = _series(
+            daily.get("time") or [],
+            {spec[1]: daily.get(spec[1]) for specs in DAILY_FIELDS.values() for spec in specs},
+            DAY_S,
+        )
+        utc_offset_s = int(data.get("utc_offset_seconds") or 0)
+    except (TypeError, ValueError):
+        return None
+    if not hourly_series:
+        return None
+    return Forecast(
+        str(data.get("timezone") or "GMT"), utc_offset_s, int(hourly_times[0]), hourly_series, daily_times, daily_series
+    )
@@ -0,0 +1,239 @@
+import argparse
+import csv
+import os
+import sys
+from array import array
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH",
+    str(Path(__file__).resolve().parent / "data" / "gazetteer_in.tsv"),
+)
+GAZETTEER_LEARNED_MAX = int(os.getenv("GAZETTEER_LEARNED_MAX", "50000"))
+
+# Column order of the pre-built gazetteer file (tab separated, no header).
+# "keys" holds every spelling the place should be found under, separated by "|".
+_COLUMNS = (
+    "name",
+    "keys",
+    "latitude",
+    "longitude",
+    "country_code",
+    "country",
+    "admin1",
+    "admin2",
+    "population",
+)
+
+
+class Gazetteer:
+    def __init__(self, normalize: Callable[[str], str]):
+        self._normalize = normalize
+        self._lock = Lock()
+        self._loaded = False
+
+        # Array-backed rows; repeated strings live once in _strings.
+        self._strings: List[str] = [""]
+        self._string_ids: Dict[str, int] = {"": 0}
+        self._name = array("I")
+        self._country_code = array("I")
+        self._country = array("I")
+        self._admin1 = array("I")
+        self._admin2 = array("I")
+        self._lat = array("d")
+        self._lng = array("d")
+        self._population = array("q")
+
+        self._index: Dict[str, Tuple[int, ...]] = {}
+        # Upstream results seen at runtime for names missing from the file.
+        self._learned: Dict[str, List[dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self._lat)
+
+    def _intern(self, value: str) -> int:
+        value = (value or "").strip()
+        idx = self._string_ids.get(value)
+        if idx is None:
+            idx = len(self._strings)
+            self._strings.append(value)
+            self._string_ids[value] = idx
+        return idx
+
+    def ensure_loaded(self, path: Optional[str] = None) -> int:
+        if self._loaded:
+            return len(self)
+        with self._lock:
+            if not self._loaded:
+                self._load(path or GAZETTEER_PATH)
+                self._loaded = True
+        return len(self)
+
+    def _load(self, path: str):
+        p = Path(path)
+        if not p.is_file():
+            print(f"[WARN] Gazetteer file not found at {p}; geocoding will use Open-Meteo only.")
+            return
+
+        index: Dict[str, List[int]] = {}
+        with p.open("r", encoding="utf-8", newline="") as fh:
+            for line in fh:
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) != len(_COLUMNS):
+                    continue
+                name, keys, lat, lng, cc, country, admin1, admin2, pop = cols
+                try:
+                    lat_f = float(lat)
+                    lng_f = float(lng)
+                    pop_i = int(pop or 0)
+                except ValueError:
+                    continue
+
+                row = len(self._lat)
+                self._name.append(self._intern(name))
+                self._country_code.append(self._intern(cc))
+                self._country.append(self._intern(country))
+                self._admin1.append(self._intern(admin1))
+                self._admin2.append(self._intern(admin2))
+                self._lat.append(lat_f)
+                self._lng.append(lng_f)
+                self._population.append(pop_i)
+
+                seen = set()
+                for key in [name, *keys.split("|")]:
+                    k = self._normalize(key)
+                    if k and k not in seen:
+                        seen.add(k)
+                        index.setdefault(k, []).append(row)
+
+        self._index = {k: tuple(v) for k, v in index.items()}
+
+    def _row(self, i: int) -> dict:
+        s = self._strings
+        return {
+            "name": s[self._name[i]],
+            "latitude": self._lat[i],
+            "longitude": self._lng[i],
+            "country_code": s[self._country_code[i]],
+            "country": s[self._country[i]],
+            "admin1": s[self._admin1[i]],
+            "admin2": s[self._admin2[i]],
+            "population": self._population[i],
+        }
+
+    def lookup(self, name: str) -> List[dict]:
+        self.ensure_loaded()
+        key = self._normalize(name)
+        if not key:
+            return []
+        rows = self._index.get(key)
+        if rows:
+            return [self._row(i) for i in rows]
+        return list(self._learned.get(key) or [])
+
+    def remember(self, name: str, results: List[dict]):
+        key = self._normalize(name)
+        if not key or key in self._index:
+            return
+        items = [r for r in results if isinstance(r, dict)]
+        if not items:
+            return
+        with self._lock:
+            while len(self._learned) >= GAZETTEER_LEARNED_MAX:
+                self._learned.pop(next(iter(self._learned)))
+            self._learned[key] = items
+
+
+# ---------------- BUILD (GeoNames dump -> gazetteer file) ----------------
+
+def _read_code_names(path: str) -> Dict[str, str]:
+    names: Dict[str, str] = {}
+    with open(path, "r", encoding="utf-8", newline="") as fh:
+        for row in csv.reader(fh, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if len(row) >= 3:
+                names[row[0]] = row[2] or row[1]
+    return names
+
+
+def build_from_geonames(
+    geonames_path: str,
+    admin1_path: str,
+    admin2_path: str,
+    out_path: str,
+    country: str = "India",
+    min_population: int = 0,
+) -> int:
+    admin1_names = _read_code_names(admin1_path)
+    admin2_names = _read_code_names(admin2_path)
+
+    written = 0
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    csv.field_size_limit(sys.maxsize)
+    with open(geonames_path, "r", encoding="utf-8", newline="") as src, open(
+        out_path, "w", encoding="utf-8", newline=""
+    ) as dst:
+        for row in csv.reader(src, delimiter="\t", quoting=csv.QUOTE_NONE):
+            if len(row) < 15:
+                continue
+            feature_class, feature_code = row[6], row[7]
+            # Villages/towns plus district (ADM2) polygons' centroids.
+            if feature_class != "P" and feature_code != "ADM2":
+                continue
+            try:
+                population = int(row[14] or 0)
+            except ValueError:
+                population = 0
+            if feature_class == "P" and population < min_population:
+                continue
+
+            cc = row[8]
+            admin1 = admin1_names.get(f"{cc}.{row[10]}", "")
+            admin2 = admin2_names.get(f"{cc}.{row[10]}.{row[11]}", "")
+            if feature_code == "ADM2" and not admin2:
+                admin2 = row[1]
+
+            keys = {row[1], row[2]}
+            keys.update(a for a in row[3].split(",") if a and a.isascii())
+            keys.discard("")
+
+            dst.write(
+                "\t".join(
+                    [
+                        row[1],
+                        "|".join(sorted(k.replace("|", " ").replace("\t", " ") for k in keys)),
+                        row[4],
+                        row[5],
+                        cc,
+                        country,
+                        admin1,
+                        admin2,
+                        str(population),
+                    ]
+                )
+                + "\n"
+            )
+            written += 1
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the offline gazetteer from GeoNames dumps.")
+    parser.add_argument("geonames", help="GeoNames country dump, e.g. IN.txt")
+    parser.add_argument("admin1", help="admin1CodesASCII.txt")
+    parser.add_argument("admin2", help="admin2Codes.txt")
+    parser.add_argument("--out", default=GAZETTEER_PATH)
+    parser.add_argument("--country", default="India")
+    parser.add_argument("--min-population", type=int, default=0)
+    args = parser.parse_args()
+
+    n = build_from_geonames(
+        args.geonames,
+        args.admin1,
+        args.admin2,
+        args.out,
+        country=args.country,
+        min_population=args.min_population,
+    )
+    print(f"Wrote {n} places to {args.out}")
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import math
+import time
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # stdlib fallback keeps the app running where the wheel isn't available
+    orjson = None
+
+GZIP_MIN_BYTES = 1000
+
+
+def json_bytes(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return json_bytes(content)
+
+
+def payload_etag(body: bytes) -> str:
+    # Strong validator: same bytes, same tag, in every worker process.
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x".
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return etag in tags
+
+
+def max_age_until(expires_at: Optional[float], now: Optional[float] = None) -> int:
+    if expires_at is None:
+        return 0
+    return max(0, math.floor(expires_at - (now if now is not None else time.time())))
+
+
+def conditional_json(request: Request, content: Any, cache_control: str) -> Response:
+    # Serializes once, tags the bytes, and answers a matching If-None-Match with an empty 304.
+    body = json_bytes(content)
+    etag = payload_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
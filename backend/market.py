@@ -0,0 +1,164 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from models import MarketItem
+
+MARKET_PAGE_MAX_LIMIT = 100
+
+# API (camelCase, matching the Firestore documents) -> MarketItem attribute.
+ITEM_FIELDS: Dict[str, str] = {
+    "id": "id",
+    "farmerId": "farmer_id",
+    "farmerName": "farmer_name",
+    "productName": "product_name",
+    "crop": "crop",
+    "category": "category",
+    "pricePerKg": "price_per_kg",
+    "quantityKg": "quantity_kg",
+    "unit": "unit",
+    "location": "location",
+    "district": "district",
+    "state": "state",
+    "isUrgentDeal": "is_urgent_deal",
+    "discountPercent": "discount_percent",
+    "dealExpiryTime": "deal_expiry_time",
+    "createdAt": "created_at",
+    "updatedAt": "updated_at",
+}
+
+SORT_COLUMNS = {
+    "created": "created_at",
+    "updated": "updated_at",
+    "price": "price_per_kg",
+}
+SORTS = list(SORT_COLUMNS) + ["distance"]
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat() + "Z"
+    return value
+
+
+def item_to_dict(item, fields: Optional[List[str]] = None) -> dict:
+    names = fields or list(ITEM_FIELDS)
+    return {name: _json_value(getattr(item, ITEM_FIELDS[name])) for name in names}
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in ITEM_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def _cursor_value(sort: str, raw):
+    if sort in {"created", "updated"}:
+        if not isinstance(raw, str):
+            raise ValueError("bad cursor")
+        return datetime.fromisoformat(raw.rstrip("Z"))
+    if not isinstance(raw, (int, float)):
+        raise ValueError("bad cursor")
+    return float(raw)
+
+
+def list_items_page(
+    db: Session,
+    *,
+    category: Optional[str],
+    crop: Optional[str],
+    district: Optional[str],
+    sort: str,
+    descending: bool,
+    after: Optional[list],
+    limit: int,
+    fields: Optional[List[str]],
+    farmer_ids: Optional[List[int]] = None,
+    distances: Optional[Dict[int, float]] = None,
+) -> Tuple[List[dict], Optional[list]]:
+    # distances (farmer id -> km) restricts the page to those farmers and adds distanceKm.
+    if sort == "distance" and distances is None:
+        raise ValueError("distance sort needs a location")
+    if after is not None and (len(after) != 2 or not isinstance(after[1], int)):
+        raise ValueError("bad cursor")
+
+    sort_attr = SORT_COLUMNS.get(sort)
+    names = fields or list(ITEM_FIELDS)
+    # Project only what was asked for, plus what the cursor and distances need.
+    extra = ["id"] + ([sort_attr] if sort_attr else []) + (["farmer_id"] if distances is not None else [])
+    attrs = list(dict.fromkeys([ITEM_FIELDS[n] for n in names] + extra))
+    q = db.query(*[getattr(MarketItem, a) for a in attrs])
+
+    if category:
+        q = q.filter(MarketItem.category == category)
+    if crop:
+        q = q.filter(MarketItem.crop == crop)
+    if district:
+        q = q.filter(MarketItem.district == district)
+    if farmer_ids is not None:
+        q = q.filter(MarketItem.farmer_id.in_(farmer_ids))
+    if distances is not None:
+        q = q.filter(MarketItem.farmer_id.in_(list(distances)))
+
+    if sort == "distance":
+        # The candidate set is already bounded by the radius, so order it here.
+        rows = [dict(zip(attrs, row)) for row in q.all()]
+        sign = -1 if descending else 1
+        rows.sort(key=lambda r: (sign * distances[r["farmer_id"]], sign * r["id"]))
+        if after is not None:
+            key = (sign * _cursor_value(sort, after[0]), sign * after[1])
+            rows = [r for r in rows if (sign * distances[r["farmer_id"]], sign * r["id"]) > key]
+    else:
+        sort_col = getattr(MarketItem, sort_attr)
+        if after is not None:
+            value, last_id = _cursor_value(sort, after[0]), after[1]
+            if descending:
+                q = q.filter(or_(sort_col < value, and_(sort_col == value, MarketItem.id < last_id)))
+            else:
+                q = q.filter(or_(sort_col > value, and_(sort_col == value, MarketItem.id > last_id)))
+        if descending:
+            q = q.order_by(sort_col.desc(), MarketItem.id.desc())
+        else:
+            q = q.order_by(sort_col.asc(), MarketItem.id.asc())
+        rows = [dict(zip(attrs, row)) for row in q.limit(limit + 1).all()]
+
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if sort == "distance":
+            next_after = [distances[last["farmer_id"]], last["id"]]
+        else:
+            next_after = [_json_value(last[sort_attr]), last["id"]]
+
+    items = []
+    for values in rows:
+        item = {n: _json_value(values[ITEM_FIELDS[n]]) for n in names}
+        if distances is not None:
+            item["distanceKm"] = round(distances[values["farmer_id"]], 2)
+        items.append(item)
+    return items, next_after
+
+
+def effective_price_per_kg(price_per_kg: float, is_urgent_deal: bool, discount_percent: Optional[float]) -> float:
+    # Same rule the dashboards use: urgent deals take their discount, capped at half price.
+    if is_urgent_deal and discount_percent:
+        return price_per_kg * max(0.5, 1 - discount_percent / 100)
+    return price_per_kg
+
+
+def apply_item_changes(item: MarketItem, changes: dict):
+    for name, value in changes.items():
+        attr = ITEM_FIELDS.get(name)
+        if not attr or attr in {"id", "farmer_id", "farmer_name", "created_at", "updated_at"}:
+            continue
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            # Stored as naive UTC, like created_at/updated_at.
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        setattr(item, attr, value)
@@ -0,0 +1,267 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").strip().lower() not in {"0", "false", "no", "off", ""}
+# Log a per-request breakdown for requests slower than this; 0 turns the log off.
+METRICS_SLOW_REQUEST_MS = float(os.getenv("METRICS_SLOW_REQUEST_MS", "0"))
+
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+HASH_BUCKETS_S = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+Labels = Tuple[Tuple[str, str], ...]
+# A collector returns (name, type, help, [(labels, value)]) for values read at scrape time.
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Labels, float]]]]]
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    # Counters and histograms kept in plain dicts under one lock; rendering is the only slow path.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: List[Collector] = []
+
+    def describe(self, name: str, kind: str, help_text: str):
+        self._meta[name] = (kind, help_text)
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1.0):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def add(self, name: str, labels: Labels = (), value: float = 1.0):
+        # Gauge delta (e.g. in-flight requests).
+        key = (name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: Labels, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS_S):
+        key = (name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {k: (h.buckets, list(h.counts), h.sum, h.count) for k, h in self._histograms.items()}
+
+        families: Dict[str, List[str]] = {}
+        kinds: Dict[str, Tuple[str, str]] = {}
+
+        def family(name: str, default_kind: str) -> List[str]:
+            if name not in families:
+                families[name] = []
+                kinds[name] = self._meta.get(name, (default_kind, ""))
+            return families[name]
+
+        for (name, labels), value in sorted(counters.items()):
+            family(name, "counter").append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+        for (name, labels), value in sorted(gauges.items()):
+            family(name, "gauge").append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+        for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            lines = family(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(list(buckets) + [float("inf")], counts):
+                cumulative += n
+                le = 'le="' + _fmt_value(bound) + '"'
+                lines.append(f"{name}_bucket{_fmt_labels(labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(total)}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+
+        for collector in self._collectors:
+            try:
+                for name, kind, help_text, samples in collector():
+                    lines = family(name, kind)
+                    kinds[name] = (kind, help_text)
+                    lines.extend(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}" for labels, value in samples)
+            except Exception as e:
+                print(f"[WARN] Metrics collector failed: {e}")
+
+        out = []
+        for name, lines in families.items():
+            kind, help_text = kinds[name]
+            if help_text:
+                out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+METRICS = MetricsRegistry()
+METRICS.describe("agri_http_requests_total", "counter", "HTTP requests by route template and status code.")
+METRICS.describe("agri_http_request_duration_seconds", "histogram", "HTTP request latency by route template.")
+METRICS.describe("agri_http_requests_in_flight", "gauge", "HTTP requests currently being served.")
+METRICS.describe("agri_http_request_db_queries", "histogram", "SQL statements executed per HTTP request.")
+METRICS.describe("agri_db_query_duration_seconds", "histogram", "SQL statement latency by statement type.")
+METRICS.describe("agri_db_errors_total", "counter", "SQL statements that raised a DBAPI error.")
+METRICS.describe("agri_upstream_request_duration_seconds", "histogram", "Upstream HTTP call latency (retries included) by host.")
+METRICS.describe("agri_upstream_requests_total", "counter", "Upstream HTTP calls by host and outcome.")
+METRICS.describe("agri_upstream_retries_total", "counter", "Upstream HTTP retries by host.")
+METRICS.describe("agri_upstream_short_circuited_total", "counter", "Upstream calls refused by an open circuit breaker.")
+METRICS.describe("agri_password_hash_duration_seconds", "histogram", "bcrypt jobs from submit to result (queueing included).")
+METRICS.describe("agri_password_hash_rejected_total", "counter", "bcrypt jobs refused because the hashing queue was full.")
+
+
+class RequestStats:
+    # Per-request accumulator; threadpool work sees it through the copied contextvars context.
+    __slots__ = ("db_s", "db_queries", "upstream_s", "upstream_calls", "hash_s")
+
+    def __init__(self):
+        self.db_s = 0.0
+        self.db_queries = 0
+        self.upstream_s = 0.0
+        self.upstream_calls = 0
+        self.hash_s = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+_STATEMENT_OPS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+
+def _statement_op(statement: str) -> str:
+    head = statement[:16].lstrip().split(None, 1)
+    op = head[0].upper() if head else ""
+    return op if op in _STATEMENT_OPS else "OTHER"
+
+
+def instrument_engine(engine, db_label: str):
+    # Times every cursor execute; the start time rides on the connection so nested executes pair up.
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_started")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        METRICS.observe(
+            "agri_db_query_duration_seconds", (("db", db_label), ("op", _statement_op(statement))), elapsed, QUERY_BUCKETS_S
+        )
+        stats = current_request.get()
+        if stats is not None:
+            stats.db_s += elapsed
+            stats.db_queries += 1
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(ctx):
+        conn = ctx.connection
+        if conn is not None and conn.info.get("metrics_started"):
+            conn.info["metrics_started"].pop()
+        METRICS.inc("agri_db_errors_total", (("db", db_label),))
+
+
+def record_upstream(host: str, elapsed_s: float, ok: bool):
+    METRICS.observe("agri_upstream_request_duration_seconds", (("host", host),), elapsed_s)
+    METRICS.inc("agri_upstream_requests_total", (("host", host), ("outcome", "ok" if ok else "error")))
+    stats = current_request.get()
+    if stats is not None:
+        stats.upstream_s += elapsed_s
+        stats.upstream_calls += 1
+
+
+def record_password_hash(op: str, elapsed_s: float):
+    # May run on the pool's callback thread, outside any request context.
+    METRICS.observe("agri_password_hash_duration_seconds", (("op", op),), elapsed_s, HASH_BUCKETS_S)
+
+
+def charge_password_wait(elapsed_s: float):
+    stats = current_request.get()
+    if stats is not None:
+        stats.hash_s += elapsed_s
+
+
+class MetricsMiddleware:
+    # Plain ASGI (no BaseHTTPMiddleware task hop). Routes are labelled by template, so
+    # /market/items/{item_id} is one series however many ids are requested.
+    def __init__(self, app, slow_request_ms: float = METRICS_SLOW_REQUEST_MS):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        METRICS.add("agri_http_requests_in_flight")
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            METRICS.add("agri_http_requests_in_flight", (), -1)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            METRICS.inc("agri_http_requests_total", (("method", method), ("route", route), ("status", str(status))))
+            METRICS.observe("agri_http_request_duration_seconds", (("method", method), ("route", route)), elapsed)
+            METRICS.observe("agri_http_request_db_queries", (("route", route),), stats.db_queries, COUNT_BUCKETS)
+            if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+                other = max(0.0, elapsed - stats.db_s - stats.upstream_s - stats.hash_s)
+                print(
+                    f"[WARN] Slow request {method} {route} {status} {elapsed * 1000:.0f}ms: "
+                    f"db={stats.db_s * 1000:.0f}ms/{stats.db_queries}q "
+                    f"upstream={stats.upstream_s * 1000:.0f}ms/{stats.upstream_calls} "
+                    f"bcrypt={stats.hash_s * 1000:.0f}ms other={other * 1000:.0f}ms"
+                )
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from datetime import datetime
+
+from sqlalchemy import Boolean, Column, Date, DateTime, Integer, String, Float, ForeignKey, Index, UniqueConstraint
 
 from database import Base
 
@@ -22,12 +24,203 @@ class User(Base):
     village = Column(String)
     pincode = Column(String)
 
+    # Resolved once from district/state so weather lookups skip geocoding.
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geo_label = Column(String, nullable=True)
+
     soil_type = Column(String)
     land_area = Column(String)
     primary_crops = Column(String)
 
+    # Current crop cycle, used by the alert rules.
+    sowing_date = Column(DateTime, nullable=True)
+    expected_harvest_days = Column(Integer, nullable=True)
+    soil_moisture_percent = Column(Float, nullable=True)
+
     password = Column(String)
     role = Column(String)
 
+    __table_args__ = (
+        # Employee directory filters; trailing id keeps keyset pagination index-ordered.
+        Index("ix_users_role_state_district_village_id", "role", "state", "district", "village", "id"),
+        Index("ix_users_district_village_id", "district", "village", "id"),
+        Index("ix_users_pincode_id", "pincode", "id"),
+    )
+
+
+class MarketItem(Base):
+    __tablename__ = "market_items"
+
+    id = Column(Integer, primary_key=True)
+
+    farmer_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    farmer_name = Column(String)
+
+    product_name = Column(String, nullable=False)
+    crop = Column(String, nullable=False)
+    category = Column(String)
+
+    price_per_kg = Column(Float, nullable=False)
+    quantity_kg = Column(Float, nullable=False)
+    unit = Column(String, default="kg")
+
+    location = Column(String)
+    district = Column(String)
+    state = Column(String)
+
+    is_urgent_deal = Column(Boolean, default=False, nullable=False)
+    discount_percent = Column(Float, nullable=True)
+    deal_expiry_time = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # When the price, crop or place last changed: the day its ask is filed under in the price index.
+    priced_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # One (sort key, id) index per sort order, plus filtered variants the market pages use.
+        Index("ix_market_items_created_id", "created_at", "id"),
+        Index("ix_market_items_updated_id", "updated_at", "id"),
+        Index("ix_market_items_price_id", "price_per_kg", "id"),
+        Index("ix_market_items_category_created_id", "category", "created_at", "id"),
+        Index("ix_market_items_category_price_id", "category", "price_per_kg", "id"),
+        Index("ix_market_items_crop_price_id", "crop", "price_per_kg", "id"),
+        Index("ix_market_items_district_created_id", "district", "created_at", "id"),
+    )
+
+
+class Alert(Base):
+    __tablename__ = "alerts"
+
+    id = Column(Integer, primary_key=True)
+
+    farmer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    rule_id = Column(String, nullable=False)
+    severity = Column(String, nullable=False)
+    message = Column(String, nullable=False)
+
+    # active: the rule fired on the latest evaluation; a rule that clears and fires again reopens it.
+    active = Column(Boolean, default=True, nullable=False)
+    dismissed = Column(Boolean, default=False, nullable=False)
+    dismissed_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("farmer_id", "rule_id", name="uq_alerts_farmer_rule"),
+        Index("ix_alerts_farmer_active_created", "farmer_id", "active", "dismissed", "created_at"),
+    )
+
+
+class Sale(Base):
+    __tablename__ = "sales"
+
+    id = Column(Integer, primary_key=True)
+
+    farmer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # No FKs: listings can be deleted and orders archived without touching earnings history.
+    listing_id = Column(Integer, nullable=True)
+    order_id = Column(Integer, nullable=True)
+    crop = Column(String, nullable=True)
+
+    quantity_kg = Column(Float, nullable=False)
+    amount = Column(Float, nullable=False)
+
+    sold_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Local (EARNINGS_TZ) calendar buckets, fixed at write time so rollups rebuild with a plain GROUP BY.
+    sale_day = Column(Date, nullable=False)
+    sale_month = Column(Date, nullable=False)
+
+    __table_args__ = (Index("ix_sales_farmer_sold_at", "farmer_id", "sold_at"),)
+
+
+class EarningsRollup(Base):
+    __tablename__ = "earnings_rollups"
+
+    farmer_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # "day" / "month" buckets start on that local date; "all" has a single row per farmer.
+    period = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+
+    amount = Column(Float, default=0, nullable=False)
+    quantity_kg = Column(Float, default=0, nullable=False)
+    sales_count = Column(Integer, default=0, nullable=False)
+
+
+class PriceRollup(Base):
+    __tablename__ = "price_rollups"
+
+    # scope "district" keys region as "<state>/<district>", scope "state" as "<state>"; all normalized.
+    scope = Column(String, primary_key=True)
+    region = Column(String, primary_key=True)
+    crop = Column(String, primary_key=True)
+    # "ask": live listing prices; "sale": prices paid in orders; "reported": sales farmers recorded themselves.
+    kind = Column(String, primary_key=True)
+    # Local (EARNINGS_TZ) day of the events; 1970-01-01 holds the all-time totals.
+    day = Column(Date, primary_key=True)
+
+    events = Column(Integer, default=0, nullable=False)
+    volume_kg = Column(Float, default=0, nullable=False)
+    price_sum = Column(Float, default=0, nullable=False)
+    min_price = Column(Float, nullable=True)
+    max_price = Column(Float, nullable=True)
+
+
+class PriceSketchBucket(Base):
+    __tablename__ = "price_sketch_buckets"
+
+    # Log-spaced price buckets (see price_index.py) per rollup row: a mergeable quantile sketch.
+    scope = Column(String, primary_key=True)
+    region = Column(String, primary_key=True)
+    crop = Column(String, primary_key=True)
+    kind = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+
+    events = Column(Integer, default=0, nullable=False)
+
+
+class Order(Base):
+    __tablename__ = "orders"
+
+    id = Column(Integer, primary_key=True)
+
+    consumer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    farmer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    listing_id = Column(Integer, nullable=False)
+    product_name = Column(String)
+    unit = Column(String)
+
+    quantity_kg = Column(Float, nullable=False)
+    price_per_kg = Column(Float, nullable=False)
+    total_price = Column(Float, nullable=False)
+    status = Column(String, default="Placed", nullable=False)
+
+    # Client-chosen key; a retried request with the same key gets the original order back.
+    idempotency_key = Column(String, nullable=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("consumer_id", "idempotency_key", name="uq_orders_consumer_idempotency_key"),
+        Index("ix_orders_consumer_id", "consumer_id", "id"),
+        Index("ix_orders_farmer_id", "farmer_id", "id"),
+    )
+
+
+class Notification(Base):
+    __tablename__ = "notifications"
+
+    id = Column(Integer, primary_key=True)
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    order_id = Column(Integer, nullable=True)
+    message = Column(String, nullable=False)
+    read = Column(Boolean, default=False, nullable=False)
+    read_at = Column(DateTime, nullable=True)
 
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (Index("ix_notifications_user_id", "user_id", "id"),)
@@ -0,0 +1,73 @@
+import asyncio
+import os
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+ORDER_BATCH_MAX = int(os.getenv("ORDER_BATCH_MAX", "64"))
+
+BatchProcessor = Callable[[Hashable, List[Any]], List[Any]]
+
+
+class KeyedBatchQueue:
+    # One in-process queue per key (a listing). Requests for the same key are drained by a single
+    # worker in batches, so a flash deal costs one DB transaction per batch instead of one
+    # connection per buyer all queueing on the same row lock.
+    def __init__(self, process_batch: BatchProcessor, max_batch: int = ORDER_BATCH_MAX):
+        self.process_batch = process_batch
+        self.max_batch = max(1, max_batch)
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._workers: Dict[Hashable, asyncio.Task] = {}
+
+        self.submitted = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+
+    async def submit(self, key: Hashable, request: Any) -> Any:
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(key, []).append((request, fut))
+        self.submitted += 1
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key))
+        return await fut
+
+    async def _drain(self, key: Hashable):
+        try:
+            while self._pending.get(key):
+                queue = self._pending[key]
+                batch, self._pending[key] = queue[: self.max_batch], queue[self.max_batch :]
+                # Callers that gave up (client disconnect) are dropped before they touch the DB.
+                batch = [(req, fut) for req, fut in batch if not fut.done()]
+                if not batch:
+                    continue
+                self.batches += 1
+                self.max_batch_seen = max(self.max_batch_seen, len(batch))
+                try:
+                    results = await run_in_threadpool(self.process_batch, key, [req for req, _ in batch])
+                except Exception as e:
+                    results = [e] * len(batch)
+                for (_, fut), result in zip(batch, results):
+                    if fut.done():
+                        continue
+                    if isinstance(result, Exception):
+                        fut.set_exception(result)
+                    else:
+                        fut.set_result(result)
+        except asyncio.CancelledError:
+            for _, fut in self._pending.pop(key, []):
+                fut.cancel()
+            raise
+        finally:
+            self._workers.pop(key, None)
+            if not self._pending.get(key):
+                self._pending.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "active_keys": len(self._workers),
+            "queued": sum(len(q) for q in self._pending.values()),
+            "submitted": self.submitted,
+            "batches": self.batches,
+            "avg_batch": round(self.submitted / self.batches, 2) if self.batches else None,
+            "max_batch_seen": self.max_batch_seen,
+        }
@@ -0,0 +1,214 @@
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from earnings import record_sale
+from market import effective_price_per_kg
+from models import MarketItem, Notification, Order
+from price_index import record_price
+
+ORDER_MAX_QUANTITY_KG = float(os.getenv("ORDER_MAX_QUANTITY_KG", "10000"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 128
+
+
+class OrderRequest:
+    __slots__ = ("consumer_id", "consumer_name", "listing_id", "quantity_kg", "idempotency_key")
+
+    def __init__(self, consumer_id: int, consumer_name: str, listing_id: int, quantity_kg: float, idempotency_key: Optional[str]):
+        self.consumer_id = consumer_id
+        self.consumer_name = consumer_name
+        self.listing_id = listing_id
+        self.quantity_kg = quantity_kg
+        self.idempotency_key = idempotency_key
+
+
+def order_to_dict(order: Order) -> dict:
+    return {
+        "id": order.id,
+        "listingId": order.listing_id,
+        "farmerId": order.farmer_id,
+        "consumerId": order.consumer_id,
+        "productName": order.product_name,
+        "quantityKg": order.quantity_kg,
+        "unit": order.unit,
+        "pricePerKg": order.price_per_kg,
+        "totalPrice": order.total_price,
+        "status": order.status,
+        "createdAt": order.created_at.isoformat() + "Z",
+    }
+
+
+def notification_to_dict(note: Notification) -> dict:
+    return {
+        "id": note.id,
+        "orderId": note.order_id,
+        "message": note.message,
+        "read": note.read,
+        "createdAt": note.created_at.isoformat() + "Z",
+    }
+
+
+def find_order_by_key(db: Session, consumer_id: int, idempotency_key: str) -> Optional[Order]:
+    return (
+        db.query(Order)
+        .filter(Order.consumer_id == consumer_id, Order.idempotency_key == idempotency_key)
+        .first()
+    )
+
+
+def check_replay(order: Order, req: OrderRequest) -> Order:
+    if order.listing_id != req.listing_id or order.quantity_kg != req.quantity_kg:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different order")
+    return order
+
+
+def place_order(db: Session, req: OrderRequest) -> Tuple[Order, List[Notification]]:
+    # Reserve stock with one conditional UPDATE (no read-then-write race), then write the order,
+    # both notifications, the sale and its price event in the caller's transaction.
+    now = datetime.utcnow()
+    reserved = db.execute(
+        update(MarketItem)
+        .where(
+            MarketItem.id == req.listing_id,
+            MarketItem.quantity_kg >= req.quantity_kg,
+            MarketItem.farmer_id != req.consumer_id,
+        )
+        .values(quantity_kg=MarketItem.quantity_kg - req.quantity_kg, updated_at=now)
+        .returning(
+            MarketItem.farmer_id,
+            MarketItem.product_name,
+            MarketItem.unit,
+            MarketItem.crop,
+            MarketItem.district,
+            MarketItem.state,
+            MarketItem.price_per_kg,
+            MarketItem.is_urgent_deal,
+            MarketItem.discount_percent,
+        )
+        .execution_options(synchronize_session=False)
+    ).first()
+
+    if reserved is None:
+        item = db.query(MarketItem.farmer_id, MarketItem.quantity_kg).filter(MarketItem.id == req.listing_id).first()
+        if item is None:
+            raise HTTPException(status_code=404, detail="Listing not found")
+        if item.farmer_id == req.consumer_id:
+            raise HTTPException(status_code=422, detail="You cannot order your own listing")
+        raise HTTPException(status_code=409, detail=f"Only {max(0.0, item.quantity_kg):g} kg left in stock")
+
+    price = effective_price_per_kg(reserved.price_per_kg, reserved.is_urgent_deal, reserved.discount_percent)
+    total = round(price * req.quantity_kg, 2)
+    product_name = reserved.product_name or "Product"
+    order = Order(
+        consumer_id=req.consumer_id,
+        farmer_id=reserved.farmer_id,
+        listing_id=req.listing_id,
+        product_name=product_name,
+        unit=reserved.unit or "kg",
+        quantity_kg=req.quantity_kg,
+        price_per_kg=round(price, 2),
+        total_price=total,
+        status="Placed",
+        idempotency_key=req.idempotency_key,
+        created_at=now,
+    )
+    db.add(order)
+    db.flush()
+
+    qty = f"{req.quantity_kg:g}"
+    notes = [
+        Notification(
+            user_id=reserved.farmer_id,
+            order_id=order.id,
+            message=f"Consumer {req.consumer_name} purchased {qty} kg of {product_name}",
+            created_at=now,
+        ),
+        Notification(
+            user_id=req.consumer_id,
+            order_id=order.id,
+            message=f"Order placed: {qty} kg of {product_name}",
+            created_at=now,
+        ),
+    ]
+    db.add_all(notes)
+    record_sale(
+        db,
+        farmer_id=reserved.farmer_id,
+        quantity_kg=req.quantity_kg,
+        amount=total,
+        sold_at=now,
+        listing_id=req.listing_id,
+        order_id=order.id,
+        crop=reserved.crop,
+    )
+    record_price(
+        db,
+        kind="sale",
+        crop=reserved.crop,
+        district=reserved.district,
+        state=reserved.state,
+        price_per_kg=order.price_per_kg,
+        quantity_kg=req.quantity_kg,
+        at=now,
+    )
+    return order, notes
+
+
+def place_order_batch(db: Session, requests: List[OrderRequest]) -> List[object]:
+    # Each order gets a SAVEPOINT so one rejection doesn't undo the others; the whole batch
+    # commits once. Returns (order dict, replayed, [(user_id, notification dict)]) or the
+    # Exception per request; dicts are built before commit so nothing is reloaded afterwards.
+    placed: List[object] = []
+    for req in requests:
+        try:
+            with db.begin_nested():
+                order, notes = place_order(db, req)
+            placed.append((order_to_dict(order), False, [(n.user_id, notification_to_dict(n)) for n in notes]))
+        except IntegrityError:
+            # Same Idempotency-Key already committed, or placed earlier in this batch.
+            existing = find_order_by_key(db, req.consumer_id, req.idempotency_key) if req.idempotency_key else None
+            if existing is None:
+                placed.append(HTTPException(status_code=409, detail="Order conflicted, please retry"))
+                continue
+            try:
+                placed.append((order_to_dict(check_replay(existing, req)), True, []))
+            except HTTPException as e:
+                placed.append(e)
+        except HTTPException as e:
+            placed.append(e)
+    db.commit()
+    return placed
+
+
+def list_orders_page(db: Session, consumer_id: int, after_id: Optional[int], limit: int) -> Tuple[List[dict], bool]:
+    q = db.query(Order).filter(Order.consumer_id == consumer_id)
+    if after_id is not None:
+        q = q.filter(Order.id < after_id)
+    rows = q.order_by(Order.id.desc()).limit(limit + 1).all()
+    return [order_to_dict(o) for o in rows[:limit]], len(rows) > limit
+
+
+def list_notifications_page(db: Session, user_id: int, unread: bool, after_id: Optional[int], limit: int) -> Tuple[List[dict], bool]:
+    q = db.query(Notification).filter(Notification.user_id == user_id)
+    if unread:
+        q = q.filter(Notification.read.is_(False))
+    if after_id is not None:
+        q = q.filter(Notification.id < after_id)
+    rows = q.order_by(Notification.id.desc()).limit(limit + 1).all()
+    return [notification_to_dict(n) for n in rows[:limit]], len(rows) > limit
+
+
+def mark_notification_read(db: Session, notification_id: int, user_id: int) -> bool:
+    note = db.query(Notification).filter(Notification.id == notification_id, Notification.user_id == user_id).first()
+    if note is None:
+        return False
+    if not note.read:
+        note.read = True
+        note.read_at = datetime.utcnow()
+        db.commit()
+    return True
@@ -0,0 +1,368 @@
+import math
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, literal, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from earnings import ALL_TIME, local_day
+from models import MarketItem, PriceRollup, PriceSketchBucket, Sale, User
+
+# Relative error of the quantile sketch: a reported median is within 1% of a real event price.
+PRICE_SKETCH_ACCURACY = float(os.getenv("PRICE_SKETCH_ACCURACY", "0.01"))
+# Fewer recent sales than this and a suggestion falls back to asking prices, then to the state.
+PRICE_SUGGEST_MIN_EVENTS = int(os.getenv("PRICE_SUGGEST_MIN_EVENTS", "5"))
+
+# "sale": prices paid in orders, an event log. "ask": prices of live listings, each counted once on
+# the day it was last priced and taken back out when it is re-priced or deleted. "reported": sales
+# farmers record themselves; unverified, so shown but never used for suggestions.
+KINDS = ("sale", "ask", "reported")
+SUGGEST_KINDS = ("sale", "ask")
+# Days of daily rows a summary reads: the 30-day window and the 30 days before it (for the trend).
+_HISTORY_DAYS = 60
+
+_GAMMA = (1 + PRICE_SKETCH_ACCURACY) / (1 - PRICE_SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def _norm(value: Optional[str]) -> str:
+    return " ".join((value or "").strip().casefold().split())
+
+
+def price_keys(district: Optional[str], state: Optional[str]) -> List[Tuple[str, str]]:
+    # (scope, region) pairs an event for this place counts towards.
+    state, district = _norm(state), _norm(district)
+    keys = []
+    if state and district:
+        keys.append(("district", f"{state}/{district}"))
+    if state:
+        keys.append(("state", state))
+    return keys
+
+
+def price_bucket(price: float) -> int:
+    return math.ceil(math.log(price) / _LOG_GAMMA)
+
+
+def bucket_price(bucket: int) -> float:
+    # Midpoint of (gamma^(i-1), gamma^i] in relative terms, so any price in it is within the accuracy.
+    return 2 * _GAMMA ** bucket / (_GAMMA + 1)
+
+
+class QuantileSketch:
+    # DDSketch-style: counts per log-spaced bucket. Adding and merging are exact; quantiles are
+    # within PRICE_SKETCH_ACCURACY relative error, and size grows with the price range, not the events.
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+
+    def add_bucket(self, bucket: int, n: int):
+        self.counts[bucket] = self.counts.get(bucket, 0) + n
+        self.total += n
+
+    def add(self, price: float, n: int = 1):
+        self.add_bucket(price_bucket(price), n)
+
+    def merge(self, other: "QuantileSketch"):
+        for bucket, n in other.counts.items():
+            self.add_bucket(bucket, n)
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Buckets emptied by retracted asks hold 0 and are skipped.
+        occupied = sorted(b for b, n in self.counts.items() if n > 0)
+        if not occupied or self.total <= 0:
+            return None
+        rank = q * (self.total - 1)
+        seen = 0
+        for bucket in occupied:
+            seen += self.counts[bucket]
+            if seen > rank:
+                return bucket_price(bucket)
+        return bucket_price(occupied[-1])
+
+
+def record_price(
+    db: Session,
+    *,
+    kind: str,
+    crop: Optional[str],
+    district: Optional[str],
+    state: Optional[str],
+    price_per_kg: float,
+    quantity_kg: float = 0,
+    at: Optional[datetime] = None,
+    retract: bool = False,
+) -> bool:
+    # One price event into the day and all-time rollups of every matching region, as two
+    # multi-row upserts; the caller owns the transaction. False when there is nothing to file it under.
+    # retract=True takes back an ask recorded earlier with the same crop, place, price and `at`.
+    crop = _norm(crop)
+    keys = price_keys(district, state)
+    if not crop or not keys or not price_per_kg or price_per_kg <= 0:
+        return False
+    day = local_day(at or datetime.utcnow())
+    bucket = price_bucket(price_per_kg)
+    sign = -1 if retract else 1
+    # Asks carry no volume (stock is not a traded quantity) and no exact min/max, which cannot be
+    # taken back; their range comes from the sketch instead.
+    live = kind == "ask"
+    volume = 0.0 if live else max(0.0, float(quantity_kg or 0))
+    extreme = None if live else price_per_kg
+
+    # Sorted so concurrent writers lock rows in the same order.
+    slots = sorted((scope, region, d) for scope, region in keys for d in (day, ALL_TIME))
+    rollups = [
+        {
+            "scope": scope, "region": region, "crop": crop, "kind": kind, "day": d,
+            "events": sign, "volume_kg": sign * volume, "price_sum": sign * price_per_kg,
+            "min_price": extreme, "max_price": extreme,
+        }
+        for scope, region, d in slots
+    ]
+    buckets = [
+        {"scope": scope, "region": region, "crop": crop, "kind": kind, "day": d, "bucket": bucket, "events": sign}
+        for scope, region, d in slots
+    ]
+    _bump_price_rows(db, rollups, buckets)
+    return True
+
+
+def _lower(column, value):
+    # Portable LEAST()/GREATEST() that also treats a NULL column as "no value yet".
+    return case((column.is_(None), value), (value < column, value), else_=column)
+
+
+def _higher(column, value):
+    return case((column.is_(None), value), (value > column, value), else_=column)
+
+
+def _bump_price_rows(db: Session, rollups: List[dict], buckets: List[dict]):
+    dialect = db.get_bind().dialect.name
+    if dialect in {"postgresql", "sqlite"}:
+        insert_ = pg_insert if dialect == "postgresql" else sqlite_insert
+        stmt = insert_(PriceRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PriceRollup.scope, PriceRollup.region, PriceRollup.crop, PriceRollup.kind, PriceRollup.day],
+            set_={
+                "events": PriceRollup.events + stmt.excluded.events,
+                "volume_kg": PriceRollup.volume_kg + stmt.excluded.volume_kg,
+                "price_sum": PriceRollup.price_sum + stmt.excluded.price_sum,
+                "min_price": _lower(PriceRollup.min_price, stmt.excluded.min_price),
+                "max_price": _higher(PriceRollup.max_price, stmt.excluded.max_price),
+            },
+        )
+        db.execute(stmt, rollups)
+        stmt = insert_(PriceSketchBucket)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                PriceSketchBucket.scope, PriceSketchBucket.region, PriceSketchBucket.crop,
+                PriceSketchBucket.kind, PriceSketchBucket.day, PriceSketchBucket.bucket,
+            ],
+            set_={"events": PriceSketchBucket.events + stmt.excluded.events},
+        )
+        db.execute(stmt, buckets)
+        return
+
+    for row in rollups:
+        values = {
+            "events": PriceRollup.events + row["events"],
+            "volume_kg": PriceRollup.volume_kg + row["volume_kg"],
+            "price_sum": PriceRollup.price_sum + row["price_sum"],
+        }
+        if row["min_price"] is not None:
+            values["min_price"] = _lower(PriceRollup.min_price, literal(row["min_price"]))
+            values["max_price"] = _higher(PriceRollup.max_price, literal(row["max_price"]))
+        result = db.execute(
+            update(PriceRollup)
+            .where(*[getattr(PriceRollup, k) == row[k] for k in ("scope", "region", "crop", "kind", "day")])
+            .values(**values)
+        )
+        if not result.rowcount:
+            db.execute(insert(PriceRollup), [row])
+    for row in buckets:
+        result = db.execute(
+            update(PriceSketchBucket)
+            .where(*[getattr(PriceSketchBucket, k) == row[k] for k in ("scope", "region", "crop", "kind", "day", "bucket")])
+            .values(events=PriceSketchBucket.events + row["events"])
+        )
+        if not result.rowcount:
+            db.execute(insert(PriceSketchBucket), [row])
+
+
+class _Window:
+    __slots__ = ("events", "volume_kg", "price_sum", "min_price", "max_price", "sketch")
+
+    def __init__(self):
+        self.events = 0
+        self.volume_kg = 0.0
+        self.price_sum = 0.0
+        self.min_price: Optional[float] = None
+        self.max_price: Optional[float] = None
+        self.sketch = QuantileSketch()
+
+    def add_rollup(self, row):
+        self.events += row.events
+        self.volume_kg += row.volume_kg
+        self.price_sum += row.price_sum
+        if row.min_price is not None:
+            self.min_price = row.min_price if self.min_price is None else min(self.min_price, row.min_price)
+        if row.max_price is not None:
+            self.max_price = row.max_price if self.max_price is None else max(self.max_price, row.max_price)
+
+    def median(self) -> Optional[float]:
+        return self.sketch.quantile(0.5)
+
+    def to_dict(self, with_volume: bool) -> dict:
+        median = self.median()
+        out = {
+            "events": self.events,
+            "medianPricePerKg": round(median, 2) if median is not None else None,
+            "p25PricePerKg": _round(self.sketch.quantile(0.25)),
+            "p75PricePerKg": _round(self.sketch.quantile(0.75)),
+            "meanPricePerKg": round(self.price_sum / self.events, 2) if self.events > 0 else None,
+            # Asks keep no exact extremes; the outermost sketch buckets are within the sketch accuracy.
+            "minPricePerKg": _round(self.min_price if self.min_price is not None else self.sketch.quantile(0)),
+            "maxPricePerKg": _round(self.max_price if self.max_price is not None else self.sketch.quantile(1)),
+        }
+        if with_volume:
+            out["volumeKg"] = round(self.volume_kg, 2)
+        return out
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+def _trend_percent(current: _Window, previous: _Window) -> Optional[float]:
+    now, before = current.median(), previous.median()
+    if now is None or not before:
+        return None
+    return round((now - before) / before * 100, 1)
+
+
+def price_summary(db: Session, scope: str, region: str, crop: str, now: Optional[datetime] = None) -> dict:
+    # Reads at most 61 rollup rows (and their buckets) per kind, however many events there were.
+    today = local_day(now or datetime.utcnow())
+    since = today - timedelta(days=_HISTORY_DAYS - 1)
+    key = (PriceRollup.scope == scope, PriceRollup.region == region, PriceRollup.crop == crop)
+    in_range = or_(PriceRollup.day == ALL_TIME, PriceRollup.day >= since)
+    rollups = db.query(PriceRollup).filter(*key, in_range).all()
+    buckets = (
+        db.query(PriceSketchBucket.kind, PriceSketchBucket.day, PriceSketchBucket.bucket, PriceSketchBucket.events)
+        .filter(
+            PriceSketchBucket.scope == scope,
+            PriceSketchBucket.region == region,
+            PriceSketchBucket.crop == crop,
+            or_(PriceSketchBucket.day == ALL_TIME, PriceSketchBucket.day >= since),
+        )
+        .all()
+    )
+
+    # Window name -> day predicate; every daily row lands in each window it falls into.
+    def windows_for(day: date) -> List[str]:
+        if day == ALL_TIME:
+            return ["all"]
+        age = (today - day).days
+        out = []
+        if age < 7:
+            out.append("7d")
+        elif age < 14:
+            out.append("prev7d")
+        if age < 30:
+            out.append("30d")
+        elif age < 60:
+            out.append("prev30d")
+        return out
+
+    stats: Dict[str, Dict[str, _Window]] = {kind: {} for kind in KINDS}
+    for row in rollups:
+        for name in windows_for(row.day):
+            stats.setdefault(row.kind, {}).setdefault(name, _Window()).add_rollup(row)
+    for kind, day, bucket, events in buckets:
+        for name in windows_for(day):
+            stats.setdefault(kind, {}).setdefault(name, _Window()).sketch.add_bucket(bucket, events)
+
+    out = {}
+    for kind in KINDS:
+        w = stats.get(kind, {})
+        empty = _Window()
+        with_volume = kind != "ask"
+        out[kind] = {
+            "last7Days": w.get("7d", empty).to_dict(with_volume),
+            "last30Days": w.get("30d", empty).to_dict(with_volume),
+            "allTime": w.get("all", empty).to_dict(with_volume),
+            "trend7DaysPercent": _trend_percent(w.get("7d", empty), w.get("prev7d", empty)),
+            "trend30DaysPercent": _trend_percent(w.get("30d", empty), w.get("prev30d", empty)),
+        }
+    return out
+
+
+def suggest_price(summaries: Iterable[dict]) -> Optional[dict]:
+    # First region (most local first) with enough recent events: sales over asks, 30 days over all time.
+    summaries = list(summaries)
+    for window in ("last30Days", "allTime"):
+        for summary in summaries:
+            for kind in SUGGEST_KINDS:
+                stats = summary[kind][window]
+                if stats["events"] >= PRICE_SUGGEST_MIN_EVENTS and stats["medianPricePerKg"] is not None:
+                    return {
+                        "pricePerKg": stats["medianPricePerKg"],
+                        "rangePerKg": [stats["p25PricePerKg"], stats["p75PricePerKg"]],
+                        "basis": {"scope": summary["scope"], "kind": kind, "window": window, "events": stats["events"]},
+                    }
+    return None
+
+
+def rebuild_price_index(db: Session, batch_size: int = 5000) -> dict:
+    # One-off backfill: current listings as asks (on the day they were last priced), order sales as
+    # sales and the rest as reported, placed where the listing is or, without one, where the farmer is.
+    if db.get_bind().dialect.name == "postgresql":
+        # Hold off concurrent listing/sale writes so no event lands between the delete and the replay.
+        db.execute(text("LOCK TABLE market_items, sales IN SHARE MODE"))
+    db.execute(delete(PriceSketchBucket))
+    db.execute(delete(PriceRollup))
+    # Listings from before the index have no priced_at; from now on they are in it as of their creation.
+    db.execute(
+        update(MarketItem)
+        .where(MarketItem.priced_at.is_(None))
+        .values(priced_at=MarketItem.created_at, updated_at=MarketItem.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+
+    asks = sales = reported = 0
+    listings = db.execute(
+        select(
+            MarketItem.crop, MarketItem.district, MarketItem.state, MarketItem.price_per_kg,
+            MarketItem.priced_at,
+        ).execution_options(yield_per=batch_size)
+    )
+    for row in listings:
+        if record_price(db, kind="ask", crop=row.crop, district=row.district, state=row.state,
+                        price_per_kg=row.price_per_kg, at=row.priced_at):
+            asks += 1
+    recorded = db.execute(
+        select(
+            Sale.crop, Sale.quantity_kg, Sale.amount, Sale.sold_at, Sale.order_id,
+            func.coalesce(MarketItem.district, User.district).label("district"),
+            func.coalesce(MarketItem.state, User.state).label("state"),
+        )
+        .outerjoin(MarketItem, MarketItem.id == Sale.listing_id)
+        .outerjoin(User, User.id == Sale.farmer_id)
+        .where(Sale.quantity_kg > 0)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in recorded:
+        kind = "sale" if row.order_id is not None else "reported"
+        if record_price(db, kind=kind, crop=row.crop, district=row.district, state=row.state,
+                        price_per_kg=row.amount / row.quantity_kg, quantity_kg=row.quantity_kg, at=row.sold_at):
+            if kind == "sale":
+                sales += 1
+            else:
+                reported += 1
+    db.commit()
+    return {"asks": asks, "sales": sales, "reported": reported}
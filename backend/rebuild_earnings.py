@@ -0,0 +1,23 @@
+import argparse
+
+from database import SessionLocal, engine
+from earnings import rebuild_rollups
+from models import EarningsRollup, Sale
+
+
+def rebuild_earnings(farmer_id=None) -> dict:
+    Sale.__table__.create(bind=engine, checkfirst=True)
+    EarningsRollup.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        return rebuild_rollups(db, farmer_id=farmer_id)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute earnings rollups from the raw sales records.")
+    parser.add_argument("--farmer-id", type=int, default=None, help="Only rebuild this farmer's rollups.")
+    args = parser.parse_args()
+
+    print(rebuild_earnings(farmer_id=args.farmer_id))
@@ -0,0 +1,20 @@
+import argparse
+
+from database import SessionLocal, engine
+from models import PriceRollup, PriceSketchBucket
+from price_index import rebuild_price_index
+
+
+def rebuild_prices() -> dict:
+    PriceRollup.__table__.create(bind=engine, checkfirst=True)
+    PriceSketchBucket.__table__.create(bind=engine, checkfirst=True)
+    db = SessionLocal()
+    try:
+        return rebuild_price_index(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Rebuild the crop price index from current listings and recorded sales.").parse_args()
+    print(rebuild_prices())
@@ -1,5 +1,13 @@
-from pydantic import BaseModel
-from typing import Optional
+import os
+
+from pydantic import BaseModel, Field, field_validator
+from datetime import datetime
+from typing import Annotated, List, Optional
+
+WEATHER_BATCH_MAX_LOCATIONS = int(os.getenv("WEATHER_BATCH_MAX_LOCATIONS", "100"))
+# Entries accepted before de-duplication, leaving room for one place spelled a few ways.
+WEATHER_BATCH_MAX_RAW_LOCATIONS = 2 * WEATHER_BATCH_MAX_LOCATIONS
+LOCATION_MAX_LENGTH = 200
 
 class RegisterUser(BaseModel):
     name: str
@@ -21,3 +29,62 @@ class RegisterUser(BaseModel):
 class LoginUser(BaseModel):
     mobile: str
     password: str
+
+class WeatherBatchRequest(BaseModel):
+    locations: List[Annotated[str, Field(max_length=LOCATION_MAX_LENGTH)]] = Field(
+        max_length=WEATHER_BATCH_MAX_RAW_LOCATIONS
+    )
+
+class MarketItemCreate(BaseModel):
+    productName: str = Field(min_length=1)
+    crop: Optional[str] = None
+    category: Optional[str] = None
+    pricePerKg: float = Field(gt=0)
+    quantityKg: float = Field(gt=0)
+    unit: Optional[str] = "kg"
+    location: Optional[str] = None
+    district: Optional[str] = None
+    state: Optional[str] = None
+    isUrgentDeal: bool = False
+    discountPercent: Optional[float] = Field(default=None, ge=0, le=100)
+    dealExpiryTime: Optional[datetime] = None
+
+class MarketItemUpdate(BaseModel):
+    productName: Optional[str] = Field(default=None, min_length=1)
+    crop: Optional[str] = None
+    category: Optional[str] = None
+    pricePerKg: Optional[float] = Field(default=None, gt=0)
+    # 0 marks a listing sold out.
+    quantityKg: Optional[float] = Field(default=None, ge=0)
+    unit: Optional[str] = None
+    location: Optional[str] = None
+    district: Optional[str] = None
+    state: Optional[str] = None
+    isUrgentDeal: Optional[bool] = None
+    discountPercent: Optional[float] = Field(default=None, ge=0, le=100)
+    dealExpiryTime: Optional[datetime] = None
+
+    # Omitted means "unchanged"; an explicit null would hit a NOT NULL column.
+    @field_validator("productName", "pricePerKg", "quantityKg", "isUrgentDeal")
+    @classmethod
+    def _not_null(cls, value):
+        if value is None:
+            raise ValueError("may not be null")
+        return value
+
+class FarmerCropUpdate(BaseModel):
+    sowingDate: Optional[datetime] = None
+    expectedHarvestDays: Optional[int] = Field(default=None, ge=0)
+    soilMoisturePercent: Optional[float] = Field(default=None, ge=0, le=100, allow_inf_nan=False)
+
+class SaleCreate(BaseModel):
+    listingId: Optional[int] = None
+    crop: Optional[str] = None
+    # NaN or infinity would stick in the earnings rollup sums for good.
+    quantityKg: float = Field(gt=0, allow_inf_nan=False)
+    pricePerKg: Optional[float] = Field(default=None, gt=0, allow_inf_nan=False)
+    soldAt: Optional[datetime] = None
+
+class OrderCreate(BaseModel):
+    listingId: int
+    quantityKg: float
@@ -0,0 +1,363 @@
+import heapq
+import os
+import re
+from bisect import bisect_left, insort
+from itertools import product
+from math import prod
+from threading import RLock
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+SEARCH_PREFIX_MAX_TERMS = int(os.getenv("SEARCH_PREFIX_MAX_TERMS", "50"))
+SEARCH_FUZZY_MAX_TERMS = int(os.getenv("SEARCH_FUZZY_MAX_TERMS", "5"))
+SEARCH_FUZZY_MIN_SIMILARITY = float(os.getenv("SEARCH_FUZZY_MIN_SIMILARITY", "0.4"))
+SEARCH_MAX_COMBINATIONS = int(os.getenv("SEARCH_MAX_COMBINATIONS", "4096"))
+
+# A hit in the title or crop outranks one in the district, which outranks the category.
+FIELD_WEIGHTS = {"title": 3, "crop": 3, "district": 2, "category": 1}
+
+_EXACT = 1.0
+_PREFIX = 0.75
+_FUZZY = 0.5
+
+# Local / regional names -> the term listings are indexed under.
+SYNONYMS: Dict[str, str] = {
+    "tamatar": "tomato",
+    "tamater": "tomato",
+    "thakkali": "tomato",
+    "tomatoes": "tomato",
+    "baingan": "brinjal",
+    "baigan": "brinjal",
+    "vankaya": "brinjal",
+    "kathirikai": "brinjal",
+    "eggplant": "brinjal",
+    "aubergine": "brinjal",
+    "aloo": "potato",
+    "alu": "potato",
+    "batata": "potato",
+    "potatoes": "potato",
+    "pyaz": "onion",
+    "pyaaz": "onion",
+    "kanda": "onion",
+    "vengayam": "onion",
+    "onions": "onion",
+    "bhindi": "okra",
+    "bhendi": "okra",
+    "vendakkai": "okra",
+    "ladyfinger": "okra",
+    "gobi": "cauliflower",
+    "phoolgobi": "cauliflower",
+    "bandgobi": "cabbage",
+    "mirchi": "chilli",
+    "mirch": "chilli",
+    "chili": "chilli",
+    "chilies": "chilli",
+    "chillies": "chilli",
+    "milagai": "chilli",
+    "dhaniya": "coriander",
+    "kothamalli": "coriander",
+    "palak": "spinach",
+    "adrak": "ginger",
+    "inji": "ginger",
+    "lehsun": "garlic",
+    "lahsun": "garlic",
+    "poondu": "garlic",
+    "matar": "peas",
+    "mattar": "peas",
+    "gajar": "carrot",
+    "carrots": "carrot",
+    "kheera": "cucumber",
+    "kakdi": "cucumber",
+    "lauki": "gourd",
+    "karela": "gourd",
+    "mooli": "radish",
+    "shakarkand": "sweetpotato",
+    "gehun": "wheat",
+    "gehu": "wheat",
+    "chawal": "rice",
+    "dhan": "paddy",
+    "nellu": "paddy",
+    "makka": "maize",
+    "makai": "maize",
+    "corn": "maize",
+    "bajra": "millet",
+    "jowar": "sorghum",
+    "ragi": "millet",
+    "kela": "banana",
+    "vazhai": "banana",
+    "bananas": "banana",
+    "aam": "mango",
+    "mangoes": "mango",
+    "seb": "apple",
+    "apples": "apple",
+    "santra": "orange",
+    "narangi": "orange",
+    "angoor": "grapes",
+    "grape": "grapes",
+    "anar": "pomegranate",
+    "papita": "papaya",
+    "nariyal": "coconut",
+    "thengai": "coconut",
+    "ganna": "sugarcane",
+    "kapas": "cotton",
+    "moongphali": "groundnut",
+    "mungfali": "groundnut",
+    "peanut": "groundnut",
+    "peanuts": "groundnut",
+    "sarson": "mustard",
+    "rai": "mustard",
+    "haldi": "turmeric",
+    "manjal": "turmeric",
+    "soyabean": "soybean",
+    "soya": "soybean",
+    "chana": "chickpea",
+    "dal": "pulses",
+    "daal": "pulses",
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _newest_in_all(lists: Tuple[Dict[int, None], ...]) -> Iterator[int]:
+    # Posting dicts are in indexing order, so walking the shortest backwards yields newest first.
+    shortest, *others = sorted(lists, key=len)
+    for doc_id in reversed(shortest):
+        for ids in others:
+            if doc_id not in ids:
+                break
+        else:
+            yield doc_id
+
+
+class ListingSearchIndex:
+    def __init__(self, normalize: Callable[[str], str], synonyms: Optional[Dict[str, str]] = None):
+        self._normalize = normalize
+        self._synonyms = dict(SYNONYMS if synonyms is None else synonyms)
+        self._synonym_keys = sorted(self._synonyms)
+        self._lock = RLock()
+
+        # doc id -> (index sequence, ((term, weight), ...)); the sequence orders ties newest first.
+        self._docs: Dict[int, Tuple[int, Tuple[Tuple[str, int], ...]]] = {}
+        # term -> weight -> doc ids in indexing order (a dict used as an ordered set).
+        self._postings: Dict[str, Dict[int, Dict[int, None]]] = {}
+        self._df: Dict[str, int] = {}
+        # Sorted vocabulary for prefix lookups and a trigram index over it for typo tolerance.
+        self._terms: List[str] = []
+        self._term_grams: Dict[str, Set[str]] = {}
+        self._seq = 0
+
+        self.ready = False
+        self._loading = False
+        self._removed_while_loading: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def tokens(self, text: str) -> List[str]:
+        return [self._synonyms.get(t, t) for t in _TOKEN_RE.findall(self._normalize(text or ""))]
+
+    def _doc_terms(self, fields: Dict[str, Optional[str]]) -> Dict[str, int]:
+        terms: Dict[str, int] = {}
+        for field, value in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term in self.tokens(value or ""):
+                if terms.get(term, 0) < weight:
+                    terms[term] = weight
+        return terms
+
+    def _add_term(self, term: str):
+        insort(self._terms, term)
+        for gram in _trigrams(term):
+            self._term_grams.setdefault(gram, set()).add(term)
+
+    def _drop_term(self, term: str):
+        i = bisect_left(self._terms, term)
+        if i < len(self._terms) and self._terms[i] == term:
+            del self._terms[i]
+        for gram in _trigrams(term):
+            bucket = self._term_grams.get(gram)
+            if bucket is not None:
+                bucket.discard(term)
+                if not bucket:
+                    del self._term_grams[gram]
+
+    def _remove_locked(self, doc_id: int):
+        entry = self._docs.pop(doc_id, None)
+        if entry is None:
+            return
+        for term, weight in entry[1]:
+            tiers = self._postings[term]
+            ids = tiers[weight]
+            ids.pop(doc_id, None)
+            if not ids:
+                del tiers[weight]
+            self._df[term] -= 1
+            if not self._df[term]:
+                del self._postings[term]
+                del self._df[term]
+                self._drop_term(term)
+
+    def _add_locked(self, doc_id: int, terms: Dict[str, int]):
+        self._remove_locked(doc_id)
+        self._seq += 1
+        self._docs[doc_id] = (self._seq, tuple(terms.items()))
+        for term, weight in terms.items():
+            tiers = self._postings.get(term)
+            if tiers is None:
+                tiers = self._postings[term] = {}
+                self._df[term] = 0
+                self._add_term(term)
+            tiers.setdefault(weight, {})[doc_id] = None
+            self._df[term] += 1
+
+    def add(
+        self,
+        doc_id: int,
+        title: Optional[str],
+        crop: Optional[str],
+        category: Optional[str],
+        district: Optional[str],
+    ):
+        terms = self._doc_terms({"title": title, "crop": crop, "category": category, "district": district})
+        with self._lock:
+            self._add_locked(doc_id, terms)
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            self._remove_locked(doc_id)
+            if self._loading:
+                self._removed_while_loading.add(doc_id)
+
+    def load(self, rows: Iterable[Tuple[int, str, str, str, str]]) -> int:
+        # Initial build; listings added/updated/removed meanwhile win over the loaded rows.
+        with self._lock:
+            self._loading = True
+        try:
+            for doc_id, title, crop, category, district in rows:
+                terms = self._doc_terms({"title": title, "crop": crop, "category": category, "district": district})
+                with self._lock:
+                    if doc_id not in self._docs and doc_id not in self._removed_while_loading:
+                        self._add_locked(doc_id, terms)
+        finally:
+            with self._lock:
+                self._loading = False
+                self._removed_while_loading.clear()
+        self.ready = True
+        return len(self)
+
+    def _prefix_terms(self, prefix: str, limit: int) -> List[str]:
+        out = []
+        i = bisect_left(self._terms, prefix)
+        while i < len(self._terms) and len(out) < limit and self._terms[i].startswith(prefix):
+            out.append(self._terms[i])
+            i += 1
+        return out
+
+    def _fuzzy_terms(self, token: str) -> List[Tuple[str, float]]:
+        grams = _trigrams(token)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for term in self._term_grams.get(gram, ()):
+                shared[term] = shared.get(term, 0) + 1
+        scored = []
+        for term, n in shared.items():
+            similarity = n / (len(grams) + len(_trigrams(term)) - n)
+            if similarity >= SEARCH_FUZZY_MIN_SIMILARITY:
+                scored.append((similarity, term))
+        return [(term, sim) for sim, term in heapq.nlargest(SEARCH_FUZZY_MAX_TERMS, scored)]
+
+    def _expand(self, token: str, prefix: bool) -> Dict[str, float]:
+        # Query token -> {indexed term: match quality}.
+        out: Dict[str, float] = {}
+        if token in self._postings:
+            out[token] = _EXACT
+        if prefix:
+            for term in self._prefix_terms(token, SEARCH_PREFIX_MAX_TERMS):
+                out.setdefault(term, _PREFIX)
+        if not out and len(token) >= 3:
+            for term, similarity in self._fuzzy_terms(token):
+                out[term] = _FUZZY * similarity
+        return out
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[List[int], bool]:
+        # Returns (doc ids best first, has_more). Every query token must match; the last may be a prefix.
+        tokens = list(dict.fromkeys(self.tokens(query)))
+        if not tokens:
+            return [], False
+        k = offset + limit
+        with self._lock:
+            expansions = [self._expand(t, prefix=i == len(tokens) - 1) for i, t in enumerate(tokens)]
+            if not all(expansions):
+                return [], False
+
+            # A document's score is the sum of its best posting per token. There are only a handful of
+            # (term, weight) posting combinations, so rank those and walk each combination newest
+            # first, stopping once the page is full instead of scoring every candidate.
+            postings = [
+                [
+                    (quality * weight, ids)
+                    for term, quality in expansion.items()
+                    for weight, ids in self._postings[term].items()
+                ]
+                for expansion in expansions
+            ]
+            # Long typo-heavy queries: keep the best postings of the widest tokens so the
+            # combination count stays bounded.
+            while prod(len(p) for p in postings) > SEARCH_MAX_COMBINATIONS:
+                widest = max(postings, key=len)
+                widest.sort(key=lambda entry: -entry[0])
+                widest.pop()
+            combos: Dict[float, List[Tuple[Dict[int, None], ...]]] = {}
+            for combo in product(*postings):
+                total = round(sum(score for score, _ in combo), 6)
+                combos.setdefault(total, []).append(tuple(ids for _, ids in combo))
+
+            docs = self._docs
+            seen: Set[int] = set()
+            out: List[int] = []
+            for total in sorted(combos, reverse=True):
+                walks = [_newest_in_all(lists) for lists in combos[total]]
+                if len(walks) > 1:
+                    candidates = heapq.merge(*walks, key=lambda d: -docs[d][0])
+                else:
+                    candidates = walks[0]
+                for doc_id in candidates:
+                    # A doc matching several expansions of one token shows up again at lower totals.
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    out.append(doc_id)
+                    if len(out) > k:
+                        return out[offset:k], True
+        return out[offset:k], False
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        raw = _TOKEN_RE.findall(self._normalize(prefix or ""))
+        if not raw:
+            return []
+        head = [self._synonyms.get(t, t) for t in raw[:-1]]
+        last = raw[-1]
+        with self._lock:
+            candidates = set(self._prefix_terms(self._synonyms.get(last, last), SEARCH_PREFIX_MAX_TERMS))
+            i = bisect_left(self._synonym_keys, last)
+            while i < len(self._synonym_keys) and self._synonym_keys[i].startswith(last):
+                canonical = self._synonyms[self._synonym_keys[i]]
+                if canonical in self._postings:
+                    candidates.add(canonical)
+                i += 1
+            ranked = sorted(candidates, key=lambda t: (-self._df[t], t))[:limit]
+        return [" ".join(head + [term]) for term in ranked]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "documents": len(self._docs),
+                "terms": len(self._terms),
+                "trigrams": len(self._term_grams),
+                "synonyms": len(self._synonyms),
+            }
@@ -0,0 +1,183 @@
+import math
+import os
+from threading import RLock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+SPATIAL_CELL_DEG = float(os.getenv("SPATIAL_CELL_DEG", "0.25"))
+SPATIAL_MAX_RADIUS_KM = float(os.getenv("SPATIAL_MAX_RADIUS_KM", "500"))
+
+EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEG_LAT = 111.32
+
+Cell = Tuple[int, int]
+
+
+def haversine_km(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    # lats/lngs in radians; returns great-circle distances in km.
+    lat0, lng0 = math.radians(lat), math.radians(lng)
+    a = np.sin((lats - lat0) / 2) ** 2 + math.cos(lat0) * np.cos(lats) * np.sin((lngs - lng0) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    # Grid buckets of points; each bucket lazily packs its points into NumPy arrays for refinement.
+    def __init__(self, cell_deg: float = SPATIAL_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._lock = RLock()
+        self._cells: Dict[Cell, Dict[int, Tuple[float, float]]] = {}
+        self._packed: Dict[Cell, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._where: Dict[int, Cell] = {}
+        self.ready = False
+        self._loading = False
+        self._removed_while_loading: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def _cell(self, lat: float, lng: float) -> Cell:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def upsert(self, point_id: int, lat: float, lng: float):
+        cell = self._cell(lat, lng)
+        with self._lock:
+            self._remove_locked(point_id)
+            self._cells.setdefault(cell, {})[point_id] = (lat, lng)
+            self._where[point_id] = cell
+            self._packed.pop(cell, None)
+
+    def remove(self, point_id: int):
+        with self._lock:
+            self._remove_locked(point_id)
+            if self._loading:
+                self._removed_while_loading.add(point_id)
+
+    def _remove_locked(self, point_id: int):
+        cell = self._where.pop(point_id, None)
+        if cell is None:
+            return
+        points = self._cells[cell]
+        del points[point_id]
+        if not points:
+            del self._cells[cell]
+        self._packed.pop(cell, None)
+
+    def load(self, rows: Iterable[Tuple[int, float, float]]) -> int:
+        # Initial build; points moved or removed meanwhile win over the loaded rows.
+        with self._lock:
+            self._loading = True
+        try:
+            for point_id, lat, lng in rows:
+                if lat is None or lng is None:
+                    continue
+                cell = self._cell(lat, lng)
+                with self._lock:
+                    if point_id not in self._where and point_id not in self._removed_while_loading:
+                        self._cells.setdefault(cell, {})[point_id] = (lat, lng)
+                        self._where[point_id] = cell
+                        self._packed.pop(cell, None)
+        finally:
+            with self._lock:
+                self._loading = False
+                self._removed_while_loading.clear()
+        self.ready = True
+        return len(self)
+
+    def in_box(self, lat_min: float, lat_max: float, lng_min: float, lng_max: float) -> List[Tuple[int, float, float]]:
+        # [(id, lat, lng)] in degrees for every point inside the box (edges included).
+        i0, j0 = self._cell(lat_min, lng_min)
+        i1, j1 = self._cell(lat_max, lng_max)
+        out = []
+        with self._lock:
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    for point_id, (lat, lng) in self._cells.get((i, j), {}).items():
+                        if lat_min <= lat <= lat_max and lng_min <= lng <= lng_max:
+                            out.append((point_id, lat, lng))
+        return out
+
+    def _pack(self, cell: Cell) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        packed = self._packed.get(cell)
+        if packed is None:
+            points = self._cells[cell]
+            ids = np.fromiter(points.keys(), dtype=np.int64, count=len(points))
+            coords = np.radians(np.array(list(points.values()), dtype=np.float64).reshape(-1, 2))
+            packed = self._packed[cell] = (ids, coords[:, 0], coords[:, 1])
+        return packed
+
+    def _cell_span(self, lat: float, radius_km: float) -> Tuple[int, int]:
+        # Cells to cover radius_km around lat, in each direction.
+        dlat = radius_km / _KM_PER_DEG_LAT
+        cos_lat = max(math.cos(math.radians(min(89.0, abs(lat) + dlat))), 0.01)
+        dlng = radius_km / (_KM_PER_DEG_LAT * cos_lat)
+        return math.ceil(dlat / self.cell_deg), math.ceil(dlng / self.cell_deg)
+
+    def _gather(self, lat: float, lng: float, span_lat: int, span_lng: int):
+        ci, cj = self._cell(lat, lng)
+        ids, lats, lngs = [], [], []
+        if (2 * span_lat + 1) * (2 * span_lng + 1) > len(self._cells):
+            # Wide query over a sparse grid: visit the occupied cells instead of the whole window.
+            cells = [c for c in self._cells if abs(c[0] - ci) <= span_lat and abs(c[1] - cj) <= span_lng]
+        else:
+            cells = [
+                (i, j)
+                for i in range(ci - span_lat, ci + span_lat + 1)
+                for j in range(cj - span_lng, cj + span_lng + 1)
+                if (i, j) in self._cells
+            ]
+        for cell in cells:
+            cell_ids, cell_lats, cell_lngs = self._pack(cell)
+            ids.append(cell_ids)
+            lats.append(cell_lats)
+            lngs.append(cell_lngs)
+        if not ids:
+            empty = np.empty(0)
+            return np.empty(0, dtype=np.int64), empty, empty
+        return np.concatenate(ids), np.concatenate(lats), np.concatenate(lngs)
+
+    def within(self, lat: float, lng: float, radius_km: float, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        # [(id, distance_km)] nearest first, every point within radius_km.
+        radius_km = min(radius_km, SPATIAL_MAX_RADIUS_KM)
+        with self._lock:
+            ids, lats, lngs = self._gather(lat, lng, *self._cell_span(lat, radius_km))
+        if not len(ids):
+            return []
+        dist = haversine_km(lat, lng, lats, lngs)
+        mask = dist <= radius_km
+        ids, dist = ids[mask], dist[mask]
+        if limit is not None and len(ids) > limit:
+            part = np.argpartition(dist, limit - 1)[:limit]
+            ids, dist = ids[part], dist[part]
+        order = np.lexsort((ids, dist))
+        return [(int(i), float(d)) for i, d in zip(ids[order], dist[order])]
+
+    def nearest(self, lat: float, lng: float, k: int, max_km: float = SPATIAL_MAX_RADIUS_KM) -> List[Tuple[int, float]]:
+        # Grow a ring of cells until it holds k points, then one exact radius query at the
+        # k-th distance (a point in a not-yet-visited cell can still be closer than that).
+        max_km = min(max_km, SPATIAL_MAX_RADIUS_KM)
+        ring_km = self.cell_deg * _KM_PER_DEG_LAT
+        with self._lock:
+            while True:
+                ids, lats, lngs = self._gather(lat, lng, *self._cell_span(lat, ring_km))
+                if len(ids) >= k or ring_km >= max_km:
+                    break
+                ring_km = min(ring_km * 2, max_km)
+        if not len(ids):
+            return []
+        dist = haversine_km(lat, lng, lats, lngs)
+        if len(ids) < k:
+            kth = max_km
+        else:
+            kth = min(float(np.partition(dist, k - 1)[k - 1]), max_km)
+        return self.within(lat, lng, kth, limit=k)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "points": len(self._where),
+                "cells": len(self._cells),
+                "packed_cells": len(self._packed),
+                "cell_deg": self.cell_deg,
+            }
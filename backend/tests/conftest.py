@@ -0,0 +1,117 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+# app.py reads these at import time: a throwaway database, no gazetteer (so geocoding goes upstream)
+# and no background prefetch.
+_WORKDIR = tempfile.mkdtemp(prefix="agri-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_WORKDIR, 'test.db')}")
+os.environ.setdefault("GAZETTEER_PATH", os.path.join(_WORKDIR, "no-gazetteer.tsv"))
+os.environ.setdefault("WEATHER_PREFETCH_ENABLED", "0")
+os.environ.setdefault("DB_FAILOVER_ENABLED", "0")
+# Cheap inline hashing keeps the API tests fast.
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from fake_open_meteo import start_fake_open_meteo  # noqa: E402
+
+
+def _reset(server):
+    server.state.update(mode="ok", requests=0, inflight=0, max_inflight=0)
+
+
+@pytest.fixture(scope="session")
+def _open_meteo_server():
+    server, base = start_fake_open_meteo()
+    yield server, base
+    server.shutdown()
+
+
+@pytest.fixture(scope="session")
+def _slow_open_meteo_server():
+    server, base = start_fake_open_meteo(latency_ms=100)
+    yield server, base
+    server.shutdown()
+
+
+@pytest.fixture
+def open_meteo(_open_meteo_server):
+    # (server, base URL) of a local stand-in Open-Meteo; server.state counts requests and sets the mode.
+    _reset(_open_meteo_server[0])
+    return _open_meteo_server
+
+
+@pytest.fixture
+def slow_open_meteo(_slow_open_meteo_server):
+    # Same, answering every call after 100 ms.
+    _reset(_slow_open_meteo_server[0])
+    return _slow_open_meteo_server
+
+
+@pytest.fixture
+def app_upstream(open_meteo, monkeypatch):
+    # Points app.py's Open-Meteo calls at the stand-in, through a fresh client per test.
+    import app as backend
+    from upstream import UpstreamClient
+
+    server, base = open_meteo
+    monkeypatch.setattr(backend, "_OPEN_METEO_GEOCODE_URL", f"{base}/v1/search")
+    monkeypatch.setattr(backend, "_OPEN_METEO_FORECAST_URL", f"{base}/v1/forecast")
+    monkeypatch.setattr(backend, "_UPSTREAM", UpstreamClient(retries=0, timeout_s=5, connect_timeout_s=5))
+    return server
+
+
+@pytest.fixture
+def api(app_upstream):
+    # The app behind a TestClient, with its startup and shutdown hooks run around the test.
+    from fastapi.testclient import TestClient
+
+    import app as backend
+
+    with TestClient(backend.app) as client:
+        yield client
+
+
+_mobiles = iter(range(9000000000, 9100000000))
+
+
+def new_mobile() -> str:
+    # Each test gets its own users in the shared test database.
+    return str(next(_mobiles))
+
+
+def login(client, mobile: str, password: str) -> dict:
+    res = client.post("/login", json={"mobile": mobile, "password": password})
+    assert res.status_code == 200, res.text
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+def register_farmer(client, password: str = "secret-pass", **fields) -> dict:
+    # Registers a farmer in Erode and returns auth headers for it.
+    mobile = fields.pop("mobile", None) or new_mobile()
+    body = {
+        "name": "Test Farmer",
+        "age": 40,
+        "mobile": mobile,
+        "alternate_phone": "9999999999",
+        "aadhar_number": "123412341234",
+        "password": password,
+        "state": "Tamil Nadu",
+        "district": "Erode",
+        "village": "Perundurai",
+        "pincode": "638052",
+        "soil_type": "Red",
+        "land_area": "2",
+        "primary_crops": "Turmeric",
+        "role": "farmer",
+    }
+    body.update(fields)
+    res = client.post("/register", json=body)
+    assert res.status_code == 200, res.text
+    return login(client, mobile, password)
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from conftest import login, new_mobile, register_farmer
+from create_employee import create_employee
+
+PASSWORD = "staff-pass"
+
+
+@pytest.fixture
+def employee(api):
+    mobile = new_mobile()
+    create_employee(mobile, name="Office Staff", password=PASSWORD)
+    return login(api, mobile, PASSWORD)
+
+
+def _farmer_row(mobile: str, district: str = "Erode") -> dict:
+    return {
+        "name": "Imported Farmer",
+        "age": 35,
+        "mobile": mobile,
+        "alternate_phone": "9999999999",
+        "aadhar_number": "123412341234",
+        "password": "imported-pass",
+        "state": "Tamil Nadu",
+        "district": district,
+        "village": "Perundurai",
+        "pincode": "638052",
+        "soil_type": "Red",
+        "land_area": "2",
+        "primary_crops": "Turmeric",
+    }
+
+
+def test_employee_reaches_the_user_directory(api, employee):
+    res = api.get("/admin/users", params={"role": "employee"}, headers=employee)
+
+    assert res.status_code == 200
+    assert any(u["name"] == "Office Staff" for u in res.json()["items"])
+
+    export = api.get("/admin/users/export", params={"format": "ndjson", "role": "employee"}, headers=employee)
+    assert export.status_code == 200
+    assert any(json.loads(line)["name"] == "Office Staff" for line in export.text.splitlines() if line)
+
+
+def test_other_roles_are_refused(api):
+    farmer = register_farmer(api)
+
+    assert api.get("/admin/users", headers=farmer).status_code == 403
+    assert api.post("/admin/users/import", content=b"", headers=farmer).status_code == 403
+
+
+def test_employee_imports_farmers(api, employee):
+    mobiles = [new_mobile(), new_mobile()]
+    body = "\n".join(json.dumps(_farmer_row(m)) for m in mobiles)
+
+    res = api.post(
+        "/admin/users/import",
+        content=body.encode(),
+        headers={**employee, "Content-Type": "application/x-ndjson"},
+    )
+
+    assert res.status_code == 200
+    assert res.json()["inserted"] == 2 and res.json()["failed"] == 0
+    # Imported farmers can sign in with the password from the upload.
+    assert login(api, mobiles[0], "imported-pass")
+
+
+def test_promote_existing_user(api):
+    mobile = new_mobile()
+    register_farmer(api, mobile=mobile, password="farmer-pass")
+
+    with pytest.raises(ValueError):
+        create_employee(mobile, name="Someone", password="x")
+    create_employee(mobile, promote=True)
+
+    # The role is read at login, so the promotion applies to the next session.
+    headers = login(api, mobile, "farmer-pass")
+    assert api.get("/admin/users", headers=headers).status_code == 200
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+import auth
+from auth import PasswordHasherBusy, hash_password_async, hash_passwords_async, verify_password
+
+
+@pytest.fixture
+def pool():
+    # Two worker processes and four queue slots, so an import gets two of them.
+    auth.configure_password_pool(workers=2, max_queue=4)
+    yield
+    auth.configure_password_pool(workers=auth.PASSWORD_HASH_WORKERS, max_queue=auth.PASSWORD_HASH_MAX_QUEUE)
+
+
+def test_bulk_import_leaves_room_for_logins(pool):
+    passwords = [f"pass-{i}" for i in range(400)]
+
+    async def login_meanwhile():
+        await asyncio.sleep(0)  # once the import has started submitting
+        return await hash_password_async("interactive")
+
+    async def run():
+        return await asyncio.gather(hash_passwords_async(passwords), login_meanwhile())
+
+    hashes, single = asyncio.run(run())
+
+    assert len(hashes) == len(passwords)
+    assert verify_password("pass-7", hashes[7])
+    assert verify_password("interactive", single)
+
+
+def test_bulk_share_full_times_out(pool, monkeypatch):
+    monkeypatch.setattr(auth, "PASSWORD_HASH_TIMEOUT_S", 0.05)
+    held = [auth._bulk_slots.acquire(blocking=False) for _ in range(2)]
+    try:
+        with pytest.raises(PasswordHasherBusy):
+            asyncio.run(hash_passwords_async(["a", "b"]))
+        # Interactive hashing is unaffected.
+        assert verify_password("c", asyncio.run(hash_password_async("c")))
+    finally:
+        for ok in held:
+            if ok:
+                auth._bulk_slots.release()
@@ -0,0 +1,88 @@
+import pytest
+
+import app as backend
+from auth_token import verify_token
+
+from conftest import register_farmer
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        '{"quantityKg": 0, "pricePerKg": 20}',
+        '{"quantityKg": -5, "pricePerKg": 20}',
+        '{"quantityKg": 10, "pricePerKg": 0}',
+        # The JSON parser accepts these tokens; the schema must not.
+        '{"quantityKg": NaN, "pricePerKg": 20}',
+        '{"quantityKg": 10, "pricePerKg": Infinity}',
+        '{"quantityKg": 10, "pricePerKg": -Infinity}',
+    ],
+)
+def test_sale_rejects_bad_numbers(api, body):
+    farmer = register_farmer(api)
+
+    res = api.post("/farmer/sales", content=body, headers={**farmer, "Content-Type": "application/json"})
+
+    assert res.status_code == 422
+    assert isinstance(res.json()["detail"], list)
+
+
+def test_sale_is_recorded_in_earnings(api):
+    farmer = register_farmer(api)
+
+    res = api.post("/farmer/sales", json={"crop": "Turmeric", "quantityKg": 10, "pricePerKg": 20.5}, headers=farmer)
+
+    assert res.status_code == 201
+    assert res.json()["amount"] == 205.0
+    earnings = api.get("/farmer/earnings", headers=farmer).json()
+    assert "NaN" not in str(earnings) and "inf" not in str(earnings)
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        '{"soilMoisturePercent": -50}',
+        '{"soilMoisturePercent": 400}',
+        '{"soilMoisturePercent": NaN}',
+        '{"expectedHarvestDays": -1}',
+    ],
+)
+def test_crop_update_rejects_out_of_range_values(api, body):
+    farmer = register_farmer(api)
+
+    res = api.put("/farmer/crop", content=body, headers={**farmer, "Content-Type": "application/json"})
+
+    assert res.status_code == 422
+
+
+def _farmer_cell(farmer_id: int):
+    from database import SessionLocal
+    from models import User
+
+    db = SessionLocal()
+    try:
+        lat, lng = db.query(User.latitude, User.longitude).filter(User.id == farmer_id).one()
+    finally:
+        db.close()
+    assert lat is not None, "registration should have located the farmer"
+    return backend._WEATHER_CACHE.snap(lat, lng)
+
+
+def test_crop_update_reruns_rules_on_the_next_forecast(api):
+    farmer = register_farmer(api)
+    farmer_id = verify_token(farmer["Authorization"].split()[1])["user_id"]
+    key = _farmer_cell(farmer_id)
+    engine = backend._ALERT_ENGINE
+    weather = {"rainProbabilityPercent": 10, "temperatureC": 30.0, "humidityPercent": 40, "windSpeedKmh": 5}
+
+    engine.weather_updated(key, weather)
+    engine._dirty.pop(key, None)
+    engine.weather_updated(key, weather)
+    assert key not in engine._dirty  # same forecast: nothing to re-run
+
+    res = api.put("/farmer/crop", json={"soilMoisturePercent": 15, "expectedHarvestDays": 120}, headers=farmer)
+    assert res.status_code == 200
+
+    # The unchanged forecast now counts as a change for the farmer's cell.
+    engine.weather_updated(key, weather)
+    assert engine._dirty.pop(key) == weather
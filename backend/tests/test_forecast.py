@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from forecast import HOUR_S, parse_forecast
+
+BERLIN = ZoneInfo("Europe/Berlin")
+
+
+def _local_midnights(first: datetime, days: int):
+    return [int(datetime.combine(first.date() + timedelta(days=d), datetime.min.time(), BERLIN).timestamp())
+            for d in range(days)]
+
+
+def _berlin_forecast(first_day: datetime, days: int) -> dict:
+    # Shaped like Open-Meteo's answer with timezone=auto and timeformat=unixtime.
+    midnights = _local_midnights(first_day, days)
+    hours = list(range(midnights[0], midnights[-1] + 24 * HOUR_S, HOUR_S))
+    return {
+        "timezone": "Europe/Berlin",
+        "utc_offset_seconds": 3600,
+        "hourly": {"time": hours, "precipitation_probability": [i % 100 for i in range(len(hours))]},
+        "daily": {"time": midnights, "temperature_2m_max": [float(10 + d) for d in range(days)]},
+    }
+
+
+def test_daily_series_keeps_every_day_across_spring_forward():
+    # 2026-03-29 is 23 h long in Berlin; a fixed 24 h step would put the 30th onto the 29th.
+    forecast = parse_forecast(_berlin_forecast(datetime(2026, 3, 27), 6))
+
+    assert forecast.days == 6
+    assert forecast.daily["temperature_2m_max"].tolist() == [10.0, 11.0, 12.0, 13.0, 14.0, 15.0]
+
+
+def test_daily_window_starts_on_the_local_day_after_the_change():
+    forecast = parse_forecast(_berlin_forecast(datetime(2026, 3, 27), 6))
+    just_after_midnight = datetime(2026, 3, 30, 0, 30, tzinfo=BERLIN).timestamp()
+
+    window = forecast.daily_window(just_after_midnight, 2, ["temperature"])
+
+    assert window["start"] == "2026-03-30"
+    assert window["temperatureMaxC"] == [13.0, 14.0]
+
+
+def test_daily_window_across_fall_back():
+    # 2026-10-25 is 25 h long.
+    forecast = parse_forecast(_berlin_forecast(datetime(2026, 10, 23), 5))
+    late_evening = datetime(2026, 10, 25, 23, 30, tzinfo=BERLIN).timestamp()
+
+    assert forecast.days == 5
+    window = forecast.daily_window(late_evening, 1, ["temperature"])
+    assert window["start"] == "2026-10-25"
+    assert window["temperatureMaxC"] == [12.0]
+
+
+def test_hourly_lookup_is_by_utc_hour():
+    data = _berlin_forecast(datetime(2026, 3, 27), 3)
+    forecast = parse_forecast(data)
+    ts = data["hourly"]["time"][30]
+
+    assert forecast.value_at("precipitation_probability", ts + 600) == 30.0
+    assert forecast.value_at("precipitation_probability", datetime(2020, 1, 1, tzinfo=timezone.utc).timestamp()) is None
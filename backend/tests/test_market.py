@@ -0,0 +1,31 @@
+import app as backend
+from auth_token import verify_token
+from conftest import register_farmer
+
+# Far from anything the stand-in geocoder hands out, so other tests' farmers stay out of range.
+ORIGIN = (30.0, 60.0)
+
+
+def _farmer_at(api, lat: float, lng: float) -> dict:
+    headers = register_farmer(api)
+    farmer_id = verify_token(headers["Authorization"].split()[1])["user_id"]
+    backend._FARMER_INDEX.upsert(farmer_id, lat, lng)
+    return headers
+
+
+def _list(api, **params):
+    res = api.get("/market/items", params={"lat": ORIGIN[0], "lng": ORIGIN[1], "radius_km": 50, **params})
+    assert res.status_code == 200, res.text
+    return [item["productName"] for item in res.json()["items"]]
+
+
+def test_distance_sort_defaults_to_nearest_first(api):
+    for name, lng in [("Middle", 60.1), ("Near", 60.01), ("Far", 60.3)]:
+        farmer = _farmer_at(api, ORIGIN[0], lng)
+        res = api.post("/market/items", json={"productName": name, "pricePerKg": 20, "quantityKg": 5}, headers=farmer)
+        assert res.status_code in (200, 201), res.text
+
+    assert _list(api, sort="distance") == ["Near", "Middle", "Far"]
+    assert _list(api, sort="distance", order="desc") == ["Far", "Middle", "Near"]
+    # Other sort keys keep newest first.
+    assert _list(api, sort="created") == ["Far", "Near", "Middle"]
@@ -0,0 +1,40 @@
+from spatial_index import SpatialIndex
+
+ERODE = (11.34, 77.72)
+NASHIK = (19.99, 73.79)
+
+
+def _rows_with(index, during):
+    # The bulk load's rows, with live edits landing after the first one is read.
+    yield (1, *ERODE)
+    during(index)
+    yield (2, *ERODE)
+    yield (3, *ERODE)
+
+
+def test_load_keeps_points_removed_meanwhile_out():
+    index = SpatialIndex()
+
+    index.load(_rows_with(index, lambda ix: (ix.remove(1), ix.remove(2))))
+
+    assert sorted(i for i, _ in index.within(*ERODE, 10)) == [3]
+
+
+def test_load_keeps_points_moved_meanwhile_where_they_moved():
+    index = SpatialIndex()
+
+    index.load(_rows_with(index, lambda ix: (ix.upsert(1, *NASHIK), ix.upsert(2, *NASHIK))))
+
+    assert sorted(i for i, _ in index.within(*ERODE, 10)) == [3]
+    assert sorted(i for i, _ in index.within(*NASHIK, 10)) == [1, 2]
+
+
+def test_edits_after_load_apply_normally():
+    index = SpatialIndex()
+    index.load([(1, *ERODE)])
+
+    index.remove(1)
+    index.upsert(1, *ERODE)
+
+    assert [i for i, _ in index.within(*ERODE, 10)] == [1]
+    assert index.stats()["ready"]
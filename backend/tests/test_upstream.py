@@ -0,0 +1,213 @@
+import asyncio
+import time
+
+import pytest
+
+import app as backend
+import upstream
+from fastapi import HTTPException
+from forecast import FORECAST_DAYS
+from upstream import CircuitOpenError, UpstreamClient, UpstreamError, UpstreamRejected
+
+
+def _client(**kwargs) -> UpstreamClient:
+    kwargs.setdefault("timeout_s", 5)
+    kwargs.setdefault("connect_timeout_s", 5)
+    return UpstreamClient(**kwargs)
+
+
+async def _get(client: UpstreamClient, url: str, params=None):
+    try:
+        return await client.get_json(url, params)
+    finally:
+        await client.aclose()
+
+
+@pytest.fixture
+def jitter(monkeypatch):
+    # Records the backoff ranges drawn from and skips the actual sleeps.
+    drawn = []
+
+    def uniform(low, high):
+        drawn.append((low, high))
+        return 0.0
+
+    monkeypatch.setattr(upstream.random, "uniform", uniform)
+    return drawn
+
+
+def test_retries_with_exponential_jittered_backoff(open_meteo, jitter):
+    server, base = open_meteo
+    server.state["mode"] = "fail"
+    client = _client(retries=3, backoff_s=0.1)
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(_get(client, f"{base}/v1/search", {"name": "Erode"}))
+
+    assert server.state["requests"] == 4
+    # Full jitter: each wait is drawn from [0, backoff * 2^attempt).
+    assert jitter == [(0, pytest.approx(0.1)), (0, pytest.approx(0.2)), (0, pytest.approx(0.4))]
+
+
+def test_retry_recovers_once_upstream_answers(open_meteo, monkeypatch):
+    server, base = open_meteo
+    server.state["mode"] = "fail"
+
+    def uniform(low, high):
+        server.state["mode"] = "ok"  # upstream is back by the time the backoff ends
+        return 0.0
+
+    monkeypatch.setattr(upstream.random, "uniform", uniform)
+    data = asyncio.run(_get(_client(retries=2), f"{base}/v1/search", {"name": "Erode"}))
+
+    assert server.state["requests"] == 2
+    assert data["results"][0]["name"] == "Erode"
+
+
+def test_client_errors_are_not_retried(open_meteo, jitter):
+    server, base = open_meteo
+    client = _client(retries=3)
+
+    with pytest.raises(UpstreamRejected):
+        asyncio.run(_get(client, f"{base}/v1/unknown"))
+
+    assert server.state["requests"] == 1
+    assert jitter == []
+    # A 4xx says nothing about the host's health.
+    assert client.breaker_stats()[base.split("//")[1]]["consecutive_failures"] == 0
+
+
+def test_breaker_opens_after_consecutive_failures(open_meteo, jitter):
+    server, base = open_meteo
+    server.state["mode"] = "fail"
+    host = base.split("//")[1]
+    client = _client(retries=0)
+    client._breakers[host] = upstream.CircuitBreaker(host, failures=2, open_s=60)
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(UpstreamError):
+                await client.get_json(f"{base}/v1/search", {"name": "Erode"})
+        with pytest.raises(CircuitOpenError):
+            await client.get_json(f"{base}/v1/search", {"name": "Erode"})
+        await client.aclose()
+
+    asyncio.run(run())
+    assert server.state["requests"] == 2
+
+
+def test_per_host_concurrency_limit(slow_open_meteo):
+    server, base = slow_open_meteo
+    client = _client(max_connections_per_host=2, retries=0)
+
+    async def run():
+        try:
+            return await asyncio.gather(
+                *[client.get_json(f"{base}/v1/search", {"name": f"Town {i}"}) for i in range(6)]
+            )
+        finally:
+            await client.aclose()
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - started
+
+    assert len(results) == 6
+    assert server.state["requests"] == 6
+    assert server.state["max_inflight"] == 2
+    # Three rounds of two 100 ms calls.
+    assert elapsed >= 0.3
+
+
+def test_per_host_limit_does_not_serialise_below_it(slow_open_meteo):
+    server, base = slow_open_meteo
+    client = _client(max_connections_per_host=6, retries=0)
+
+    async def run():
+        try:
+            await asyncio.gather(*[client.get_json(f"{base}/v1/search", {"name": f"Town {i}"}) for i in range(6)])
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert server.state["max_inflight"] > 2
+
+
+def _run_app(coro):
+    async def run():
+        try:
+            return await coro
+        finally:
+            await backend._UPSTREAM.aclose()
+
+    return asyncio.run(run())
+
+
+def test_async_geocode_picks_result_in_hinted_state(app_upstream):
+    geo = _run_app(backend._geocode_best_async(name="Kolar", state_hint="Karnataka"))
+
+    assert geo is not None
+    assert geo["admin1"] == "Karnataka"
+    assert geo["country_code"] == "IN"
+    assert isinstance(geo["latitude"], float) and isinstance(geo["longitude"], float)
+    assert app_upstream.state["requests"] == 1
+
+
+def test_async_forecast_is_parsed(app_upstream):
+    reading = _run_app(backend._open_meteo_weather_async(11.34, 77.72))
+
+    assert set(reading) >= {"time", "temperatureC", "windSpeedKmh", "humidityPercent", "rainProbabilityPercent"}
+    assert isinstance(reading["temperatureC"], float)
+    # The current hour's rain chance comes out of the hourly series.
+    assert 0 <= reading["rainProbabilityPercent"] <= 100
+    assert reading["time"][:2] == "20" and "T" in reading["time"]
+    assert reading.forecast is not None
+    assert reading.forecast.hours == 24 * FORECAST_DAYS
+
+
+def test_async_forecast_batch_matches_coordinates(app_upstream):
+    points = [(11.34, 77.72), (19.99, 73.79), (12.52, 76.89)]
+    readings = _run_app(backend._open_meteo_weather_many_async(points))
+
+    assert len(readings) == 3
+    assert app_upstream.state["requests"] == 1
+    singles = [_run_app(backend._open_meteo_weather_async(lat, lng)) for lat, lng in points]
+    assert [r["temperatureC"] for r in readings] == [r["temperatureC"] for r in singles]
+
+
+def test_async_upstream_failure_maps_to_502(app_upstream):
+    app_upstream.state["mode"] = "fail"
+
+    with pytest.raises(HTTPException) as e:
+        _run_app(backend._open_meteo_weather_async(11.34, 77.72))
+    assert e.value.status_code == 502
+
+
+def test_sync_fetch_does_not_count_client_errors_against_the_breaker(app_upstream, open_meteo):
+    _, base = open_meteo
+    host = base.split("//")[1]
+    backend._UPSTREAM._breakers[host] = upstream.CircuitBreaker(host, failures=2, open_s=60)
+
+    for _ in range(3):
+        with pytest.raises(HTTPException) as e:
+            backend._fetch_json(f"{base}/v1/unknown")
+        assert e.value.status_code == 502
+
+    assert backend._UPSTREAM.breaker_stats()[host]["consecutive_failures"] == 0
+    assert backend._fetch_json(f"{base}/v1/search?name=Erode")["results"]
+
+
+def test_sync_fetch_opens_breaker_on_server_errors(app_upstream, open_meteo):
+    _, base = open_meteo
+    host = base.split("//")[1]
+    backend._UPSTREAM._breakers[host] = upstream.CircuitBreaker(host, failures=2, open_s=60)
+    app_upstream.state["mode"] = "fail"
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as e:
+            backend._fetch_json(f"{base}/v1/search?name=Erode")
+        assert e.value.status_code == 502
+    with pytest.raises(HTTPException) as e:
+        backend._fetch_json(f"{base}/v1/search?name=Erode")
+    assert e.value.status_code == 503
+    assert app_upstream.state["requests"] == 2
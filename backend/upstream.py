@@ -0,0 +1,246 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import METRICS, record_upstream
+
+UPSTREAM_TIMEOUT_S = float(os.getenv("UPSTREAM_TIMEOUT_S", "8"))
+UPSTREAM_CONNECT_TIMEOUT_S = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT_S", "3"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_CONNECTIONS_PER_HOST = int(os.getenv("UPSTREAM_MAX_CONNECTIONS_PER_HOST", "20"))
+UPSTREAM_KEEPALIVE_S = float(os.getenv("UPSTREAM_KEEPALIVE_S", "30"))
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_BACKOFF_S = float(os.getenv("UPSTREAM_BACKOFF_S", "0.2"))
+# Per-host circuit breaker: opens after this many consecutive failed (or slow) calls; 0 disables it.
+UPSTREAM_BREAKER_FAILURES = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+# A call that succeeds but takes longer than this still counts as a failure.
+UPSTREAM_BREAKER_SLOW_S = float(os.getenv("UPSTREAM_BREAKER_SLOW_S", "4"))
+UPSTREAM_BREAKER_OPEN_S = float(os.getenv("UPSTREAM_BREAKER_OPEN_S", "30"))
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class UpstreamRejected(UpstreamError):
+    # The host answered but refused the request (4xx); says nothing about its health.
+    pass
+
+
+class CircuitOpenError(UpstreamError):
+    def __init__(self, host: str, retry_after_s: float):
+        super().__init__(f"{host} is unavailable (circuit open)")
+        self.host = host
+        self.retry_after_s = retry_after_s
+
+
+class CircuitBreaker:
+    # closed -> open after `failures` bad calls in a row; open -> half_open once `open_s` has passed,
+    # letting a single trial call through; its outcome closes the circuit or opens it again.
+    # Thread-safe: the sync fetch path records from threadpool workers.
+    def __init__(
+        self,
+        host: str,
+        failures: int = UPSTREAM_BREAKER_FAILURES,
+        slow_s: float = UPSTREAM_BREAKER_SLOW_S,
+        open_s: float = UPSTREAM_BREAKER_OPEN_S,
+    ):
+        self.host = host
+        self.failure_threshold = failures
+        self.slow_s = slow_s
+        self.open_s = open_s
+        self._lock = threading.Lock()
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+
+        self.opens = 0
+        self.rejected = 0
+        self.slow_calls = 0
+
+    def before_call(self):
+        # Raises CircuitOpenError instead of letting the call through.
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == BREAKER_CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == BREAKER_OPEN and now - self.opened_at >= self.open_s:
+                self.state = BREAKER_HALF_OPEN
+            if self.state == BREAKER_HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            retry_after = max(0.0, self.opened_at + self.open_s - now)
+        METRICS.inc("agri_upstream_short_circuited_total", (("host", self.host),))
+        raise CircuitOpenError(self.host, retry_after)
+
+    def record(self, ok: bool, elapsed_s: float):
+        if self.failure_threshold <= 0:
+            return
+        if ok and self.slow_s > 0 and elapsed_s >= self.slow_s:
+            self.slow_calls += 1
+            ok = False
+        with self._lock:
+            self._trial_in_flight = False
+            if ok:
+                self.consecutive_failures = 0
+                if self.state != BREAKER_CLOSED:
+                    print(f"[INFO] Upstream {self.host} recovered; circuit closed")
+                self.state = BREAKER_CLOSED
+                return
+            self.consecutive_failures += 1
+            if self.state == BREAKER_HALF_OPEN or (
+                self.state == BREAKER_CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                if self.state == BREAKER_CLOSED:
+                    print(f"[WARN] Upstream {self.host} failing; circuit open for {self.open_s:g}s")
+                self.state = BREAKER_OPEN
+                self.opened_at = time.monotonic()
+                self.opens += 1
+
+    def cancel(self):
+        # The trial call was abandoned without an outcome; let the next caller try.
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "opens": self.opens,
+                "rejected": self.rejected,
+                "slow_calls": self.slow_calls,
+                "open_remaining_s": round(max(0.0, self.opened_at + self.open_s - time.monotonic()), 3)
+                if self.state == BREAKER_OPEN
+                else 0.0,
+            }
+
+
+class UpstreamClient:
+    def __init__(
+        self,
+        timeout_s: float = UPSTREAM_TIMEOUT_S,
+        connect_timeout_s: float = UPSTREAM_CONNECT_TIMEOUT_S,
+        max_connections: int = UPSTREAM_MAX_CONNECTIONS,
+        max_connections_per_host: int = UPSTREAM_MAX_CONNECTIONS_PER_HOST,
+        retries: int = UPSTREAM_RETRIES,
+        backoff_s: float = UPSTREAM_BACKOFF_S,
+    ):
+        self.timeout = httpx.Timeout(timeout_s, connect=connect_timeout_s)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_S,
+        )
+        self.max_connections_per_host = max_connections_per_host
+        self.retries = retries
+        self.backoff_s = backoff_s
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                headers={
+                    "Accept": "application/json",
+                    "User-Agent": "AgriConnect/1.0",
+                },
+            )
+        return self._client
+
+    def _slots(self, host: str) -> asyncio.Semaphore:
+        sem = self._host_slots.get(host)
+        if sem is None:
+            sem = self._host_slots[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return sem
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        # Shared with the sync fetch path, so both see the same upstream health.
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._breakers_lock:
+                breaker = self._breakers.setdefault(host, CircuitBreaker(host))
+        return breaker
+
+    def breaker_stats(self) -> Dict[str, dict]:
+        return {host: breaker.stats() for host, breaker in list(self._breakers.items())}
+
+    async def get_json(self, url: str, params: Optional[dict] = None):
+        host = urlsplit(url).netloc
+        breaker = self.breaker(host)
+        breaker.before_call()
+        started = time.perf_counter()
+        ok = cancelled = answered = False
+        try:
+            data = await self._get_json(host, url, params)
+            ok = True
+            return data
+        except UpstreamRejected:
+            answered = True
+            raise
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if cancelled:
+                breaker.cancel()
+            else:
+                breaker.record(ok or answered, elapsed)
+            record_upstream(host, elapsed, ok)
+
+    async def _get_json(self, host: str, url: str, params: Optional[dict]):
+        client = self._get_client()
+        attempt = 0
+        while True:
+            try:
+                async with self._slots(host):
+                    resp = await client.get(url, params=params)
+                if resp.status_code in _RETRY_STATUS and attempt < self.retries:
+                    raise httpx.HTTPStatusError(
+                        f"HTTP {resp.status_code}", request=resp.request, response=resp
+                    )
+                resp.raise_for_status()
+                return resp.json()
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = isinstance(e, httpx.TransportError) or (
+                    e.response is not None and e.response.status_code in _RETRY_STATUS
+                )
+                if not retryable:
+                    raise UpstreamRejected(str(e)) from e
+                if attempt >= self.retries:
+                    raise UpstreamError(str(e) or e.__class__.__name__) from e
+            except ValueError as e:
+                raise UpstreamError(f"Invalid JSON: {e}") from e
+
+            # Exponential backoff with full jitter.
+            attempt += 1
+            METRICS.inc("agri_upstream_retries_total", (("host", host),))
+            await asyncio.sleep(random.uniform(0, self.backoff_s * (2 ** (attempt - 1))))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_slots.clear()
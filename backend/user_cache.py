@@ -0,0 +1,93 @@
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+# Bounds staleness across worker processes, which each keep their own cache.
+USER_CACHE_TTL_S = float(os.getenv("USER_CACHE_TTL_S", "300"))
+
+_PROFILE_FIELDS = (
+    "id",
+    "name",
+    "mobile",
+    "email",
+    "role",
+    "state",
+    "district",
+    "village",
+    "pincode",
+    "latitude",
+    "longitude",
+    "geo_label",
+)
+
+
+class UserSnapshot:
+    # Detached, read-only copy of the User columns protected routes read.
+    __slots__ = _PROFILE_FIELDS
+
+    def __init__(self, db_user):
+        for field in _PROFILE_FIELDS:
+            object.__setattr__(self, field, getattr(db_user, field, None))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UserSnapshot is read-only")
+
+
+class UserProfileCache:
+    def __init__(self, max_entries: int = USER_CACHE_MAX_ENTRIES, ttl_s: float = USER_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lock = Lock()
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> Optional[UserSnapshot]:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(user_id)
+            if hit is not None and hit[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return hit[0]
+            if hit is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, db_user) -> UserSnapshot:
+        snapshot = UserSnapshot(db_user)
+        if self.max_entries <= 0:
+            return snapshot
+        with self._lock:
+            self._entries[snapshot.id] = (snapshot, time.monotonic() + self.ttl_s)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+from typing import AsyncIterator, Dict, List, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import User
+
+USER_IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", "1000"))
+USER_IMPORT_MAX_ERRORS = int(os.getenv("USER_IMPORT_MAX_ERRORS", "10000"))
+
+ParsedRow = Tuple[int, object]
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    pending = b""
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig", errors="replace").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8-sig", errors="replace").rstrip("\r")
+
+
+async def _iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[List[str]]:
+    # Re-joins physical lines until the quotes balance, so quoted newlines survive streaming.
+    buffered: List[str] = []
+    quotes = 0
+    async for line in lines:
+        buffered.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        record = "\n".join(buffered)
+        buffered, quotes = [], 0
+        if record.strip():
+            yield next(csv.reader([record]))
+    if buffered:
+        yield next(csv.reader(["\n".join(buffered)]))
+
+
+async def iter_upload_rows(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[ParsedRow]:
+    # Yields (row number, dict of fields) or (row number, Exception) for unparseable rows.
+    lines = _iter_lines(chunks)
+    if fmt == "ndjson":
+        row_no = 0
+        async for line in lines:
+            row_no += 1
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError("expected a JSON object")
+                yield row_no, item
+            except ValueError as e:
+                yield row_no, e
+        return
+
+    header = None
+    row_no = 0
+    async for record in _iter_csv_records(lines):
+        if header is None:
+            header = [h.strip() for h in record]
+            continue
+        row_no += 1
+        if len(record) > len(header):
+            yield row_no, ValueError(f"expected {len(header)} columns, got {len(record)}")
+            continue
+        yield row_no, {k: v for k, v in zip(header, record)}
+
+
+def insert_user_rows(db: Session, rows: List[Dict]) -> Set[str]:
+    # One multi-row INSERT per batch; returns the mobiles that were actually inserted.
+    if not rows:
+        return set()
+
+    dialect = db.get_bind().dialect.name
+    if dialect in {"postgresql", "sqlite"}:
+        stmt_factory = pg_insert if dialect == "postgresql" else sqlite_insert
+        stmt = (
+            stmt_factory(User)
+            .on_conflict_do_nothing(index_elements=[User.mobile])
+            .returning(User.mobile)
+        )
+        inserted = {m for (m,) in db.execute(stmt, rows).all()}
+    else:
+        existing = {
+            m for (m,) in db.query(User.mobile).filter(User.mobile.in_([r["mobile"] for r in rows])).all()
+        }
+        fresh = [r for r in rows if r["mobile"] not in existing]
+        if fresh:
+            db.execute(insert(User), fresh)
+        inserted = {r["mobile"] for r in fresh}
+
+    db.commit()
+    return inserted
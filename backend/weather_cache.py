@@ -0,0 +1,219 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+WEATHER_GRID_DEG = float(os.getenv("WEATHER_GRID_DEG", "0.1"))
+# 0 means "until the next full hour", matching Open-Meteo's hourly model updates.
+WEATHER_CACHE_TTL_S = int(os.getenv("WEATHER_CACHE_TTL_S", "0"))
+WEATHER_CACHE_STALE_S = int(os.getenv("WEATHER_CACHE_STALE_S", "3600"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "20000"))
+
+CellKey = Tuple[float, float]
+Fetcher = Callable[[float, float], Awaitable[dict]]
+ManyFetcher = Callable[[List[CellKey]], Awaitable[List[dict]]]
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "stale_until")
+
+    def __init__(self, value: dict, expires_at: float, stale_until: float):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+
+
+class WeatherCache:
+    def __init__(
+        self,
+        grid_deg: float = WEATHER_GRID_DEG,
+        ttl_s: int = WEATHER_CACHE_TTL_S,
+        stale_s: int = WEATHER_CACHE_STALE_S,
+        max_entries: int = WEATHER_CACHE_MAX_ENTRIES,
+    ):
+        self.grid_deg = grid_deg
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[CellKey, _Entry]" = OrderedDict()
+        self._inflight: Dict[CellKey, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        # Called with (cell, forecast) whenever a fresh forecast is stored.
+        self.on_update: Optional[Callable[[CellKey, dict], None]] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def snap(self, lat: float, lng: float) -> CellKey:
+        g = self.grid_deg
+        if g <= 0:
+            return (round(lat, 4), round(lng, 4))
+        return (round(round(lat / g) * g, 4), round(round(lng / g) * g, 4))
+
+    def _expiry(self, now: float, ahead_s: float = 0) -> float:
+        # ahead_s: a refresh made this early counts as one for the hour starting within it.
+        if self.ttl_s > 0:
+            return now + self.ttl_s
+        return ((now + ahead_s) // 3600 + 1) * 3600
+
+    async def get(self, lat: float, lng: float, fetch: Fetcher) -> dict:
+        async def fetch_one(keys):
+            return [await fetch(keys[0][0], keys[0][1])]
+
+        value = (await self.get_many([(lat, lng)], fetch_one))[self.snap(lat, lng)]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    async def get_many(self, points: Iterable[Tuple[float, float]], fetch_many: ManyFetcher) -> Dict[CellKey, Any]:
+        # Returns {snapped cell: forecast or the Exception that cell's fetch raised}.
+        now = time.time()
+        out: Dict[CellKey, Any] = {}
+        waiting: Dict[CellKey, asyncio.Future] = {}
+        missing: List[CellKey] = []
+        stale: List[CellKey] = []
+
+        for lat, lng in points:
+            key = self.snap(lat, lng)
+            if key in out or key in waiting or key in missing:
+                continue
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now < entry.expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    out[key] = entry.value
+                    continue
+                if now < entry.stale_until:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    out[key] = entry.value
+                    if key not in self._inflight:
+                        stale.append(key)
+                    continue
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.coalesced += 1
+                waiting[key] = flight
+                continue
+
+            self.misses += 1
+            missing.append(key)
+
+        if stale:
+            task = asyncio.ensure_future(self._refresh_many(stale, fetch_many))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+        if missing:
+            out.update(await self._refresh_many(missing, fetch_many))
+
+        for key, flight in waiting.items():
+            try:
+                out[key] = await asyncio.shield(flight)
+            except Exception as e:
+                out[key] = e
+
+        return out
+
+    async def refresh_many(
+        self, keys: Iterable[CellKey], fetch_many: ManyFetcher, ahead_s: float = 0
+    ) -> Dict[CellKey, Any]:
+        # Forced refresh (used by the prefetcher); cells already being fetched are skipped.
+        # Failed cells come back as the Exception even when a last known forecast is kept.
+        keys = [k for k in dict.fromkeys(keys) if k not in self._inflight]
+        if not keys:
+            return {}
+        return await self._refresh_many(keys, fetch_many, ahead_s=ahead_s, keep_last=False)
+
+    def expires_at(self, key: CellKey) -> Optional[float]:
+        entry = self._entries.get(key)
+        return entry.expires_at if entry is not None else None
+
+    async def _refresh_many(
+        self, keys: List[CellKey], fetch_many: ManyFetcher, ahead_s: float = 0, keep_last: bool = True
+    ) -> Dict[CellKey, Any]:
+        loop = asyncio.get_running_loop()
+        previous = {key: self._entries.get(key) for key in keys}
+        flights = {key: loop.create_future() for key in keys}
+        self._inflight.update(flights)
+
+        error: Optional[Exception] = None
+        values: List[dict] = []
+        try:
+            values = list(await fetch_many(keys))
+            if len(values) != len(keys):
+                raise ValueError(f"expected {len(keys)} forecasts, got {len(values)}")
+        except asyncio.CancelledError:
+            for key, flight in flights.items():
+                self._inflight.pop(key, None)
+                flight.cancel()
+            raise
+        except Exception as e:
+            error = e
+
+        out: Dict[CellKey, Any] = {}
+        for i, key in enumerate(keys):
+            self._inflight.pop(key, None)
+            flight = flights[key]
+            prev = previous[key]
+            if prev is not None:
+                self.refreshes += 1
+
+            if error is None:
+                self.put(key, values[i], ahead_s)
+                out[key] = values[i]
+                flight.set_result(values[i])
+            elif prev is not None:
+                # Keep serving the last known forecast while the upstream is failing.
+                self.refresh_errors += 1
+                out[key] = prev.value if keep_last else error
+                flight.set_result(prev.value)
+            else:
+                out[key] = error
+                flight.set_exception(error)
+                # Mark retrieved so a flight nobody else awaited doesn't log a warning.
+                flight.exception()
+        return out
+
+    def put(self, key: CellKey, value: dict, ahead_s: float = 0):
+        expires_at = self._expiry(time.time(), ahead_s)
+        self._entries[key] = _Entry(value, expires_at, expires_at + self.stale_s)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self.on_update is not None:
+            try:
+                self.on_update(key, value)
+            except Exception as e:
+                print(f"[WARN] Weather cache update hook failed: {e}")
+
+    def peek(self, key: CellKey) -> Optional[dict]:
+        # Last stored forecast for a cell, fresh or stale, without touching stats or LRU order.
+        entry = self._entries.get(key)
+        return entry.value if entry is not None else None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.stale_hits + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "hit_ratio": round((self.hits + self.stale_hits + self.coalesced) / lookups, 4) if lookups else None,
+            "grid_deg": self.grid_deg,
+            "ttl_s": self.ttl_s or "hourly",
+            "stale_s": self.stale_s,
+        }
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from weather_cache import CellKey, ManyFetcher, WeatherCache
+
+WEATHER_PREFETCH_ENABLED = os.getenv("WEATHER_PREFETCH_ENABLED", "1") not in {"0", "false", "False"}
+WEATHER_PREFETCH_INTERVAL_S = float(os.getenv("WEATHER_PREFETCH_INTERVAL_S", "300"))
+# Cells expiring within this window are refreshed ahead of time.
+WEATHER_PREFETCH_LEAD_S = float(os.getenv("WEATHER_PREFETCH_LEAD_S", "600"))
+WEATHER_PREFETCH_CONCURRENCY = int(os.getenv("WEATHER_PREFETCH_CONCURRENCY", "4"))
+WEATHER_PREFETCH_RATE_PER_S = float(os.getenv("WEATHER_PREFETCH_RATE_PER_S", "5"))
+WEATHER_PREFETCH_BATCH_SIZE = int(os.getenv("WEATHER_PREFETCH_BATCH_SIZE", "50"))
+
+LocationPair = Tuple[str, str]
+Geocoder = Callable[[str, Optional[str]], Awaitable[Optional[dict]]]
+
+
+class _RateLimiter:
+    # Token bucket shared by geocoding and forecast calls toward Open-Meteo.
+    def __init__(self, rate_per_s: float):
+        self.rate = rate_per_s
+        self.capacity = max(1.0, rate_per_s)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class WeatherPrefetcher:
+    def __init__(
+        self,
+        cache: WeatherCache,
+        load_locations: Callable[[], Awaitable[List[LocationPair]]],
+        geocode: Geocoder,
+        is_local: Callable[[str, Optional[str]], bool],
+        fetch_many: ManyFetcher,
+        interval_s: float = WEATHER_PREFETCH_INTERVAL_S,
+        lead_s: float = WEATHER_PREFETCH_LEAD_S,
+        concurrency: int = WEATHER_PREFETCH_CONCURRENCY,
+        rate_per_s: float = WEATHER_PREFETCH_RATE_PER_S,
+        batch_size: int = WEATHER_PREFETCH_BATCH_SIZE,
+    ):
+        self.cache = cache
+        self.load_locations = load_locations
+        self.geocode = geocode
+        self.is_local = is_local
+        self.fetch_many = fetch_many
+        self.interval_s = interval_s
+        self.lead_s = lead_s
+        self.concurrency = max(1, concurrency)
+        self.rate_per_s = rate_per_s
+        self.batch_size = max(1, batch_size)
+
+        self._task: Optional[asyncio.Task] = None
+        self._demand: Counter = Counter()
+
+        self.runs = 0
+        self.last_run_at: Optional[float] = None
+        self.last_run_duration_s: Optional[float] = None
+        self.last_locations = 0
+        self.last_cells = 0
+        self.last_refreshed = 0
+        self.last_errors = 0
+        # Seconds past expiry when a cell got refreshed; <= 0 means refreshed ahead of time.
+        self.last_max_lag_s: Optional[float] = None
+        self.last_avg_lag_s: Optional[float] = None
+
+    def record_request(self, district: str, state: str):
+        key = ((district or "").strip(), (state or "").strip())
+        if key[0]:
+            self._demand[key] += 1
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[WARN] Weather prefetch failed: {e}")
+            await asyncio.sleep(self.interval_s)
+
+    async def run_once(self) -> dict:
+        started = time.time()
+        limiter = _RateLimiter(self.rate_per_s)
+        slots = asyncio.Semaphore(self.concurrency)
+
+        pairs = await self.load_locations()
+        # Most requested locations first; older demand decays every cycle.
+        demand = self._demand
+        pairs = sorted(set(pairs), key=lambda p: -demand.get(p, 0))
+        self._demand = Counter({k: v // 2 for k, v in demand.items() if v > 1})
+
+        async def geocode(pair: LocationPair):
+            district, state = pair
+            try:
+                if not self.is_local(district, state or None):
+                    await limiter.acquire()
+                    async with slots:
+                        return await self.geocode(district, state or None)
+                return await self.geocode(district, state or None)
+            except Exception:
+                return None
+
+        geos = await asyncio.gather(*[geocode(p) for p in pairs])
+
+        cells: List[CellKey] = []
+        seen = set()
+        deadline = time.time() + self.lead_s
+        for geo in geos:
+            if not geo or geo.get("latitude") is None or geo.get("longitude") is None:
+                continue
+            key = self.cache.snap(float(geo["latitude"]), float(geo["longitude"]))
+            if key in seen:
+                continue
+            seen.add(key)
+            expires_at = self.cache.expires_at(key)
+            if expires_at is None or expires_at <= deadline:
+                cells.append(key)
+
+        lags: List[float] = []
+        errors = 0
+
+        async def refresh(chunk: List[CellKey]):
+            nonlocal errors
+            await limiter.acquire()
+            async with slots:
+                before = {k: self.cache.expires_at(k) for k in chunk}
+                refreshed_at = time.time()
+                # Valid through the next expiry, so the cell isn't fetched again before it.
+                out = await self.cache.refresh_many(chunk, self.fetch_many, ahead_s=self.lead_s)
+            for k, v in out.items():
+                if isinstance(v, Exception):
+                    errors += 1
+                elif before.get(k) is not None:
+                    lags.append(refreshed_at - before[k])
+
+        chunks = [cells[i : i + self.batch_size] for i in range(0, len(cells), self.batch_size)]
+        await asyncio.gather(*[refresh(c) for c in chunks])
+
+        self.runs += 1
+        self.last_run_at = started
+        self.last_run_duration_s = round(time.time() - started, 3)
+        self.last_locations = len(pairs)
+        self.last_cells = len(seen)
+        self.last_refreshed = len(cells) - errors
+        self.last_errors = errors
+        self.last_max_lag_s = round(max(lags), 3) if lags else None
+        self.last_avg_lag_s = round(sum(lags) / len(lags), 3) if lags else None
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._task is not None and not self._task.done(),
+            "runs": self.runs,
+            "interval_s": self.interval_s,
+            "lead_s": self.lead_s,
+            "last_run_at": self.last_run_at,
+            "last_run_age_s": round(time.time() - self.last_run_at, 3) if self.last_run_at else None,
+            "last_run_duration_s": self.last_run_duration_s,
+            "last_locations": self.last_locations,
+            "last_cells": self.last_cells,
+            "last_refreshed": self.last_refreshed,
+            "last_errors": self.last_errors,
+            "last_max_lag_s": self.last_max_lag_s,
+            "last_avg_lag_s": self.last_avg_lag_s,
+            "tracked_demand": len(self._demand),
+        }